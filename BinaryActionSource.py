@@ -0,0 +1,166 @@
+"""
+A compiled, fixed width binary format for action logs.
+
+Converting a csv log once with ConvertCsvToBinary means replays no longer parse csv text or algebraic notation. The file
+is laid out as:
+
+	header        - magic, version, record size, record count and the offset of the string table
+	records       - one fixed width record per action
+	string table  - every actor, date, target and metadata string, each stored once
+
+Records refer to strings by their index in the string table, store the action type as a small int and store move and
+fire targets as already decoded x, y coordinates.
+"""
+import mmap
+import struct
+import sys
+from CsvActionSource import CsvActionSource
+from Entities import InternPosition
+from TankGameInteractor import I_ActionSource, Action, AlgebraicNotationToPosition, \
+	MOVE_ACTION, FIRE_ACTION, UPGRADE_ACTION, TRADE_ACTION, SHARE_AP_ACTION, SHARE_LIFE_ACTION, TRANSFER_GOLD_ACTION
+
+MAGIC = b"TGAL"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHQQ")
+# date id, actor id, action type, target kind, target x or string id, target y, metadata id
+RECORD = struct.Struct("<IIBBxxiiI")
+STRING_LENGTH = struct.Struct("<I")
+
+ACTION_TYPES = [MOVE_ACTION, FIRE_ACTION, UPGRADE_ACTION, TRADE_ACTION, SHARE_AP_ACTION, SHARE_LIFE_ACTION, TRANSFER_GOLD_ACTION]
+ACTION_TYPE_CODES = {action_type: code for code, action_type in enumerate(ACTION_TYPES)}
+
+# Action types whose target is a space on the board rather than another tank
+POSITION_TARGET_ACTIONS = {MOVE_ACTION, FIRE_ACTION}
+
+TARGET_STRING = 0
+TARGET_POSITION = 1
+
+class _StringTable:
+
+	def __init__(self):
+		self.ids = {}
+		self.strings = []
+
+	def Intern(self, string):
+		stringId = self.ids.get(string)
+		if stringId is None:
+			stringId = len(self.strings)
+			self.ids[string] = stringId
+			self.strings.append(string)
+		return stringId
+
+	def Write(self, binary):
+		binary.write(STRING_LENGTH.pack(len(self.strings)))
+		for string in self.strings:
+			encoded = string.encode("utf-8")
+			binary.write(STRING_LENGTH.pack(len(encoded)))
+			binary.write(encoded)
+
+def ConvertActionsToBinary(action_source, binary_path):
+	"""Write every action from action_source to binary_path, returns the number of actions written."""
+	strings = _StringTable()
+	count = 0
+	with open(binary_path, "wb") as binary:
+		binary.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0, 0))
+
+		while action_source.HasAnotherAction():
+			action = action_source.NextAction()
+			if action.action_type not in ACTION_TYPE_CODES:
+				raise Exception("Unhandled action type: " + action.action_type)
+
+			if action.action_type in POSITION_TARGET_ACTIONS:
+				position = AlgebraicNotationToPosition(action.target)
+				target = (TARGET_POSITION, position.x, position.y)
+			else:
+				target = (TARGET_STRING, strings.Intern(action.target), 0)
+
+			binary.write(RECORD.pack(strings.Intern(action.date), strings.Intern(action.actor),
+				ACTION_TYPE_CODES[action.action_type], *target, strings.Intern(action.metadata)))
+			count += 1
+
+		stringTableOffset = binary.tell()
+		strings.Write(binary)
+		binary.seek(0)
+		binary.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, stringTableOffset))
+
+	return count
+
+def ConvertCsvToBinary(csv_path, binary_path):
+	with CsvActionSource(csv_path) as action_source:
+		return ConvertActionsToBinary(action_source, binary_path)
+
+class BinaryActionSource(I_ActionSource):
+	"""
+	Read actions from a binary log through a memory map.
+
+	Records are unpacked straight out of the mapped file. Strings are decoded once when the source is opened and
+	positions are shared between actions that target the same space.
+	"""
+
+	def __init__(self, path):
+		self._file = open(path, "rb")
+		self._map = None
+		try:
+			# mmap refuses empty files and unpacking fails on short ones
+			self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+			magic, version, recordSize, self.num_actions, stringTableOffset = HEADER.unpack_from(self._map, 0)
+			if magic != MAGIC or version != VERSION or recordSize != RECORD.size \
+					or HEADER.size + self.num_actions * RECORD.size > stringTableOffset:
+				raise ValueError("Bad header")
+			self._strings = self._ReadStrings(stringTableOffset)
+		except (ValueError, struct.error) as error:
+			self.Close()
+			raise Exception(f"{path} is not a version {VERSION} binary action log") from error
+
+		self._offset = HEADER.size
+		self.next_action = 0
+
+	def HasAnotherAction(self):
+		return self.next_action < self.num_actions
+
+	def NextAction(self):
+		if not self.HasAnotherAction():
+			raise IndexError("No more actions in the log")
+
+		dateId, actorId, actionType, targetKind, targetA, targetB, metadataId = RECORD.unpack_from(self._map, self._offset)
+		self._offset += RECORD.size
+		self.next_action += 1
+
+		if targetKind == TARGET_POSITION:
+			target = InternPosition(targetA, targetB)
+		else:
+			target = self._strings[targetA]
+
+		strings = self._strings
+		return Action(strings[dateId], strings[actorId], ACTION_TYPES[actionType], target, strings[metadataId])
+
+	def Close(self):
+		self.num_actions = 0
+		if self._map is not None: self._map.close()
+		self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.Close()
+
+	def _ReadStrings(self, offset):
+		count, = STRING_LENGTH.unpack_from(self._map, offset)
+		offset += STRING_LENGTH.size
+		strings = []
+		for _ in range(count):
+			length, = STRING_LENGTH.unpack_from(self._map, offset)
+			offset += STRING_LENGTH.size
+			if offset + length > len(self._map): raise ValueError("The string table is cut short")
+			strings.append(self._map[offset:offset + length].decode("utf-8"))
+			offset += length
+		return strings
+
+if __name__ == "__main__":
+	if len(sys.argv) != 3:
+		print("Usage: python BinaryActionSource.py <log.csv> <log.tgal>")
+		sys.exit(1)
+
+	print(f"Converted {ConvertCsvToBinary(sys.argv[1], sys.argv[2])} actions")
@@ -2,17 +2,54 @@ from TankGameInteractor import I_ActionSource, Action
 from csv import DictReader
 
 class CsvActionSource(I_ActionSource):
+	"""
+	Read actions from a csv log one row at a time.
+
+	Only the next action is held in memory. The file is closed once the last action has been read, or by Close() /
+	leaving a with block if the source is abandoned early.
+	"""
 
 	def __init__(self, path):
-		self.dict_list = list(DictReader(open(path, 'r')))
-		self.num_actions = len(self.dict_list)
+		self._path = path
+		self._numActions = None
+		self._file = open(path, 'r', newline='')
+		self._actions = self._ReadActions()
+		self._pending = next(self._actions, None)
 		self.next_action = 0
 
 	def HasAnotherAction(self):
-		return self.next_action < self.num_actions
+		return self._pending is not None
+
+	@property
+	def num_actions(self):
+		"""How many actions the log holds, counting them reads the whole file again the first time this is asked."""
+		if self._numActions is None:
+			with open(self._path, 'r', newline='') as log:
+				self._numActions = sum(1 for row in DictReader(log))
+		return self._numActions
 
 	def NextAction(self):
-		action_dict = self.dict_list[self.next_action]
+		if self._pending is None:
+			raise IndexError("No more actions in the log")
+
+		a = self._pending
 		self.next_action += 1
-		a = Action(action_dict["date"], action_dict["actor"], action_dict["action_type"], action_dict["target"], action_dict["metadata"])
-		return a
\ No newline at end of file
+		self._pending = next(self._actions, None)
+		return a
+
+	def Close(self):
+		self._pending = None
+		self._actions.close()
+		self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.Close()
+
+	def _ReadActions(self):
+		for action_dict in DictReader(self._file):
+			yield Action(action_dict["date"], action_dict["actor"], action_dict["action_type"], action_dict["target"], action_dict["metadata"])
+
+		self._file.close()
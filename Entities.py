@@ -1,5 +1,7 @@
 import logging
 from collections import namedtuple
+from functools import lru_cache
+from hashlib import blake2b
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +12,49 @@ STARTING_RANGE = 2
 Position = namedtuple("Position", ["x", "y"])
 AttackDrops = namedtuple("AttackDrops", ["AP", "gold", "kills", "lives"])
 
-class Tank:
+# Most distinct positions InternPosition keeps, a 256x256 board's worth. Past that the least recently used are dropped so
+# long running processes that see many boards don't keep every position forever, dropped ones are just made again.
+INTERNED_POSITIONS = 1 << 16
+
+@lru_cache(maxsize=INTERNED_POSITIONS)
+def InternPosition(x, y):
+	"""The one shared Position for a space, so positions that are parsed or generated over and over aren't duplicated."""
+	return Position(x, y)
+
+# Most bounding box cells the line of sight cache indexes before it is emptied, each cached pair costs the area of its
+# bounding box so this bounds the cache's memory however long a game or search runs
+LOS_CACHE_CELL_LIMIT = 1 << 20
+
+# Tank fields that are part of the game state hash
+TANK_HASHED_FIELDS = ("lives", "AP", "_gold", "range")
+
+def ZobristKey(feature):
+	"""
+	The random 64 bit key for one feature of the game state, such as a tank having 3 AP.
+
+	Keys are a digest of the feature itself so every process agrees on them without keeping them around.
+	"""
+	return int.from_bytes(blake2b(repr(feature).encode(), digest_size=8).digest(), "little")
+
+class ZobristHash:
+	"""A running hash of the game state, each feature is XORed in when it becomes true and out when it stops."""
+
+	def __init__(self, value=0):
+		self.value = value
+
+	def Toggle(self, feature):
+		self.value ^= ZobristKey(feature)
+
+def BoardFeature(entity):
+	return ("board", getattr(entity, "owner", type(entity).__name__), entity.position.x, entity.position.y)
+
+class BaseTank:
+	"""
+	Everything a tank does, without storage for the fields a TankTable can hold instead.
+
+	Tank keeps position, lives, AP, gold, range and kills in its own slots, TankTable.TableTank in a table row.
+	"""
+	__slots__ = ("owner", "maxLives", "maxAp", "_totalMoves", "_totalGold", "tile")
 
 	def __init__(self, position, owner, tile=None):
 		self.position = position
@@ -28,7 +72,7 @@ class Tank:
 		self._totalGold = 0
 
 		self.tile = tile if tile is not None else self.owner[:2]
-		
+
 	def HasLife(self, amount = 1):
 		return self.lives >= amount
 		
@@ -82,10 +126,33 @@ class Tank:
 	def _Die(self):
 		self.AP = 0
 
+	def GetState(self):
+		"""Everything about the tank that can change during a game, position first."""
+		return (self.position, self.lives, self.maxLives, self.AP, self.maxAp, self._gold, self.range, self.kills,
+				self._totalMoves, self._totalGold)
+
+	def SetState(self, state):
+		(self.position, self.lives, self.maxLives, self.AP, self.maxAp, self._gold, self.range, self.kills,
+		 self._totalMoves, self._totalGold) = state
+
+	def Copy(self):
+		"""Make an independent copy of this tank's state."""
+		copy = Tank.__new__(Tank)
+		for name in BaseTank.__slots__ + Tank.__slots__:
+			setattr(copy, name, getattr(self, name))
+		return copy
+
+	def HashFeatures(self):
+		return [("tank", self.owner, name, getattr(self, name)) for name in TANK_HASHED_FIELDS]
+
 	def __str__(self):
 		return f"{self.owner:15} - {self.position.x:2},{self.position.y:2} Lives: {self.lives} Range: {self.range} AP: {self.AP} Gold: {self._gold:2} Total Gold: {self._totalGold:3}"
 
+class Tank(BaseTank):
+	__slots__ = ("position", "lives", "AP", "_gold", "range", "kills")
+
 class Wall:
+	__slots__ = ("position", "durability")
 
 	def __init__(self, position, durability):
 		self.position = position
@@ -104,6 +171,18 @@ class Wall:
 			
 		return remove_from_board, AttackDrops(AP = gained_AP, gold = gained_gold, kills = gained_kills, lives = gained_lives)
 
+	def GetState(self):
+		return (self.position, self.durability)
+
+	def SetState(self, state):
+		self.position, self.durability = state
+
+	def Copy(self):
+		return Wall(self.position, self.durability)
+
+	def HashFeatures(self):
+		return [("wall", self.position.x, self.position.y, self.durability)]
+
 	@property
 	def tile(self):
 		return f"W{self.durability}"		
@@ -115,6 +194,13 @@ class Council:
 		self.councilors = []
 		self.senators = []
 
+	def Copy(self):
+		copy = Council()
+		copy.coffer = self.coffer
+		copy.councilors = list(self.councilors)
+		copy.senators = list(self.senators)
+		return copy
+
 class GoldMine:
 
 	def __init__(self):
@@ -124,11 +210,8 @@ class GoldMine:
 	def AddSpace(self, position):
 		self.spaces.append(position)
 
-	def AwardGold(self, tanksList, council):
-		tanksInMine = []
-		for tank in tanksList:
-			for space in self.spaces:
-				if tank.position.x == space.x and tank.position.y == space.y: tanksInMine.append(tank)
+	def AwardGold(self, tanksList, council, tanksByPosition=None):
+		tanksInMine = _FindTanksInSpaces(self.spaces, tanksList, tanksByPosition)
 
 		if not tanksInMine: return
 		awardPerTank = self.goldPerDay // len(tanksInMine)
@@ -145,11 +228,8 @@ class ExpandingGoldMine:
 		self.spaces.append(position)
 		self.goldPerDay += 1
 		
-	def AwardGold(self, tanksList, council):
-		tanksInMine = []
-		for tank in tanksList:
-			for space in self.spaces:
-				if tank.position.x == space.x and tank.position.y == space.y: tanksInMine.append(tank)
+	def AwardGold(self, tanksList, council, tanksByPosition=None):
+		tanksInMine = _FindTanksInSpaces(self.spaces, tanksList, tanksByPosition)
 
 		if not tanksInMine:
 			council.coffer += self.goldPerDay
@@ -161,12 +241,43 @@ class ExpandingGoldMine:
 			council.coffer += remainder
 
 
+def IndexTanksByPosition(tanksList):
+	"""
+	Group tanks by the space they are on.
+
+	Tanks that have been destroyed keep their last position so they are included too, mines have always paid them.
+	"""
+	tanksByPosition = {}
+	for tank in tanksList:
+		tanksByPosition.setdefault((tank.position.x, tank.position.y), []).append(tank)
+	return tanksByPosition
+
+def _FindTanksInSpaces(spaces, tanksList, tanksByPosition):
+	if tanksByPosition is None:
+		tanksByPosition = IndexTanksByPosition(tanksList)
+
+	tanksInSpaces = []
+	for space in spaces:
+		tanksInSpaces.extend(tanksByPosition.get((space.x, space.y), ()))
+	return tanksInSpaces
+
 class Board:
 	def __init__(self, width, height):
 		self.width = width
 		self.height = height
 		self.grid = [ [ None for y in range(height) ] for x in range(width) ]
 
+		# Off until EnableLineOfSightCache
+		self._losCache = None
+		self.ClearLineOfSightCache()
+
+		# Set by GameController.EnableStateHash
+		self.zobrist = None
+		# Set by TankGameThreats.ThreatMap
+		self.threatMap = None
+		# Set by TankGameSpectator.BoardStream
+		self.boardStream = None
+
 	def IsSpaceOccupied(self, position):
 		return self.grid[position.x][position.y] != None
 
@@ -175,57 +286,222 @@ class Board:
 			raise Exception(f"The space {entity.position} is already occupied can't add {entity}")
 
 		self.grid[entity.position.x][entity.position.y] = entity
+		self._SpaceChanged(entity)
 
 	def RemoveEntity(self, entity):
 		gridSpace = self.grid[entity.position.x][entity.position.y]
 		assert gridSpace is entity, \
 			f"Entity's position does not match the board state (position = {entity.position}, boardEntity = {gridSpace})"
 		self.grid[entity.position.x][entity.position.y] = None
+		self._SpaceChanged(entity)
 
-	def Render(self):
-		"""Render the game board to stdout using a series of 2 character tiles to represent each space."""
-		for y in range(self.height):
-			row = ""
+	def Copy(self, entityPairs):
+		"""
+		Make a board with the same spaces occupied.
 
-			for x in range(self.width):
-				tile = "  "
-				if self.grid[x][y] is not None:
-					tile = self.grid[x][y].tile
+		entityPairs - (original, copy) pairs, each original on this board is replaced by its copy. Entities that aren't
+		paired are shared with this board. The copy starts with an empty line of sight cache if this board has one.
+		"""
+		copy = Board.__new__(type(self))
+		copy.width = self.width
+		copy.height = self.height
+		copy.grid = [column[:] for column in self.grid]
+		for original, entityCopy in entityPairs:
+			position = original.position
+			if self.grid[position.x][position.y] is original:
+				copy.grid[position.x][position.y] = entityCopy
+		copy._losCache = None
+		copy.ClearLineOfSightCache()
+		if self._losCache is not None: copy.EnableLineOfSightCache()
+		copy.zobrist = None
+		copy.threatMap = None
+		copy.boardStream = None
+		return copy
+
+	def _SpaceChanged(self, entity):
+		if self._losCache is not None:
+			self._InvalidateLineOfSight(entity.position)
+		if self.zobrist is not None:
+			self.zobrist.Toggle(BoardFeature(entity))
+		if self.threatMap is not None:
+			self.threatMap.SpaceChanged(entity.position)
+		if self.boardStream is not None:
+			self.boardStream.EntityChanged(entity)
+
+	def EnableLineOfSightCache(self):
+		"""
+		Start caching DoesLineOfSightExist results.
 
-				if x > 0:
-					row += "|"
+		This pays off when the same pairs are asked about many times between changes, such as a search working on a
+		clone. Replaying a game moves something almost every action so the cache is off by default.
+		"""
+		if self._losCache is None: self._DropLineOfSightCache()
+
+	def DisableLineOfSightCache(self):
+		self._losCache = None
+		self._losKeysByCell = None
+		self._losCacheCells = 0
+
+	def ClearLineOfSightCache(self):
+		"""Drop every cached line of sight result and reset the hit/miss and VisibleCells counters."""
+		if self._losCache is not None: self._DropLineOfSightCache()
+		else: self.DisableLineOfSightCache()
+		self.losCacheHits = 0
+		self.losCacheMisses = 0
+		self.visibleCellScans = 0
+
+	def _DropLineOfSightCache(self):
+		# (initiator cell, target cell, ignored types) -> result, plus an index from every cell inside a cached pair's
+		# bounding box back to the keys that depend on it. _losCacheCells counts the index entries.
+		self._losCache = {}
+		self._losKeysByCell = {}
+		self._losCacheCells = 0
+
+	def Render(self, overlay=None):
+		"""
+		Render the game board to stdout using a series of 2 character tiles to represent each space.
 
-				row += tile
+		overlay - Called with x and y of each empty space, returns the 2 character tile to show there instead of blanks
+		"""
+		print(self.RenderFrame(overlay), end="")
 
+	def RenderFrame(self, overlay=None):
+		"""The text Render prints, built as one string."""
+		grid = self.grid
+		separator = "+".join(["--"] * self.width)
+		lines = []
+		for y in range(self.height):
 			if y > 0:
-				separator = self.width * "--+"
-				print(separator[:-1])
+				lines.append(separator)
+			if overlay is None:
+				lines.append("|".join("  " if grid[x][y] is None else grid[x][y].tile for x in range(self.width)))
+			else:
+				lines.append("|".join(overlay(x, y) if grid[x][y] is None else grid[x][y].tile for x in range(self.width)))
 
-			print(row)
-
-		print()
+		lines.append("")
+		return "\n".join(lines) + "\n"
 
 	def DoesLineOfSightExist(self, initiator, target, ignoredEntities=[]):
 		"""
 		Check if the initiator can see the target.
 
+		ignoredEntities - A list of types of entities that will not block line of sight
+
+		With EnableLineOfSightCache, results are cached until an entity is added to or removed from a space inside the
+		bounding box of the two positions. The whole cache is emptied once it indexes LOS_CACHE_CELL_LIMIT cells.
+		"""
+		if self._losCache is None:
+			self.losCacheMisses += 1
+			return self._ComputeLineOfSight(initiator.position, target.position, ignoredEntities)
+
+		key = (initiator.position, target.position, frozenset(ignoredEntities))
+		cached = self._losCache.get(key)
+		if cached is not None:
+			self.losCacheHits += 1
+			return cached
+
+		self.losCacheMisses += 1
+		result = self._ComputeLineOfSight(initiator.position, target.position, ignoredEntities)
+		area = (abs(initiator.position.x - target.position.x) + 1) * (abs(initiator.position.y - target.position.y) + 1)
+		if self._losCacheCells + area > LOS_CACHE_CELL_LIMIT:
+			self._DropLineOfSightCache()
+			if area > LOS_CACHE_CELL_LIMIT: return result
+
+		self._losCache[key] = result
+		self._losCacheCells += area
+		for cell in _BoundingBox(initiator.position, target.position):
+			self._losKeysByCell.setdefault(cell, set()).add(key)
+
+		return result
+
+	def VisibleCells(self, origin, visionRange, ignoredEntities=[]):
+		"""
+		Find every space within visionRange (Chebyshev distance) of origin that origin has line of sight to.
+
+		This is the same answer as calling DoesLineOfSightExist for each space but done in a single sweep outward
+		column by column. Every entity blocks an open interval of slopes for the columns behind it, so we keep a merged
+		list of those shadows and compare slopes exactly with integers instead of the float intercept test. The two are
+		tested to agree on boards up to 1000 spaces wide. The origin space itself is not included.
+
 		ignoredEntities - A list of types of entities that will not block line of sight
 		"""
+		self.visibleCellScans += 1
+		visible = set()
+
+		# Vertical lines only look at the spaces in between, same as DoesLineOfSightExist
+		for direction in (-1, 1):
+			y = origin.y + direction
+			while 0 <= y < self.height and abs(y - origin.y) <= visionRange:
+				visible.add(InternPosition(origin.x, y))
+				entity = self.grid[origin.x][y]
+				if entity is not None and type(entity) not in ignoredEntities: break
+				y += direction
+
+		for direction in (-1, 1):
+			self._SweepColumns(origin, visionRange, direction, ignoredEntities, visible)
+
+		return visible
+
+	def _SweepColumns(self, origin, visionRange, direction, ignoredEntities, visible):
+		min_y = max(0, origin.y - visionRange)
+		max_y = min(self.height - 1, origin.y + visionRange)
+
+		# Sorted, merged open intervals of blocked slopes dy/dx. Each bound is a (numerator, denominator) pair with a
+		# positive denominator so comparisons can be made by cross multiplying.
+		shadows = []
+		for dx in range(1, visionRange + 1):
+			x = origin.x + direction * dx
+			if not 0 <= x < self.width: break
+			column = self.grid[x]
+
+			# A space dy is hidden when lo < dy/dx < hi for some shadow
+			blocked = [((lo[0] * dx) // lo[1] + 1, -((-hi[0] * dx) // hi[1]) - 1) for lo, hi in shadows]
+			shadow = 0
+			for y in range(min_y, max_y + 1):
+				dy = y - origin.y
+				while shadow < len(blocked) and blocked[shadow][1] < dy:
+					shadow += 1
+				if shadow == len(blocked) or dy < blocked[shadow][0]:
+					visible.add(InternPosition(x, y))
+
+			# An entity at (dx, dy) hides the slopes within 0.4999 / dx of dy / dx
+			casters = []
+			for y in range(min_y, max_y + 1):
+				entity = column[y]
+				if entity is not None and type(entity) not in ignoredEntities:
+					dy = y - origin.y
+					casters.append(((10000 * dy - 4999, 10000 * dx), (10000 * dy + 4999, 10000 * dx)))
+
+			if casters:
+				shadows = _MergeShadows(shadows, casters)
+
+	def _InvalidateLineOfSight(self, position):
+		keys = self._losKeysByCell.pop((position.x, position.y), None)
+		if not keys: return
+
+		# The other cells of each key's bounding box keep pointing at it, removing it from them would walk the whole box
+		# every time. Those stale entries cost nothing but memory, which LOS_CACHE_CELL_LIMIT still bounds.
+		cache = self._losCache
+		for key in keys:
+			cache.pop(key, None)
+		if not cache: self._DropLineOfSightCache()
+
+	def _ComputeLineOfSight(self, initiatorPosition, targetPosition, ignoredEntities):
 		# Vertical lines doesn't work for slow intercept form but we can simply walk the spaces between the target and initiator
-		if target.position.x == initiator.position.x:
-			direction = -1 if target.position.y - initiator.position.y < 0 else 1
-			for y in range(initiator.position.y + direction, target.position.y, direction):
-				entity = self.grid[target.position.x][y]
+		if targetPosition.x == initiatorPosition.x:
+			direction = -1 if targetPosition.y - initiatorPosition.y < 0 else 1
+			for y in range(initiatorPosition.y + direction, targetPosition.y, direction):
+				entity = self.grid[targetPosition.x][y]
 				if entity is not None and type(entity) not in ignoredEntities:
 					logger.debug("Vertical hit: %s", entity)
 					return False
 
 			return True
 
-		min_x = min(initiator.position.x, target.position.x)
-		max_x = max(initiator.position.x, target.position.x)
-		min_y = min(initiator.position.y, target.position.y)
-		max_y = max(initiator.position.y, target.position.y)
+		min_x = min(initiatorPosition.x, targetPosition.x)
+		max_x = max(initiatorPosition.x, targetPosition.x)
+		min_y = min(initiatorPosition.y, targetPosition.y)
+		max_y = max(initiatorPosition.y, targetPosition.y)
 
 		# Find all entitys that we could intercept with this is important because the lines we use in our equations are
 		# infinatly long.  So we don't want to check if entitys behind the target intercept with our line of sight because
@@ -234,14 +510,14 @@ class Board:
 		for x in range(min_x, max_x + 1):
 			for y in range(min_y, max_y + 1):
 				current = Position(x, y)
-				if self.grid[x][y] is not None and initiator.position != current and target.position != current \
+				if self.grid[x][y] is not None and initiatorPosition != current and targetPosition != current \
 						and type(self.grid[x][y]) not in ignoredEntities:
 					possible_intercepts.append(self.grid[x][y])
 
 		logger.debug("Possible intercepts: %s", possible_intercepts)
 
-		slope = (target.position.y - initiator.position.y) / (target.position.x - initiator.position.x)
-		b = (initiator.position.y + 0.5) - (slope * initiator.position.x)
+		slope = (targetPosition.y - initiatorPosition.y) / (targetPosition.x - initiatorPosition.x)
+		b = (initiatorPosition.y + 0.5) - (slope * initiatorPosition.x)
 
 		logger.debug("Line of sight equation: y = %dx + %d", slope, b)
 
@@ -252,4 +528,34 @@ class Board:
 				logger.debug(f"Hit %s", intercept.position)
 				return False
 
-		return True
\ No newline at end of file
+		return True
+
+def _SlopeLess(a, b):
+	return a[0] * b[1] < b[0] * a[1]
+
+def _MergeShadows(shadowsA, shadowsB):
+	"""Merge two sorted lists of open slope intervals, joining any that overlap."""
+	merged = []
+	i = j = 0
+	while i < len(shadowsA) or j < len(shadowsB):
+		if j == len(shadowsB) or (i < len(shadowsA) and _SlopeLess(shadowsA[i][0], shadowsB[j][0])):
+			shadow = shadowsA[i]
+			i += 1
+		else:
+			shadow = shadowsB[j]
+			j += 1
+
+		# Open intervals that only touch leave the shared bound visible so they are kept apart
+		if merged and _SlopeLess(shadow[0], merged[-1][1]):
+			if _SlopeLess(merged[-1][1], shadow[1]):
+				merged[-1] = (merged[-1][0], shadow[1])
+		else:
+			merged.append(shadow)
+
+	return merged
+
+def _BoundingBox(positionA, positionB):
+	"""Yield every (x, y) cell in the rectangle spanned by two positions, inclusive."""
+	for x in range(min(positionA.x, positionB.x), max(positionA.x, positionB.x) + 1):
+		for y in range(min(positionA.y, positionB.y), max(positionA.y, positionB.y) + 1):
+			yield (x, y)
@@ -0,0 +1,153 @@
+import numpy as np
+from Entities import Board, Position, logger
+
+EMPTY = 0
+
+class _GridColumn:
+
+	def __init__(self, board, x):
+		self._board = board
+		self._x = x
+
+	def __getitem__(self, y):
+		return self._board._entities[self._board.ids[self._x, y]]
+
+	def __len__(self):
+		return self._board.height
+
+	def __iter__(self):
+		entities = self._board._entities
+		return (entities[entityId] for entityId in self._board.ids[self._x].tolist())
+
+class _GridView:
+	"""Read only stand in for Board.grid so grid[x][y] still returns the entity in a space or None."""
+
+	def __init__(self, board):
+		self._board = board
+
+	def __getitem__(self, x):
+		return _GridColumn(self._board, range(self._board.width)[x])
+
+	def __len__(self):
+		return self._board.width
+
+	def __iter__(self):
+		return (_GridColumn(self._board, x) for x in range(self._board.width))
+
+class NumpyBoard(Board):
+	"""
+	A Board that keeps its spaces in NumPy arrays instead of a list of lists of entities.
+
+	ids holds a small integer per space that indexes the entity table (0 for an empty space) and types holds a code
+	for the type of entity in each space so occupancy and line of sight can be answered with array operations.
+	"""
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self.ids = np.zeros((width, height), dtype=np.int32)
+		self.types = np.zeros((width, height), dtype=np.int8)
+		self._entities = [None]
+		self._freeIds = []
+		self._typeCodes = {}
+		self.grid = _GridView(self)
+		self._losCache = None
+		self.ClearLineOfSightCache()
+		self.zobrist = None
+		self.threatMap = None
+		self.boardStream = None
+
+	def Copy(self, entityPairs):
+		copy = NumpyBoard.__new__(NumpyBoard)
+		copy.width = self.width
+		copy.height = self.height
+		copy.ids = self.ids.copy()
+		copy.types = self.types.copy()
+		copy._entities = list(self._entities)
+		copy._freeIds = list(self._freeIds)
+		copy._typeCodes = dict(self._typeCodes)
+		copy.grid = _GridView(copy)
+		for original, entityCopy in entityPairs:
+			entityId = self.ids[original.position.x, original.position.y]
+			if self._entities[entityId] is original:
+				copy._entities[entityId] = entityCopy
+		copy._losCache = None
+		copy.ClearLineOfSightCache()
+		if self._losCache is not None: copy.EnableLineOfSightCache()
+		copy.zobrist = None
+		copy.threatMap = None
+		copy.boardStream = None
+		return copy
+
+	def IsSpaceOccupied(self, position):
+		return bool(self.ids[position.x, position.y] != EMPTY)
+
+	def AddEntity(self, entity):
+		if self.IsSpaceOccupied(entity.position):
+			raise Exception(f"The space {entity.position} is already occupied can't add {entity}")
+
+		if self._freeIds:
+			entityId = self._freeIds.pop()
+			self._entities[entityId] = entity
+		else:
+			entityId = len(self._entities)
+			self._entities.append(entity)
+
+		self.ids[entity.position.x, entity.position.y] = entityId
+		self.types[entity.position.x, entity.position.y] = self._TypeCode(type(entity))
+		self._SpaceChanged(entity)
+
+	def RemoveEntity(self, entity):
+		entityId = self.ids[entity.position.x, entity.position.y]
+		gridSpace = self._entities[entityId]
+		assert gridSpace is entity, \
+			f"Entity's position does not match the board state (position = {entity.position}, boardEntity = {gridSpace})"
+		self.ids[entity.position.x, entity.position.y] = EMPTY
+		self.types[entity.position.x, entity.position.y] = EMPTY
+		self._entities[entityId] = None
+		self._freeIds.append(int(entityId))
+		self._SpaceChanged(entity)
+
+	def _TypeCode(self, entityType):
+		code = self._typeCodes.get(entityType)
+		if code is None:
+			code = len(self._typeCodes) + 1
+			self._typeCodes[entityType] = code
+		return code
+
+	def _BlockingMask(self, types, ignoredEntities):
+		mask = types != EMPTY
+		for entityType in ignoredEntities:
+			code = self._typeCodes.get(entityType)
+			if code is not None:
+				mask &= types != code
+		return mask
+
+	def _ComputeLineOfSight(self, initiatorPosition, targetPosition, ignoredEntities):
+		min_x = min(initiatorPosition.x, targetPosition.x)
+		max_x = max(initiatorPosition.x, targetPosition.x)
+		min_y = min(initiatorPosition.y, targetPosition.y)
+		max_y = max(initiatorPosition.y, targetPosition.y)
+
+		# Vertical lines just check the spaces in between
+		if targetPosition.x == initiatorPosition.x:
+			between = self.types[targetPosition.x, min_y + 1:max_y]
+			return not self._BlockingMask(between, ignoredEntities).any()
+
+		blocking = self._BlockingMask(self.types[min_x:max_x + 1, min_y:max_y + 1], ignoredEntities)
+		blocking[initiatorPosition.x - min_x, initiatorPosition.y - min_y] = False
+		blocking[targetPosition.x - min_x, targetPosition.y - min_y] = False
+		xs, ys = np.nonzero(blocking)
+		if len(xs) == 0: return True
+		xs += min_x
+		ys += min_y
+
+		# Same float arithmetic as Board._ComputeLineOfSight so results match exactly
+		slope = (targetPosition.y - initiatorPosition.y) / (targetPosition.x - initiatorPosition.x)
+		b = (initiatorPosition.y + 0.5) - (slope * initiatorPosition.x)
+		hits = np.abs(((slope * xs) + b) - (ys + 0.5)) < 0.4999
+		if hits.any():
+			logger.debug("Hit %s", Position(int(xs[hits][0]), int(ys[hits][0])))
+			return False
+
+		return True
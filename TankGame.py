@@ -97,10 +97,10 @@ class BuildFourCornersMap(MapBuilder):
 		AddWalls(fourCornersController, 6, 7, 9, 9)
 		AddWalls(fourCornersController, 3, 7, 10, 10)
 	
-def SetupSeason2():
+def SetupSeason2(board_class=Board, tank_table=False):
 	geodeMapBuilder = BuildGeodeMap()
 	size = geodeMapBuilder.GetMapSize()
-	s2Controller = GameController(size[0], size[1], GetSeason2GameRules())
+	s2Controller = GameController(size[0], size[1], GetSeason2GameRules(), board_class, tank_table)
 
 	geodeMapBuilder.BuildMap(s2Controller)
 	s2Controller.AddTank(Position(1, 1), "Ryan")
@@ -134,10 +134,10 @@ def GetSeason2GameRules():
 					 giveLifeRule = OncePerDayGiveLifeRule(shareActions_sharedList),
 					 tradeGoldRule = FlatRateTradeGoldRule(3))
 	
-def SetupSeason3():
+def SetupSeason3(board_class=Board, tank_table=False):
 	fourCornersMapBuilder = BuildFourCornersMap()
 	size = fourCornersMapBuilder.GetMapSize()
-	s3Controller = GameController(size[0], size[1], GetSeason3GameRules())
+	s3Controller = GameController(size[0], size[1], GetSeason3GameRules(), board_class, tank_table)
 	s3Controller.gameRules.goldTransferRule.council_ref = s3Controller.council
 	
 	fourCornersMapBuilder.BuildMap(s3Controller)
@@ -184,10 +184,9 @@ if __name__ == "__main__":
 	controller.board.Render()
 	print()
 	
-	actionSource = CsvActionSource(CSV_PATH)
-	
 	tg_interactor = Interactor(controller)
-	tg_interactor.TakeActions(actionSource)
+	with CsvActionSource(CSV_PATH) as actionSource:
+		tg_interactor.TakeActions(actionSource)
 	
 	print("Post Actions")
 	PrintTanks(controller)
@@ -0,0 +1,142 @@
+"""
+Computer controlled tanks that search with Monte Carlo tree search.
+
+The tree covers the sequence of actions the searching tank takes today, ending its turn is one of the choices at every
+node. Each playout applies a path through the tree to a working copy of the game, ends the turn there and plays
+rollout_days more days with random actions for every tank, scores the result with an evaluation function and then
+undoes all of it to get back to the starting state.
+"""
+import math
+import time
+from TankGameSimulator import Policy
+from Entities import IndexTanksByPosition
+
+END_TURN = None
+
+LIFE_WEIGHT = 10.0
+AP_WEIGHT = 1.0
+GOLD_WEIGHT = 0.5
+RANGE_WEIGHT = 3.0
+KILL_WEIGHT = 5.0
+MINE_WEIGHT = 1.0
+# Score difference that makes a playout worth about 0.73
+EVALUATION_SCALE = 10.0
+
+def _MinePayouts(controller):
+	"""Gold each tank would get from the mines if the day started now, by id(tank)."""
+	tanksByPosition = IndexTanksByPosition(controller.tanks)
+	payouts = {}
+	for mine in controller.goldMines:
+		tanksInMine = [tank for space in mine.spaces for tank in tanksByPosition.get((space.x, space.y), ())]
+		for tank in tanksInMine:
+			payouts[id(tank)] = payouts.get(id(tank), 0) + mine.goldPerDay // len(tanksInMine)
+	return payouts
+
+def _TankValue(tank, payouts):
+	return LIFE_WEIGHT * tank.lives + AP_WEIGHT * tank.AP + GOLD_WEIGHT * tank._gold + RANGE_WEIGHT * tank.range + \
+		KILL_WEIGHT * tank.kills + MINE_WEIGHT * payouts.get(id(tank), 0)
+
+def EvaluateTank(controller, tank):
+	"""
+	Score how well tank is doing compared to its rivals, between 0 and 1.
+
+	Rivals are averaged over every other tank that started the game with destroyed tanks counting as 0, so getting rid
+	of a rival always helps.
+	"""
+	if tank.lives == 0: return 0.0
+	if len(controller.tanks) == 1: return 1.0
+
+	payouts = _MinePayouts(controller)
+	rivals = sum(_TankValue(other, payouts) for other in controller.tanks if other is not tank and other.lives > 0)
+	score = _TankValue(tank, payouts) - rivals / (len(controller.tanks) - 1)
+	return 1.0 / (1.0 + math.exp(-score / EVALUATION_SCALE))
+
+class _Node:
+	__slots__ = ("action", "parent", "depth", "children", "untried", "visits", "reward")
+
+	def __init__(self, action, parent, untried):
+		self.action = action
+		self.parent = parent
+		self.depth = 0 if parent is None else parent.depth + 1
+		self.children = []
+		self.untried = untried
+		self.visits = 0
+		self.reward = 0.0
+
+class MctsPolicy(Policy):
+
+	def __init__(self, time_budget=1.0, max_playouts=None, exploration=1.4, rollout_days=1, actions_per_day=10, evaluate=EvaluateTank):
+		"""
+		time_budget - Seconds to search for each decision
+		max_playouts - Stop searching early after this many playouts
+		actions_per_day - Most actions a tank takes in a day, both for the searching tank and in rollouts
+		evaluate - Scores a controller for a tank between 0 and 1
+		"""
+		self.timeBudget = time_budget
+		self.maxPlayouts = max_playouts
+		self.exploration = exploration
+		self.rolloutDays = rollout_days
+		self.actionsPerDay = actions_per_day
+		self.evaluate = evaluate
+		self.lastPlayouts = 0
+
+	def ChooseAction(self, controller, owner, legalActions, rng):
+		root = _Node(END_TURN, None, list(legalActions) + [END_TURN])
+		work = controller.Clone()
+		work.EnableUndo()
+		actor = work._GetTankByOwner(owner)
+
+		deadline = time.perf_counter() + self.timeBudget
+		playouts = 0
+		while playouts == 0 or (time.perf_counter() < deadline and (self.maxPlayouts is None or playouts < self.maxPlayouts)):
+			node = root
+			while not node.untried and node.children:
+				node = max(node.children, key=lambda child: self._Uct(node, child))
+				self._Apply(work, owner, node.action)
+
+			if node.untried:
+				action = node.untried.pop(rng.randrange(len(node.untried)))
+				self._Apply(work, owner, action)
+				child = _Node(action, node, [])
+				if action is not END_TURN and child.depth < self.actionsPerDay:
+					child.untried = work.LegalActions(owner) + [END_TURN]
+				node.children.append(child)
+				node = child
+
+			reward = self._Rollout(work, actor, node, rng)
+			while node is not None:
+				node.visits += 1
+				node.reward += reward
+				node = node.parent
+
+			while work.Undo(): pass
+			playouts += 1
+
+		self.lastPlayouts = playouts
+		return max(root.children, key=lambda child: child.visits).action
+
+	def _Uct(self, parent, child):
+		return child.reward / child.visits + self.exploration * math.sqrt(math.log(parent.visits) / child.visits)
+
+	def _Apply(self, controller, owner, action):
+		if action is not END_TURN:
+			controller.PerformLegalAction(owner, action)
+
+	def _PlayRandomly(self, controller, owner, actions, rng):
+		for _ in range(actions):
+			legalActions = controller.LegalActions(owner)
+			choice = rng.randrange(len(legalActions) + 1)
+			if choice == len(legalActions): return
+			controller.PerformLegalAction(owner, legalActions[choice])
+
+	def _Rollout(self, controller, actor, node, rng):
+		# The tree already covers every way to spend the rest of today so the searching tank ends its turn here
+		for _ in range(self.rolloutDays):
+			if actor.lives == 0: break
+			controller.StartOfTurn()
+			tanks = [tank for tank in controller.tanks if tank.lives > 0]
+			rng.shuffle(tanks)
+			for tank in tanks:
+				self._PlayRandomly(controller, tank.owner, self.actionsPerDay, rng)
+
+		return self.evaluate(controller, actor)
@@ -0,0 +1,78 @@
+"""
+Replay many action logs at once across a pool of processes.
+
+Each ReplayJob names a log and a setup function such as SetupSeason2 that builds the controller the log is replayed on.
+Jobs are independent so throughput grows with the number of worker processes.
+"""
+import io
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from BinaryActionSource import BinaryActionSource
+from CsvActionSource import CsvActionSource
+from TankGameInteractor import Interactor
+from TankGameTimeline import CaptureSnapshot
+
+# setup - A picklable function that takes no arguments and returns a new GameController, for example SetupSeason3
+ReplayJob = namedtuple("ReplayJob", ["log_path", "setup"])
+
+# snapshot and tanks describe the final state, output is everything the game printed while replaying and error is the
+# traceback of the exception that stopped the replay, if any.
+ReplayResult = namedtuple("ReplayResult", ["log_path", "actions", "seconds", "snapshot", "tanks", "output", "error"])
+
+def OpenActionSource(path):
+	if path.endswith(".tgal"):
+		return BinaryActionSource(path)
+	return CsvActionSource(path)
+
+def ReplayLog(job):
+	"""Replay a single job in this process."""
+	start = time.perf_counter()
+	output = io.StringIO()
+	controller = None
+	interactor = None
+	actions = 0
+	error = None
+
+	try:
+		with redirect_stdout(output):
+			controller = job.setup()
+			interactor = Interactor(controller)
+			with OpenActionSource(job.log_path) as action_source:
+				while action_source.HasAnotherAction():
+					interactor.TakeAction(action_source.NextAction())
+					actions += 1
+	except Exception:
+		error = traceback.format_exc()
+
+	seconds = time.perf_counter() - start
+	snapshot = None if controller is None else CaptureSnapshot(controller)
+	tanks = None if controller is None else [str(tank) for tank in controller.tanks]
+	return ReplayResult(job.log_path, actions, seconds, snapshot, tanks, output.getvalue(), error)
+
+def ReplayBatch(jobs, max_workers=None):
+	"""Replay every job across max_workers processes (one per core by default) and return results in job order."""
+	jobs = list(jobs)
+	if not jobs: return []
+
+	with ProcessPoolExecutor(max_workers=max_workers) as executor:
+		return list(executor.map(ReplayLog, jobs, chunksize=1))
+
+if __name__ == "__main__":
+	from TankGame import SetupSeason2, SetupSeason3
+
+	setups = {"2": SetupSeason2, "3": SetupSeason3}
+	if len(sys.argv) < 3 or sys.argv[1] not in setups:
+		print("Usage: python TankGameBatch.py <season 2|3> <log> [<log> ...]")
+		sys.exit(1)
+
+	start = time.perf_counter()
+	results = ReplayBatch(ReplayJob(path, setups[sys.argv[1]]) for path in sys.argv[2:])
+	for result in results:
+		status = "ok" if result.error is None else "FAILED " + result.error.strip().splitlines()[-1]
+		print(f"{result.log_path}: {result.actions} actions in {result.seconds:.3f}s {status}")
+	print(f"{len(results)} logs in {time.perf_counter() - start:.3f}s on {os.cpu_count()} cores")
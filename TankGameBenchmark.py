@@ -0,0 +1,444 @@
+"""
+Rough performance benchmarks for the game engine.
+
+Run with `python TankGameBenchmark.py`, each benchmark prints how long it took and how many actions per second that is.
+
+`python TankGameBenchmark.py suite small|large [results.json] [baseline.json]` runs the regression suite on synthetic
+boards instead, up to 1000x1000 with thousands of tanks and walls at the large scale. It can save the results as json
+and compare them against a file saved from an earlier commit, exiting with an error if anything got slower.
+"""
+import copy
+import csv
+import functools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from BinaryActionSource import BinaryActionSource, ConvertCsvToBinary
+from CsvActionSource import CsvActionSource
+from Entities import Position, Board, Wall, GoldMine, ExpandingGoldMine, IndexTanksByPosition
+from TankGame import GetSeason2GameRules, SetupSeason3
+from TankGameAI import MctsPolicy
+from TankGameBatch import ReplayBatch, ReplayJob
+from TankGameController import GameController
+from TankGameInteractor import Interactor, Action, ListActionSource, MOVE_ACTION, PositionToAlgebraicNotation
+
+TILE_CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+# Algebraic notation only has letters for 26 columns
+LARGE_GAME_WIDTH = 26
+
+def TankName(index):
+	return f"Tank {index}"
+
+def TankTile(index):
+	"""A unique tile of at least two characters for each index."""
+	tile = ""
+	while index or len(tile) < 2:
+		tile = TILE_CHARACTERS[index % len(TILE_CHARACTERS)] + tile
+		index //= len(TILE_CHARACTERS)
+	return tile
+
+def BuildLargeGame(numTanks, seed=0):
+	"""Scatter numTanks tanks over a board with roughly twice as many spaces as tanks."""
+	rng = random.Random(seed)
+	height = max(1, (numTanks * 2) // LARGE_GAME_WIDTH)
+	controller = GameController(LARGE_GAME_WIDTH, height, GetSeason2GameRules())
+	spaces = [Position(x, y) for x in range(LARGE_GAME_WIDTH) for y in range(height)]
+	for index, position in enumerate(rng.sample(spaces, numTanks)):
+		controller.AddTank(position, TankName(index), tile=TankTile(index))
+	return controller
+
+def BuildSyntheticGame(width, height, numTanks, numWalls, numMines, seed=0, board_class=Board):
+	"""
+	Scatter tanks, walls and 3x3 gold mines over a board of any size.
+
+	Half the mines are expanding mines. Tanks are named with TankName and TankTile so they can be used with
+	GenerateMoveLog.
+	"""
+	rng = random.Random(seed)
+	controller = GameController(width, height, GetSeason2GameRules(), board_class)
+	spaces = set()
+	while len(spaces) < numTanks + numWalls:
+		spaces.add(Position(rng.randrange(width), rng.randrange(height)))
+	spaces = sorted(spaces)
+	rng.shuffle(spaces)
+
+	for index, position in enumerate(spaces[:numTanks]):
+		controller.AddTank(position, TankName(index), tile=TankTile(index))
+	for position in spaces[numTanks:]:
+		controller.AddWall(position)
+
+	for index in range(numMines):
+		mine = GoldMine() if index % 2 == 0 else ExpandingGoldMine()
+		corner = Position(rng.randrange(width - 2), rng.randrange(height - 2))
+		for x in range(3):
+			for y in range(3):
+				mine.AddSpace(Position(corner.x + x, corner.y + y))
+		controller.goldMines.append(mine)
+
+	return controller
+
+def GenerateMoveLog(controller, numActions, actionsPerDay, seed=0, algebraic=True):
+	"""
+	Generate a log of legal single space moves for the tanks in controller without changing it.
+
+	algebraic - Write targets in algebraic notation like a csv log does, which only works up to 26 columns. Otherwise
+	            targets are left as Position.
+	"""
+	rng = random.Random(seed)
+	board = controller.board
+	positions = {tank.owner: tank.position for tank in controller.tanks}
+	occupied = set(positions.values()) | {wall.position for wall in controller.walls}
+	owners = list(positions)
+
+	actions = []
+	while len(actions) < numActions:
+		owner = rng.choice(owners)
+		current = positions[owner]
+		target = Position(current.x + rng.choice((-1, 0, 1)), current.y + rng.choice((-1, 0, 1)))
+		if not (0 <= target.x < board.width and 0 <= target.y < board.height) or target in occupied: continue
+
+		occupied.remove(current)
+		occupied.add(target)
+		positions[owner] = target
+		date = str(len(actions) // actionsPerDay)
+		actions.append(Action(date, owner, MOVE_ACTION, PositionToAlgebraicNotation(target) if algebraic else target, ""))
+
+	return actions
+
+def WriteCsvLog(actions, path):
+	with open(path, "w", newline="") as log:
+		writer = csv.writer(log)
+		writer.writerow(Action._fields)
+		writer.writerows(actions)
+
+def _LinearScanGetTankByOwner(self, owner):
+	for tank in self.tanks:
+		if owner == tank.owner or owner == tank.tile:
+			return tank
+	raise Exception("No tank found with owner name: " + owner + "!")
+
+def TimeReplay(controller, actions):
+	"""Time replaying actions, either a list of Action or an action source."""
+	action_source = ListActionSource(actions) if isinstance(actions, list) else actions
+	start = time.perf_counter()
+	Interactor(controller).TakeActions(action_source)
+	return time.perf_counter() - start
+
+def BenchmarkTankLookup(numTanks=1000, numActions=20000):
+	"""Compare replay throughput of indexed tank lookup against the old linear scan."""
+	actions = GenerateMoveLog(BuildLargeGame(numTanks), numActions, actionsPerDay=numTanks)
+
+	indexed = TimeReplay(BuildLargeGame(numTanks), actions)
+
+	scanning = BuildLargeGame(numTanks)
+	scanning._GetTankByOwner = types.MethodType(_LinearScanGetTankByOwner, scanning)
+	linear = TimeReplay(scanning, actions)
+
+	return {"tanks": numTanks, "actions": numActions, "indexed_seconds": indexed, "linear_seconds": linear}
+
+def _TimeRead(action_source):
+	start = time.perf_counter()
+	with action_source:
+		while action_source.HasAnotherAction():
+			action_source.NextAction()
+	return time.perf_counter() - start
+
+def BenchmarkActionLogFormats(numTanks=1000, numActions=200000):
+	"""Compare reading and replaying the same log from csv and from the binary format."""
+	controller = BuildLargeGame(numTanks)
+	actions = GenerateMoveLog(controller, numActions, actionsPerDay=numTanks)
+
+	with tempfile.TemporaryDirectory() as directory:
+		csvPath = os.path.join(directory, "log.csv")
+		binaryPath = os.path.join(directory, "log.tgal")
+		WriteCsvLog(actions, csvPath)
+		ConvertCsvToBinary(csvPath, binaryPath)
+
+		return {
+			"tanks": numTanks,
+			"actions": numActions,
+			"csv_read_seconds": _TimeRead(CsvActionSource(csvPath)),
+			"binary_read_seconds": _TimeRead(BinaryActionSource(binaryPath)),
+			"csv_replay_seconds": TimeReplay(BuildLargeGame(numTanks), CsvActionSource(csvPath)),
+			"binary_replay_seconds": TimeReplay(BuildLargeGame(numTanks), BinaryActionSource(binaryPath)),
+		}
+
+def BenchmarkClone(numClones=2000):
+	"""Compare GameController.Clone against copy.deepcopy on the season 3 map."""
+	controller = SetupSeason3()
+
+	start = time.perf_counter()
+	for _ in range(numClones):
+		controller.Clone()
+	cloneSeconds = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for _ in range(numClones):
+		copy.deepcopy(controller)
+	deepcopySeconds = time.perf_counter() - start
+
+	return {"clones": numClones, "clone_seconds": cloneSeconds, "deepcopy_seconds": deepcopySeconds}
+
+def BenchmarkMcts(seconds=5.0):
+	"""Count how many MCTS playouts a season 3 tank gets through in a fixed search time."""
+	controller = SetupSeason3()
+	for _ in range(3):
+		controller.StartOfTurn()
+
+	policy = MctsPolicy(time_budget=seconds)
+	start = time.perf_counter()
+	policy.ChooseAction(controller, "Ryan", controller.LegalActions("Ryan"), random.Random(0))
+	return {"playouts": policy.lastPlayouts, "search_seconds": time.perf_counter() - start}
+
+def BenchmarkHookOverhead(numCalls=200000):
+	"""
+	Time StartOfTurn on an empty board with undo and instrumentation both disabled, through the hook and without it.
+
+	The difference is what the hook costs every action when neither feature is in use.
+	"""
+	controller = GameController(1, 1, GetSeason2GameRules())
+	unhooked = GameController.StartOfTurn.__wrapped__
+
+	start = time.perf_counter()
+	for _ in range(numCalls):
+		controller.StartOfTurn()
+	hookedSeconds = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for _ in range(numCalls):
+		unhooked(controller)
+	unhookedSeconds = time.perf_counter() - start
+
+	return {"calls": numCalls, "hooked_seconds": hookedSeconds, "unhooked_seconds": unhookedSeconds}
+
+def BenchmarkBatchScaling(numJobs=32, numTanks=200, numActions=5000, max_workers=None):
+	"""
+	Time ReplayBatch on the same jobs with 1, 2, 4 and so on workers up to max_workers (one per core by default).
+
+	The jobs are independent so jobs per second should grow about linearly with workers until they run out of cores.
+	"""
+	max_workers = max_workers or os.cpu_count()
+	actions = GenerateMoveLog(BuildLargeGame(numTanks), numActions, actionsPerDay=numTanks)
+
+	result = {"jobs": numJobs}
+	with tempfile.TemporaryDirectory() as directory:
+		logPath = os.path.join(directory, "log.csv")
+		WriteCsvLog(actions, logPath)
+		jobs = [ReplayJob(logPath, functools.partial(BuildLargeGame, numTanks))] * numJobs
+
+		workers = 1
+		while True:
+			start = time.perf_counter()
+			replays = ReplayBatch(jobs, max_workers=workers)
+			result[f"{workers}_workers_seconds"] = time.perf_counter() - start
+			failed = [replay.error for replay in replays if replay.error is not None]
+			if failed: raise Exception(f"A benchmark replay failed:\n{failed[0]}")
+			if workers >= max_workers: break
+			workers = min(workers * 2, max_workers)
+
+	return result
+
+# Parameters for each suite scale. size is the width and height of the synthetic board.
+SUITE_SCALES = {
+	"small": {"size": 100, "tanks": 500, "walls": 1000, "mines": 20, "actions": 20000, "queries": 20000, "days": 200,
+			  "lookups": 500000},
+	"large": {"size": 1000, "tanks": 5000, "walls": 20000, "mines": 500, "actions": 200000, "queries": 200000,
+			  "days": 50, "lookups": 2000000},
+}
+
+# How far apart the two ends of a line of sight query are, about the range a tank can upgrade to
+LINE_OF_SIGHT_DISTANCE = 8
+
+def BenchmarkLineOfSight(game, numQueries, seed=0):
+	"""Time DoesLineOfSightExist from random tanks to spaces near them, without the cache, with it empty and then warm."""
+	rng = random.Random(seed)
+	board = game.board
+	queries = []
+	while len(queries) < numQueries:
+		tank = rng.choice(game.tanks)
+		x = tank.position.x + rng.randint(-LINE_OF_SIGHT_DISTANCE, LINE_OF_SIGHT_DISTANCE)
+		y = tank.position.y + rng.randint(-LINE_OF_SIGHT_DISTANCE, LINE_OF_SIGHT_DISTANCE)
+		if 0 <= x < board.width and 0 <= y < board.height:
+			queries.append((tank, board.grid[x][y] or types.SimpleNamespace(position=Position(x, y))))
+
+	cacheWasOn = board._losCache is not None
+	board.DisableLineOfSightCache()
+	start = time.perf_counter()
+	for initiator, target in queries:
+		board.DoesLineOfSightExist(initiator, target)
+	uncachedSeconds = time.perf_counter() - start
+
+	board.EnableLineOfSightCache()
+	start = time.perf_counter()
+	for initiator, target in queries:
+		board.DoesLineOfSightExist(initiator, target)
+	coldSeconds = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for initiator, target in queries:
+		board.DoesLineOfSightExist(initiator, target)
+	cachedSeconds = time.perf_counter() - start
+
+	if not cacheWasOn: board.DisableLineOfSightCache()
+	return {"queries": numQueries, "uncached_seconds": uncachedSeconds, "cold_seconds": coldSeconds,
+			"cached_seconds": cachedSeconds}
+
+def BenchmarkAwardGold(game, numDays, scanning=True):
+	"""
+	Time paying every mine for numDays days, looking tanks up through a shared position index.
+
+	scanning - Also time each mine scanning every tank, which takes minutes on the large suite
+	"""
+	council = copy.copy(game.council)
+
+	start = time.perf_counter()
+	for _ in range(numDays):
+		tanksByPosition = IndexTanksByPosition(game.tanks)
+		for mine in game.goldMines:
+			mine.AwardGold(game.tanks, council, tanksByPosition)
+	result = {"days": numDays, "indexed_seconds": time.perf_counter() - start}
+
+	if scanning:
+		start = time.perf_counter()
+		for _ in range(numDays):
+			for mine in game.goldMines:
+				mine.AwardGold(game.tanks, council)
+		result["scanning_seconds"] = time.perf_counter() - start
+
+	return result
+
+def BenchmarkStartOfTurn(game, numDays):
+	start = time.perf_counter()
+	for _ in range(numDays):
+		game.StartOfTurn()
+	return {"days": numDays, "start_of_turn_seconds": time.perf_counter() - start}
+
+def BenchmarkGetTankByOwner(game, numLookups, seed=0):
+	"""Time looking tanks up by owner and by tile."""
+	rng = random.Random(seed)
+	names = [name for tank in game.tanks for name in (tank.owner, tank.tile)]
+	lookups = [rng.choice(names) for _ in range(numLookups)]
+
+	start = time.perf_counter()
+	for name in lookups:
+		game._GetTankByOwner(name)
+	return {"lookups": numLookups, "lookup_seconds": time.perf_counter() - start}
+
+def BenchmarkTakeActions(game, numActions, actionsPerDay):
+	"""Time replaying a long log of moves through Interactor.TakeActions, day rollovers included."""
+	actions = GenerateMoveLog(game, numActions, actionsPerDay, algebraic=False)
+	return {"actions": numActions, "take_actions_seconds": TimeReplay(game, actions)}
+
+def GitCommit():
+	try:
+		return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+							  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def RunSuite(scale="small", seed=0, repeat=3):
+	"""
+	Run every regression benchmark at one of the SUITE_SCALES and return the results as a json friendly dict.
+
+	Every timing is stored under a key ending in _seconds so results from different commits can be compared with
+	CompareResults. Each is the fastest of repeat runs to keep noise from other processes out of the comparison.
+	"""
+	results = _RunSuiteOnce(scale, seed)
+	for _ in range(repeat - 1):
+		for name, result in _RunSuiteOnce(scale, seed).items():
+			for key, value in result.items():
+				if key.endswith("_seconds"): results[name][key] = min(results[name][key], value)
+
+	return {
+		"scale": scale,
+		"params": SUITE_SCALES[scale],
+		"commit": GitCommit(),
+		"python": platform.python_version(),
+		"repeat": repeat,
+		"results": results,
+	}
+
+def _RunSuiteOnce(scale, seed):
+	params = SUITE_SCALES[scale]
+	size = params["size"]
+	BuildGame = lambda: BuildSyntheticGame(size, size, params["tanks"], params["walls"], params["mines"], seed)
+
+	results = {}
+	results["line_of_sight"] = BenchmarkLineOfSight(BuildGame(), params["queries"], seed)
+	results["award_gold"] = BenchmarkAwardGold(BuildGame(), params["days"], scanning=scale != "large")
+	results["start_of_turn"] = BenchmarkStartOfTurn(BuildGame(), params["days"])
+	results["get_tank_by_owner"] = BenchmarkGetTankByOwner(BuildGame(), params["lookups"], seed)
+	results["take_actions"] = BenchmarkTakeActions(BuildGame(), params["actions"], actionsPerDay=params["tanks"])
+	logFormats = BenchmarkActionLogFormats(params["tanks"], params["actions"])
+	results["csv_action_source"] = {
+		"actions": params["actions"],
+		"read_seconds": logFormats["csv_read_seconds"],
+		"replay_seconds": logFormats["csv_replay_seconds"],
+	}
+	return results
+
+def CompareResults(baseline, current, threshold=0.2):
+	"""
+	List the timings in current that are more than threshold slower than in baseline.
+
+	Returns (benchmark, timing, baseline seconds, current seconds) for each regression.
+	"""
+	if baseline["params"] != current["params"]:
+		raise Exception(f"The baseline was run with {baseline['params']}, can't compare it against a run with {current['params']}")
+
+	regressions = []
+	for name, result in current["results"].items():
+		old = baseline["results"].get(name, {})
+		for key, seconds in result.items():
+			if key.endswith("_seconds") and key in old and seconds > old[key] * (1 + threshold):
+				regressions.append((name, key, old[key], seconds))
+	return regressions
+
+def PrintResult(name, result, unit="actions"):
+	"""Print every *_seconds entry of a benchmark result along with the rate of unit per second."""
+	print(name + ": " + ", ".join(f"{value} {key}" for key, value in result.items() if not key.endswith("_seconds")))
+	for key, seconds in result.items():
+		if key.endswith("_seconds"):
+			label = key[:-len("_seconds")]
+			print(f"  {label:14} {seconds:8.3f}s {result[unit] / seconds:12.0f} {unit}/s")
+
+def _RunSuiteCommand(args):
+	if not args or args[0] not in SUITE_SCALES or len(args) > 3:
+		print("Usage: python TankGameBenchmark.py suite small|large [results.json] [baseline.json]")
+		sys.exit(1)
+
+	report = RunSuite(args[0])
+	for name, result in report["results"].items():
+		PrintResult(name, result, unit=next(iter(result)))
+
+	if len(args) > 1:
+		with open(args[1], "w") as resultsFile:
+			json.dump(report, resultsFile, indent=2)
+
+	if len(args) > 2:
+		with open(args[2]) as baselineFile:
+			baseline = json.load(baselineFile)
+		regressions = CompareResults(baseline, report)
+		for name, key, old, new in regressions:
+			print(f"REGRESSION {name} {key}: {old:.3f}s -> {new:.3f}s ({new / old - 1:+.0%})")
+		if regressions: sys.exit(1)
+		print(f"No regressions against {baseline['commit'] or args[2]}")
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == "suite":
+		_RunSuiteCommand(sys.argv[2:])
+		sys.exit(0)
+
+	PrintResult("Tank lookup", BenchmarkTankLookup())
+	PrintResult("Action log formats", BenchmarkActionLogFormats())
+	PrintResult("Clone season 3", BenchmarkClone(), unit="clones")
+	PrintResult("MCTS season 3", BenchmarkMcts(), unit="playouts")
+	PrintResult("Disabled undo and instrumentation hook", BenchmarkHookOverhead(), unit="calls")
+	PrintResult(f"Batch replay on {os.cpu_count()} cores", BenchmarkBatchScaling(), unit="jobs")
@@ -0,0 +1,167 @@
+"""
+Per-day state checksums stored next to an action log, and a bisection tool for replays that stop agreeing.
+
+A checksum file is a csv of date and the controller's StateHash at the end of that date, written by a replay that is
+known to be right. Interactor.TakeActions checks a replay against it and stops on the first day that differs.
+BisectDesync then narrows that down to the exact action by replaying from checkpoints, taking O(log n) probes.
+"""
+import csv
+import io
+import sys
+from collections import namedtuple
+from contextlib import redirect_stdout
+from TankGameInteractor import Interactor
+
+# actions - How many actions had been applied when the replays first differed, action is the last of them (None if
+# they differ before any action). probes counts the partial replays it took to find it.
+Desync = namedtuple("Desync", ["actions", "action", "referenceHash", "suspectHash", "probes"])
+
+def ChecksumPath(log_path):
+	return log_path + ".sums"
+
+def RecordChecksums(controller_factory, action_source):
+	"""Replay action_source on a new controller and return {date: state hash at the end of that date}."""
+	controller = controller_factory()
+	controller.EnableStateHash()
+	interactor = Interactor(controller)
+	checksums = {}
+
+	while action_source.HasAnotherAction():
+		action = action_source.NextAction()
+		if interactor.date is not None and action.date != interactor.date:
+			checksums[interactor.date] = controller.StateHash()
+		interactor.TakeAction(action)
+
+	if interactor.date is not None:
+		checksums[interactor.date] = controller.StateHash()
+	return checksums
+
+def WriteChecksums(path, checksums):
+	with open(path, "w", newline="") as checksumFile:
+		writer = csv.writer(checksumFile)
+		writer.writerow(["date", "checksum"])
+		for date, checksum in checksums.items():
+			writer.writerow([date, f"{checksum:016x}"])
+
+def ReadChecksums(path):
+	with open(path, "r", newline="") as checksumFile:
+		return {row["date"]: int(row["checksum"], 16) for row in csv.DictReader(checksumFile)}
+
+def BisectDesync(actions, reference_factory, suspect_factory, checksums=None):
+	"""
+	Find the first action after which replaying actions on suspect_factory's controller stops matching
+	reference_factory's, returns a Desync or None if they agree.
+
+	checksums - The reference's {date: hash}. When given, the suspect is checked against them day by day first so only
+	            the day that went wrong is bisected.
+	"""
+	actions = list(actions)
+	with redirect_stdout(io.StringIO()):
+		suspect = suspect_factory()
+		suspect.EnableStateHash()
+		start, end = 0, len(actions)
+		if checksums is not None:
+			badDay = _FindBadDay(actions, suspect, checksums)
+			if badDay is None: return None
+			start, end, suspect = badDay
+
+		reference = reference_factory()
+		reference.EnableStateHash()
+		_Replay(reference, actions, 0, start)
+		if reference.StateHash() != suspect.StateHash():
+			if checksums is not None:
+				raise Exception(f"The reference doesn't match the checksums after {start} actions")
+			return Desync(0, None, reference.StateHash(), suspect.StateHash(), 0)
+
+		# Invariant: the replays agree after start actions, reference and suspect hold that state, and they differ
+		# after end actions unless that hasn't been checked yet
+		probes = 0
+		endHashes = None
+		while endHashes is None or end - start > 1:
+			middle = end if endHashes is None else (start + end) // 2
+			referenceProbe = reference.Clone()
+			suspectProbe = suspect.Clone()
+			_Replay(referenceProbe, actions, start, middle)
+			_Replay(suspectProbe, actions, start, middle)
+			probes += 1
+
+			hashes = (referenceProbe.StateHash(), suspectProbe.StateHash())
+			if hashes[0] == hashes[1]:
+				if middle == end: return None
+				start, reference, suspect = middle, referenceProbe, suspectProbe
+			else:
+				end, endHashes = middle, hashes
+
+	return Desync(end, actions[end - 1], endHashes[0], endHashes[1], probes)
+
+def _FindBadDay(actions, controller, checksums):
+	"""
+	Check a replay against checksums, returns (start, end, checkpoint) where the replay matched after start actions,
+	checkpoint is a copy of it then, and the day ending after end actions is the first that didn't match.
+	"""
+	interactor = Interactor(controller)
+	goodActions, checkpoint = 0, controller.Clone()
+	for index in range(len(actions) + 1):
+		dayEnded = interactor.date is not None and (index == len(actions) or actions[index].date != interactor.date)
+		if dayEnded and interactor.date in checksums:
+			if controller.StateHash() != checksums[interactor.date]:
+				return goodActions, index, checkpoint
+			goodActions, checkpoint = index, controller.Clone()
+		if index < len(actions):
+			interactor.TakeAction(actions[index])
+	return None
+
+def _Replay(controller, actions, start, stop):
+	interactor = Interactor(controller, actions[start - 1].date if start > 0 else None)
+	for action in actions[start:stop]:
+		interactor.TakeAction(action)
+
+if __name__ == "__main__":
+	from CsvActionSource import CsvActionSource
+	from TankGame import SetupSeason2, SetupSeason3
+
+	setups = {"2": SetupSeason2, "3": SetupSeason3}
+	try:
+		from NumpyBoard import NumpyBoard
+		setups["2-numpy"] = lambda: SetupSeason2(NumpyBoard)
+		setups["3-numpy"] = lambda: SetupSeason3(NumpyBoard)
+	except ImportError:
+		pass
+
+	usage = "Usage: python TankGameChecksums.py record|check <season> <log>\n" \
+			"       python TankGameChecksums.py bisect <reference season> <suspect season> <log>"
+	command = sys.argv[1] if len(sys.argv) > 1 else None
+	seasons = sys.argv[2:-1]
+	if command not in ("record", "check", "bisect") or len(seasons) != (2 if command == "bisect" else 1) \
+			or any(season not in setups for season in seasons):
+		print(usage)
+		sys.exit(1)
+
+	logPath = sys.argv[-1]
+	if command == "record":
+		with CsvActionSource(logPath) as source, redirect_stdout(io.StringIO()):
+			checksums = RecordChecksums(setups[seasons[0]], source)
+		WriteChecksums(ChecksumPath(logPath), checksums)
+		print(f"Wrote {len(checksums)} day checksums to {ChecksumPath(logPath)}")
+	elif command == "check":
+		checksums = ReadChecksums(ChecksumPath(logPath))
+		with CsvActionSource(logPath) as source, redirect_stdout(io.StringIO()):
+			Interactor(setups[seasons[0]]()).TakeActions(source, checksums)
+		print(f"All {len(checksums)} day checksums match")
+	else:
+		with CsvActionSource(logPath) as source:
+			actions = []
+			while source.HasAnotherAction():
+				actions.append(source.NextAction())
+		try:
+			checksums = ReadChecksums(ChecksumPath(logPath))
+		except FileNotFoundError:
+			checksums = None
+
+		desync = BisectDesync(actions, setups[seasons[0]], setups[seasons[1]], checksums)
+		if desync is None:
+			print("The replays agree")
+		elif desync.action is None:
+			print("The replays differ before the first action")
+		else:
+			print(f"The replays first differ after action {desync.actions} ({desync.probes} probes): {desync.action}")
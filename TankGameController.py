@@ -1,8 +1,30 @@
+import copy
+import functools
+import logging
 from abc import ABC, abstractmethod
+from collections import deque, namedtuple
 from Entities import *
+from TankGameEvents import *
+from TankGameInstrumentation import Instrumentation
+from TankGameState import CaptureEntityState, RestoreEntityStates, CaptureDayLists, DayActorLists, RestoreDayLists
+from TankTable import TankTable
+
+logger = logging.getLogger(__name__)
 
 FIRE_DAMAGE = 1
 
+MOVE_ACTION = "move"
+FIRE_ACTION = "fire"
+UPGRADE_ACTION = "upgrade"
+TRADE_ACTION = "trade"
+SHARE_AP_ACTION = "share_ap"
+SHARE_LIFE_ACTION = "share_life"
+TRANSFER_GOLD_ACTION = "transfer_gold"
+
+# target is a Position for moves and fires and the target tank's owner for shares and transfers, amount is the gold,
+# AP or lives involved. Either is None when the action type doesn't use it.
+LegalAction = namedtuple("LegalAction", ["action_type", "target", "amount"])
+
 class RangeIncreasePolicy(ABC):
 	
 	@abstractmethod
@@ -46,6 +68,13 @@ class MoveRule(ABC):
 	@abstractmethod
 	def PerformMove(self, board, tank, target):
 		pass
+
+	def IsLegalMove(self, board, tank, target):
+		"""Same check as CanMove but returns False instead of raising, override this to avoid the exception."""
+		try:
+			return self.CanMove(board, tank, target)
+		except Exception:
+			return False
 		
 class ApCostMoveRule(MoveRule):
 
@@ -60,8 +89,11 @@ class ApCostMoveRule(MoveRule):
 		if board.IsSpaceOccupied(target):
 			board.Render()
 			raise Exception(f"targetPosition {target} is occupied.")
-		if not tank.HasAp(self.cost): raise Expection("Not enough AP to move.")
+		if not tank.HasAp(self.cost): raise Exception("Not enough AP to move.")
 		return True
+
+	def IsLegalMove(self, board, tank, target):
+		return Distance(tank.position, target) <= 1 and not board.IsSpaceOccupied(target) and tank.HasAp(self.cost)
 	
 	def PerformMove(self, board, tank, target):
 		board.RemoveEntity(tank)
@@ -190,7 +222,7 @@ class OncePerDayGiveLifeRule(GiveLifeRule):
 	def OnStartOfDay(self):
 		self.actorList = []
 		
-class NoGiveLifeRule(GiveApRule):
+class NoGiveLifeRule(GiveLifeRule):
 
 	def __init__(self):
 		return
@@ -213,8 +245,13 @@ class TradeGoldRule(ABC):
 	@abstractmethod
 	def PerformTradeGold(self, actor, amount):
 		pass
+
+	@abstractmethod
+	def GetTradeAmounts(self, actor):
+		"""Amounts of gold worth checking with CanTradeGold, in increasing order."""
+		pass
 		
-class FlatRateTradeGoldRule(ABC):
+class FlatRateTradeGoldRule(TradeGoldRule):
 	
 	def __init__(self, goldPerAp):
 		self.goldPerAp = goldPerAp
@@ -231,11 +268,14 @@ class FlatRateTradeGoldRule(ABC):
 		actor.SpendGold(amount)
 		actor.GainAp(apValue)
 	
+	def GetTradeAmounts(self, actor):
+		return range(self.goldPerAp, actor._gold + 1, self.goldPerAp)
+
 	def _DetermineTradeValue(self, amount):
 		if amount % self.goldPerAp != 0: raise Exception(f'Must trade gold in multiples of {self.goldPerAp}')
 		return amount // self.goldPerAp
 		
-class TableRateTradeGoldRule(ABC):
+class TableRateTradeGoldRule(TradeGoldRule):
 	
 	def __init__(self, tradeTable):
 		self.tradeTable = tradeTable
@@ -252,6 +292,9 @@ class TableRateTradeGoldRule(ABC):
 		actor.SpendGold(amount)
 		actor.GainAp(apValue)
 	
+	def GetTradeAmounts(self, actor):
+		return sorted(self.tradeTable)
+
 	def _DetermineTradeValue(self, amount):
 		if amount not in self.tradeTable: raise Exception(f'Trade amount {amount} is not in trade table keys: {self.tradeTable.keys()}')
 		return self.tradeTable[amount]
@@ -290,59 +333,196 @@ class GameRules:
 	def GetDefaultWallDurability(self):
 		return self._wallDurability
 
+# One undoable call on a GameController. entities are the entities it changed, before and after hold a TankState or
+# WallState for each or, when fields is set, just the values of those attributes. dayLists pair the rules' list objects
+# with the day lists as TankGameState captures them.
+UndoStep = namedtuple("UndoStep", ["entities", "fields", "before", "after", "cofferBefore", "cofferAfter", "dayListsBefore", "dayListsAfter", "dayBefore", "dayAfter"])
+
+# StartOfTurn only hands out AP and mine gold, so its steps keep those fields of the tanks that were paid
+START_OF_TURN_FIELDS = ("AP", "_gold", "_totalGold")
+
+def _GameStep(involvedEntities, fields=None, ruleName=None):
+	"""
+	Hook a GameController method into undo, the state hash and instrumentation, it costs two checks per call when
+	none of them is enabled.
+
+	With undo enabled the call is recorded as an UndoStep. Calls that changed nothing, such as a rejected action, aren't
+	recorded and leave the redo history alone. With the state hash enabled the involved entities and the council coffer
+	are hashed again afterwards, the board hashes spaces as they change. With instrumentation enabled the call is timed.
+
+	involvedEntities - Called with the method's arguments, returns every entity the method could change
+	fields - The only attributes of those entities the method changes, the whole state is recorded when None
+	ruleName - The gameRules attribute holding the rule policy the method hands off to, its class is timed too
+	"""
+	def decorator(perform):
+		@functools.wraps(perform)
+		def wrapper(self, *args, **kwargs):
+			if self._undoStack is None and self.zobrist is None:
+				if self.instrumentation is None: return perform(self, *args, **kwargs)
+				return _Measure(self, perform, ruleName, args, kwargs)
+
+			entities = involvedEntities(self, *args, **kwargs)
+			hashedBefore = None if self.zobrist is None else self._HashedState(entities)
+			before = None if self._undoStack is None else self._CaptureStepState(entities, fields)
+			try:
+				if self.instrumentation is None: return perform(self, *args, **kwargs)
+				return _Measure(self, perform, ruleName, args, kwargs)
+			finally:
+				if hashedBefore is not None: self._UpdateStateHash(entities, hashedBefore)
+				if before is not None: self._RecordStep(entities, fields, before)
+		return wrapper
+	return decorator
+
+def _Measure(self, perform, ruleName, args, kwargs):
+	names = [("method", perform.__name__)]
+	if ruleName is not None:
+		names.append(("rule", type(getattr(self.gameRules, ruleName)).__name__))
+	return self.instrumentation.Measure(names, perform, self, *args, **kwargs)
+
+def _ActorInvolved(self, owner, *args, **kwargs):
+	return [self._GetTankByOwner(owner)]
+
+def _ActorAndTargetInvolved(self, owner, targetOwner, *args, **kwargs):
+	return [self._GetTankByOwner(owner), self._GetTankByOwner(targetOwner)]
+
+def _ActorAndTargetSpaceInvolved(self, owner, targetPosition, *args, **kwargs):
+	target = self.board.grid[targetPosition.x][targetPosition.y]
+	return [self._GetTankByOwner(owner)] + ([] if target is None else [target])
+
+def _AllTanksInvolved(self):
+	return list(self.tanks)
+
 class GameController:
 
-	def __init__(self, width, height, game_rules):
-		self.board = Board(width, height)
+	def __init__(self, width, height, game_rules, board_class=Board, tank_table=False):
+		"""tank_table - Keep tanks in a struct-of-arrays TankTable, see TankTable.py"""
+		self.board = board_class(width, height)
+		self.tankTable = TankTable() if tank_table else None
 		self.walls = []
 		self.tanks = []
 		self.goldMines = []
 		self.gameRules = game_rules
 		self.council = Council()
+		self.day = 0
+		self.zobrist = None
+		self.instrumentation = None
+		self.events = None
+		# Name -> index in tanks of the first tank with that owner or tile
+		self._ownerIndex = {}
+		self._tileIndex = {}
+		self._undoStack = None
+		self._redoStack = []
+
+	def Clone(self):
+		"""
+		Make an independent copy of the game for exploring what-if futures.
+
+		Tanks, walls, the council and the board are copied and every reference to them, including the board spaces and
+		the per-day lists kept by rules, points at the copies. Gold mines don't change during a game so they are shared.
+		"""
+		clone = GameController.__new__(GameController)
+		if self.tankTable is None:
+			clone.tankTable = None
+			tankPairs = [(tank, tank.Copy()) for tank in self.tanks]
+		else:
+			clone.tankTable = self.tankTable.Copy()
+			tankPairs = [(tank, clone.tankTable.tanks[tank._row]) for tank in self.tanks]
+		wallPairs = [(wall, wall.Copy()) for wall in self.walls]
+		clone.tanks = [tankCopy for _, tankCopy in tankPairs]
+		clone.walls = [wallCopy for _, wallCopy in wallPairs]
+		clone.board = self.board.Copy(tankPairs + wallPairs)
+		clone.goldMines = self.goldMines
+		clone.council = self.council.Copy()
+		clone.day = self.day
+
+		# Rules may hold the council or lists of tanks, deepcopy them with those already mapped to the copies
+		memo = {id(original): entityCopy for original, entityCopy in tankPairs}
+		memo[id(self.council)] = clone.council
+		clone.gameRules = copy.deepcopy(self.gameRules, memo)
+
+		clone._ownerIndex = dict(self._ownerIndex)
+		clone._tileIndex = dict(self._tileIndex)
+
+		# Undo history refers to this game's entities so the clone starts a fresh one
+		clone._undoStack = None if self._undoStack is None else deque(maxlen=self._undoStack.maxlen)
+		clone._redoStack = []
+
+		# Searching a clone shouldn't show up in this game's profile
+		clone.instrumentation = None
+		clone.events = None
+		clone.zobrist = None
+		if self.zobrist is not None: clone._AttachStateHash(ZobristHash(self.zobrist.value))
+		return clone
 
 	def AddWall(self, position):
 		newWall = Wall(position, self.gameRules.GetDefaultWallDurability())
 		self.board.AddEntity(newWall)
 		self.walls.append(newWall)
+		self._HashEntity(newWall)
 
 	def AddTank(self, position, owner, **tankArgs):
-		newTank = Tank(position, owner, **tankArgs)
+		# Check before making the tank so a failed add doesn't leave a row in the tank table
+		if owner in self._ownerIndex:
+			raise Exception(f"There is already a tank owned by {owner}, can't add another")
+		if self.board.IsSpaceOccupied(position):
+			raise Exception(f"The space {position} is already occupied can't add {owner}")
+
+		if self.tankTable is None:
+			newTank = Tank(position, owner, **tankArgs)
+		else:
+			newTank = self.tankTable.AddTank(position, owner, **tankArgs)
 		newTank._gold = self.gameRules.GetStartingGold(newTank)
 		newTank.maxAp = self.gameRules.GetMaxAp(newTank)
 		self.board.AddEntity(newTank)
 		self.tanks.append(newTank)
+		self._IndexTank(newTank)
+		self._HashEntity(newTank)
 
+	@_GameStep(_AllTanksInvolved, START_OF_TURN_FIELDS)
 	def StartOfTurn(self):
+		self._SetDay(self.day + 1)
+		if self.events is not None: self.events.Publish(DayStarted(self.day))
 		self.gameRules.OnStartOfDay()
 		
 		for tank in self.tanks:
 			if tank.lives > 0: tank.GainAp(self.gameRules.GetApPerTurn(tank))
 
 		if not self.goldMines: return
+		tanksByPosition = IndexTanksByPosition(self.tanks)
 		for mine in self.goldMines:
-			mine.AwardGold(self.tanks, self.council)
+			if self.events is None:
+				mine.AwardGold(self.tanks, self.council, tanksByPosition)
+			else:
+				self._AwardMineGoldWithEvents(mine, tanksByPosition)
 
+	@_GameStep(_ActorInvolved, ruleName="moveRule")
 	def PerformMove(self, owner, targetPosition):
 		actor = self._GetTankByOwner(owner)
+		start = actor.position
 		try:
 			self.gameRules.moveRule.CanMove(self.board, actor, targetPosition)
 			self.gameRules.moveRule.PerformMove(self.board, actor, targetPosition)
 		except Exception as e:
 			print("An error ocurred: ", e)
+			return
+		if self.events is not None: self.events.Publish(Moved(actor.owner, start, actor.position))
 
+	@_GameStep(_ActorAndTargetSpaceInvolved)
 	def PerformFire(self, owner, targetPosition, doesHit=True):
 		actor = self._GetTankByOwner(owner)
 		dist = Distance(actor.position, targetPosition)
 		if dist > actor.range:
 			raise Exception("targetPosition is out of range.")
 		if actor.AP < self.gameRules.GetFireApCost(actor): 
-			raise Expection("Not enough AP to Fire.")
+			raise Exception("Not enough AP to Fire.")
 		targetObject = self.board.grid[targetPosition.x][targetPosition.y]
 		if not self.board.DoesLineOfSightExist(actor, targetObject):
 			self.board.Render()
 			raise Exception("No line of sight on targetPosition.")
 		
 		actor.AP -= self.gameRules.GetFireApCost(actor)
+		events = self.events
+		if events is not None: events.Publish(Fired(actor.owner, targetPosition, doesHit))
 		if doesHit:
 			remove_from_board, attack_drops = targetObject.TakeDamage(actor, FIRE_DAMAGE)
 			self._GiveTankAttackDrops(actor, attack_drops)
@@ -350,34 +530,314 @@ class GameController:
 				self.board.RemoveEntity(targetObject)
 				# TODO: add TankWall if necessary
 
+			if events is not None:
+				targetOwner = targetObject.owner if isinstance(targetObject, BaseTank) else None
+				events.Publish(Hit(actor.owner, targetPosition, targetOwner, FIRE_DAMAGE))
+				if remove_from_board: events.Publish(Destroyed(actor.owner, targetPosition, targetOwner))
+				if attack_drops.gold: events.Publish(GoldAwarded(actor.owner, attack_drops.gold, "kill"))
+
+	@_GameStep(_ActorAndTargetInvolved, ruleName="giveApRule")
 	def PerformShareActions(self, owner, targetOwner, amount):
 		target = self._GetTankByOwner(targetOwner)
 		actor = self._GetTankByOwner(owner)
 		if self.gameRules.giveApRule.CanGiveAp(actor, target, amount):
 			self.gameRules.giveApRule.PerformGiveAp(actor, target, amount)
+			if self.events is not None: self.events.Publish(ApShared(actor.owner, target.owner, amount))
 
+	@_GameStep(_ActorAndTargetInvolved, ruleName="giveLifeRule")
 	def PerformShareLife(self, owner, targetOwner, amount = 1):
 		target = self._GetTankByOwner(targetOwner)
 		actor = self._GetTankByOwner(owner)
 		if self.gameRules.giveLifeRule.CanGiveLife(actor, target, amount):
 			self.gameRules.giveLifeRule.PerformGiveLife(actor, target, amount)
+			if self.events is not None: self.events.Publish(LifeShared(actor.owner, target.owner, amount))
 
+	@_GameStep(_ActorInvolved, ruleName="tradeGoldRule")
 	def PerformTradeGold(self, owner, amount):
 		actor = self._GetTankByOwner(owner)
 		if self.gameRules.tradeGoldRule.CanTradeGold(actor, amount):
+			apBefore = actor.AP
 			self.gameRules.tradeGoldRule.PerformTradeGold(actor, amount)
+			if self.events is not None: self.events.Publish(Traded(actor.owner, amount, actor.AP - apBefore))
 
+	@_GameStep(_ActorInvolved, ruleName="rangeIncreasePolicy")
 	def PerformUpgrade(self, owner):
 		actor = self._GetTankByOwner(owner)
 		if not self.gameRules.rangeIncreasePolicy.CanIncreaseRange(actor): raise Exception("Cannot increase range.")
 		self.gameRules.rangeIncreasePolicy.PerformRangeIncrease(actor)
+		if self.events is not None: self.events.Publish(Upgraded(actor.owner, actor.range))
 		
+	@_GameStep(_ActorAndTargetInvolved, ruleName="goldTransferRule")
 	def PerformTransferGold(self, owner, targetOwner, amount):
 		actor = self._GetTankByOwner(owner)
 		target = self._GetTankByOwner(targetOwner)
 		if self.gameRules.goldTransferRule.CanTransferGold(actor, target, amount):
+			cofferBefore = self.council.coffer
 			self.gameRules.goldTransferRule.PerformTransferGold(actor, target, amount)
+			if self.events is not None:
+				self.events.Publish(GoldTransferred(actor.owner, target.owner, amount))
+				if self.council.coffer != cofferBefore: self.events.Publish(TaxedToCouncil(actor.owner, self.council.coffer - cofferBefore))
 		
+	def LegalActions(self, owner):
+		"""
+		List every LegalAction the tank belonging to owner can take right now.
+
+		Each candidate is checked with the game rules' own Can* checks. Fire targets come from one Board.VisibleCells
+		sweep over the tank's range, a tank firing on its own space is not listed. Shares and gold transfers are only
+		checked against tanks within the actor's range, which is the limit every sharing and transfer rule uses.
+		"""
+		actor = self._GetTankByOwner(owner)
+		board = self.board
+		if board.grid[actor.position.x][actor.position.y] is not actor: return []
+
+		rules = self.gameRules
+		legal = []
+
+		for dx in (-1, 0, 1):
+			for dy in (-1, 0, 1):
+				target = InternPosition(actor.position.x + dx, actor.position.y + dy)
+				if (dx or dy) and 0 <= target.x < board.width and 0 <= target.y < board.height \
+						and rules.moveRule.IsLegalMove(board, actor, target):
+					legal.append(LegalAction(MOVE_ACTION, target, None))
+
+		if actor.AP >= rules.GetFireApCost(actor):
+			for target in sorted(board.VisibleCells(actor.position, actor.range)):
+				if board.IsSpaceOccupied(target):
+					legal.append(LegalAction(FIRE_ACTION, target, None))
+
+		if rules.rangeIncreasePolicy.CanIncreaseRange(actor):
+			legal.append(LegalAction(UPGRADE_ACTION, None, None))
+
+		for amount in rules.tradeGoldRule.GetTradeAmounts(actor):
+			if rules.tradeGoldRule.CanTradeGold(actor, amount):
+				legal.append(LegalAction(TRADE_ACTION, None, amount))
+
+		x, y = actor.position
+		for target in self.tanks:
+			# Inlined Distance, this loop runs over every tank for every call
+			if target is actor or abs(target.position.x - x) > actor.range or abs(target.position.y - y) > actor.range: continue
+			if rules.giveApRule.CanGiveAp(actor, target, 1):
+				legal.append(LegalAction(SHARE_AP_ACTION, target.owner, 1))
+			if rules.giveLifeRule.CanGiveLife(actor, target, 1):
+				legal.append(LegalAction(SHARE_LIFE_ACTION, target.owner, 1))
+			for amount in range(1, actor._gold + 1):
+				if rules.goldTransferRule.CanTransferGold(actor, target, amount):
+					legal.append(LegalAction(TRANSFER_GOLD_ACTION, target.owner, amount))
+
+		return legal
+
+	def IsLegalAction(self, owner, legalAction):
+		"""Check whether LegalActions(owner) would list legalAction, without working out the rest of the list."""
+		actor = self._FindTank(owner)
+		board = self.board
+		if actor is None or actor.owner != owner or board.grid[actor.position.x][actor.position.y] is not actor: return False
+
+		rules = self.gameRules
+		action_type, target, amount = legalAction
+		if action_type == MOVE_ACTION or action_type == FIRE_ACTION:
+			if amount is not None or not isinstance(target, Position) or target == actor.position: return False
+			if not (0 <= target.x < board.width and 0 <= target.y < board.height): return False
+			if action_type == MOVE_ACTION:
+				return Distance(actor.position, target) <= 1 and rules.moveRule.IsLegalMove(board, actor, target)
+			targetEntity = board.grid[target.x][target.y]
+			return targetEntity is not None and actor.AP >= rules.GetFireApCost(actor) \
+				and Distance(actor.position, target) <= actor.range and board.DoesLineOfSightExist(actor, targetEntity)
+
+		if action_type == UPGRADE_ACTION:
+			return target is None and amount is None and rules.rangeIncreasePolicy.CanIncreaseRange(actor)
+		if action_type == TRADE_ACTION:
+			return target is None and type(amount) is int and amount in rules.tradeGoldRule.GetTradeAmounts(actor) \
+				and rules.tradeGoldRule.CanTradeGold(actor, amount)
+
+		targetTank = self._FindTank(target) if isinstance(target, str) else None
+		if targetTank is None or targetTank is actor or targetTank.owner != target \
+				or Distance(actor.position, targetTank.position) > actor.range:
+			return False
+		if action_type == SHARE_AP_ACTION:
+			return type(amount) is int and amount == 1 and rules.giveApRule.CanGiveAp(actor, targetTank, 1)
+		if action_type == SHARE_LIFE_ACTION:
+			return type(amount) is int and amount == 1 and rules.giveLifeRule.CanGiveLife(actor, targetTank, 1)
+		if action_type == TRANSFER_GOLD_ACTION:
+			return type(amount) is int and 1 <= amount <= actor._gold \
+				and rules.goldTransferRule.CanTransferGold(actor, targetTank, amount)
+		return False
+
+	def PerformLegalAction(self, owner, legalAction):
+		"""Carry out a LegalAction, such as one returned by LegalActions, for the tank belonging to owner."""
+		action_type = legalAction.action_type
+		if action_type == MOVE_ACTION:
+			self.PerformMove(owner, legalAction.target)
+		elif action_type == FIRE_ACTION:
+			self.PerformFire(owner, legalAction.target)
+		elif action_type == UPGRADE_ACTION:
+			self.PerformUpgrade(owner)
+		elif action_type == TRADE_ACTION:
+			self.PerformTradeGold(owner, legalAction.amount)
+		elif action_type == SHARE_AP_ACTION:
+			self.PerformShareActions(owner, legalAction.target, legalAction.amount)
+		elif action_type == SHARE_LIFE_ACTION:
+			self.PerformShareLife(owner, legalAction.target, legalAction.amount)
+		elif action_type == TRANSFER_GOLD_ACTION:
+			self.PerformTransferGold(owner, legalAction.target, legalAction.amount)
+		else:
+			raise Exception("Unhandled action type: " + action_type)
+
+	def EnableStateHash(self):
+		"""
+		Start keeping a 64 bit hash of the game state, read it with StateHash.
+
+		The hash covers where every entity is, each tank's lives, AP, gold and range, wall durability, the council coffer
+		and the day. StartOfTurn, Perform*, Undo and Redo update it as they change those so reading it is free, equal
+		states always have equal hashes. Changes made to entities directly aren't seen, disable and enable the hash
+		again after them.
+		"""
+		if self.zobrist is None: self._AttachStateHash(ZobristHash(self.ComputeStateHash()))
+
+	def DisableStateHash(self):
+		if self.zobrist is not None: self._AttachStateHash(None)
+
+	def StateHash(self):
+		if self.zobrist is None:
+			raise Exception("The state hash is not enabled, call EnableStateHash first")
+		return self.zobrist.value
+
+	def ComputeStateHash(self):
+		"""Compute the state hash from scratch, this is what StateHash keeps up to date."""
+		value = 0
+		for column in self.board.grid:
+			for entity in column:
+				if entity is not None: value ^= ZobristKey(BoardFeature(entity))
+		for entity in self.tanks + self.walls:
+			for feature in entity.HashFeatures():
+				value ^= ZobristKey(feature)
+		return value ^ ZobristKey(("coffer", self.council.coffer)) ^ ZobristKey(("day", self.day))
+
+	def _AttachStateHash(self, zobrist):
+		self.zobrist = zobrist
+		self.board.zobrist = zobrist
+
+	def _HashEntity(self, entity):
+		"""Hash a new entity's features, its board space is hashed when it's added to the board."""
+		if self.zobrist is None: return
+		for feature in entity.HashFeatures():
+			self.zobrist.Toggle(feature)
+
+	def _HashedState(self, entities):
+		return [entity.HashFeatures() for entity in entities], self.council.coffer
+
+	def _UpdateStateHash(self, entities, hashedBefore):
+		"""Swap the features of entities and the coffer captured by _HashedState for their current ones."""
+		featuresBefore, cofferBefore = hashedBefore
+		zobrist = self.zobrist
+		for entity, oldFeatures in zip(entities, featuresBefore):
+			for old, new in zip(oldFeatures, entity.HashFeatures()):
+				if old != new:
+					zobrist.Toggle(old)
+					zobrist.Toggle(new)
+		if self.council.coffer != cofferBefore:
+			zobrist.Toggle(("coffer", cofferBefore))
+			zobrist.Toggle(("coffer", self.council.coffer))
+
+	def _SetDay(self, day):
+		if self.zobrist is not None:
+			self.zobrist.Toggle(("day", self.day))
+			self.zobrist.Toggle(("day", day))
+		self.day = day
+
+	def EnableInstrumentation(self):
+		"""Start timing StartOfTurn, Perform* calls and Interactor actions, returns the Instrumentation to read."""
+		if self.instrumentation is None: self.instrumentation = Instrumentation(self)
+		return self.instrumentation
+
+	def DisableInstrumentation(self):
+		self.instrumentation = None
+
+	def EnableEvents(self):
+		"""Start publishing what StartOfTurn and Perform* calls do, returns the EventBus to subscribe to."""
+		if self.events is None: self.events = EventBus()
+		return self.events
+
+	def DisableEvents(self):
+		self.events = None
+
+	def _AwardMineGoldWithEvents(self, mine, tanksByPosition):
+		# Mines don't report what they paid so compare the gold of the tanks in the mine and the coffer
+		tanksInMine = [tank for space in mine.spaces for tank in tanksByPosition.get((space.x, space.y), ())]
+		goldBefore = [tank._totalGold for tank in tanksInMine]
+		cofferBefore = self.council.coffer
+		mine.AwardGold(self.tanks, self.council, tanksByPosition)
+
+		for tank, gold in zip(tanksInMine, goldBefore):
+			if tank._totalGold != gold: self.events.Publish(GoldAwarded(tank.owner, tank._totalGold - gold, "mine"))
+		if self.council.coffer != cofferBefore: self.events.Publish(TaxedToCouncil(None, self.council.coffer - cofferBefore))
+
+	def EnableUndo(self, limit=None):
+		"""Start recording StartOfTurn and Perform* calls so they can be undone, keeping at most limit of them."""
+		if self.events is not None and self.events.needEveryChange:
+			raise Exception("Undo and Redo don't publish events, detach what is following them before enabling undo")
+		if self._undoStack is None:
+			self._undoStack = deque(maxlen=limit)
+			self._redoStack = []
+		elif self._undoStack.maxlen != limit:
+			self._undoStack = deque(self._undoStack, maxlen=limit)
+
+	def DisableUndo(self):
+		self._undoStack = None
+		self._redoStack = []
+
+	def CanUndo(self):
+		return bool(self._undoStack)
+
+	def CanRedo(self):
+		return bool(self._redoStack)
+
+	def Undo(self):
+		"""Reverse the most recent recorded call, returns False if there is nothing to undo."""
+		if not self._undoStack: return False
+		step = self._undoStack.pop()
+		self._RestoreStepState(step.entities, step.fields, step.before, step.cofferBefore, step.dayListsBefore, step.dayBefore)
+		self._redoStack.append(step)
+		return True
+
+	def Redo(self):
+		"""Repeat the most recently undone call, returns False if there is nothing to redo."""
+		if not self._redoStack: return False
+		step = self._redoStack.pop()
+		self._RestoreStepState(step.entities, step.fields, step.after, step.cofferAfter, step.dayListsAfter, step.dayAfter)
+		self._undoStack.append(step)
+		return True
+
+	def _CaptureStepState(self, entities, fields):
+		if fields is None:
+			states = [CaptureEntityState(self.board, entity) for entity in entities]
+		else:
+			states = [tuple(getattr(entity, field) for field in fields) for entity in entities]
+		return states, self.council.coffer, (DayActorLists(self), CaptureDayLists(self)), self.day
+
+	def _RecordStep(self, entities, fields, before):
+		after = self._CaptureStepState(entities, fields)
+		changed = [index for index, state in enumerate(after[0]) if state != before[0][index]]
+		if changed or after[1:] != before[1:]:
+			# A deque with a limit drops the oldest step itself
+			self._undoStack.append(UndoStep([entities[index] for index in changed], fields,
+				[before[0][index] for index in changed], [after[0][index] for index in changed],
+				before[1], after[1], before[2], after[2], before[3], after[3]))
+			self._redoStack = []
+
+	def _RestoreStepState(self, entities, fields, states, coffer, dayLists, day):
+		hashedBefore = None if self.zobrist is None else self._HashedState(entities)
+		if fields is None:
+			RestoreEntityStates(self.board, list(zip(entities, states)))
+		else:
+			for entity, values in zip(entities, states):
+				for field, value in zip(fields, values): setattr(entity, field, value)
+
+		self.council.coffer = coffer
+		if hashedBefore is not None: self._UpdateStateHash(entities, hashedBefore)
+		self._SetDay(day)
+		actorLists, tankIndices = dayLists
+		RestoreDayLists(self, tankIndices, actorLists)
+
 	def _GiveTankAttackDrops(self, tank, attackDrops):
 		tank.GainAp(attackDrops.AP)
 		tank.GainGold(attackDrops.gold)
@@ -385,10 +845,32 @@ class GameController:
 		tank.lives += attackDrops.lives
 		
 	def _GetTankByOwner(self, owner):
-		for tank in self.tanks:
-			if owner == tank.owner or owner == tank.tile:
-				return tank
-		raise Exception("No tank found with owner name: " + owner + "!")
+		tank = self._FindTank(owner)
+		if tank is None:
+			raise Exception("No tank found with owner name: " + owner + "!")
+		return tank
+
+	def _FindTank(self, name):
+		"""The first tank added whose owner or tile is name, None if there isn't one."""
+		index = self._ownerIndex.get(name)
+		tileIndex = self._tileIndex.get(name)
+		if index is None or (tileIndex is not None and tileIndex < index): index = tileIndex
+		return None if index is None else self.tanks[index]
+
+	def _IndexTank(self, tank):
+		"""
+		Make the last tank added findable by its owner and tile.
+
+		Owners are unique but a tile can be shared, or match another tank's owner. A name resolves to the first tank
+		added that uses it either way.
+		"""
+		for name in dict.fromkeys((tank.owner, tank.tile)):
+			existing = self._FindTank(name)
+			if existing is not None:
+				logger.debug("%s and %s both answer to %s, it will refer to %s", existing.owner, tank.owner, name, existing.owner)
+		index = len(self.tanks) - 1
+		self._ownerIndex[tank.owner] = index
+		self._tileIndex.setdefault(tank.tile, index)
 		
 def Distance(posA, posB):
 	xDiff = abs(posA.x - posB.x)
@@ -0,0 +1,50 @@
+"""
+Typed events for everything that happens in a game.
+
+GameController.EnableEvents attaches an EventBus and from then on every StartOfTurn and successful Perform* call
+publishes what it did. A subscriber is called with each event of the types it asked for as it happens, so leaderboards,
+accolades and analytics can be kept up to date at a constant cost per event instead of rescanning controller.tanks.
+Undo and Redo restore state without publishing anything.
+
+Tanks are named by their full owner name, even when the action named them by tile, and spaces are Positions.
+target_owner is None when a wall was hit.
+"""
+from collections import namedtuple
+
+DayStarted = namedtuple("DayStarted", ["day"])
+Moved = namedtuple("Moved", ["owner", "start", "end"])
+Fired = namedtuple("Fired", ["owner", "target", "hit"])
+Hit = namedtuple("Hit", ["owner", "target", "target_owner", "damage"])
+Destroyed = namedtuple("Destroyed", ["owner", "target", "target_owner"])
+# source is "mine" or "kill"
+GoldAwarded = namedtuple("GoldAwarded", ["owner", "amount", "source"])
+ApShared = namedtuple("ApShared", ["owner", "target_owner", "amount"])
+LifeShared = namedtuple("LifeShared", ["owner", "target_owner", "amount"])
+Traded = namedtuple("Traded", ["owner", "gold", "AP"])
+Upgraded = namedtuple("Upgraded", ["owner", "range"])
+GoldTransferred = namedtuple("GoldTransferred", ["owner", "target_owner", "amount"])
+# owner is None for gold a mine paid to the council
+TaxedToCouncil = namedtuple("TaxedToCouncil", ["owner", "amount"])
+
+EVENT_TYPES = (DayStarted, Moved, Fired, Hit, Destroyed, GoldAwarded, ApShared, LifeShared, Traded, Upgraded, GoldTransferred, TaxedToCouncil)
+
+class EventBus:
+
+	def __init__(self):
+		self._handlers = {eventType: [] for eventType in EVENT_TYPES}
+		# Subscribers that go wrong if the game changes without publishing, GameController won't enable undo while
+		# there are any
+		self.needEveryChange = set()
+
+	def Subscribe(self, handler, *eventTypes):
+		"""Call handler with every event of eventTypes, or of every type if none are given."""
+		for eventType in eventTypes or EVENT_TYPES:
+			self._handlers[eventType].append(handler)
+
+	def Unsubscribe(self, handler):
+		for handlers in self._handlers.values():
+			while handler in handlers: handlers.remove(handler)
+
+	def Publish(self, event):
+		for handler in self._handlers[type(event)]:
+			handler(event)
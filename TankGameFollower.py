@@ -0,0 +1,137 @@
+"""
+Follow an action log that is still being written and apply new rows as they show up.
+
+A LogFollower keeps one controller and Interactor alive, remembers how many bytes of the log it has applied and can
+save that along with a snapshot of the game to a checkpoint file. A restarted follower loads the checkpoint and carries
+on from the same byte without replaying the log.
+"""
+import csv
+import io
+import logging
+import os
+import pickle
+import sys
+import time
+from TankGameInteractor import Interactor, Action
+from TankGameTimeline import CaptureSnapshot, RestoreSnapshot
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 2
+
+class LogFollower:
+
+	def __init__(self, controller_factory, log_path, checkpoint_path=None):
+		"""
+		controller_factory - Builds a controller in the state the game started in, for example SetupSeason2
+		checkpoint_path - Where to save progress after each poll, loaded on startup if it exists
+		"""
+		self.logPath = log_path
+		self.checkpointPath = checkpoint_path
+		self.controller = controller_factory()
+		self.offset = 0
+		# (byte offset, row, error message) of every row skipped since this follower started because it couldn't be applied
+		self.skipped = []
+		self._fieldnames = None
+		date = None
+
+		if checkpoint_path is not None and os.path.exists(checkpoint_path):
+			with open(checkpoint_path, "rb") as checkpointFile:
+				checkpoint = pickle.load(checkpointFile)
+			if checkpoint["version"] != CHECKPOINT_VERSION:
+				raise Exception(f"Checkpoint {checkpoint_path} is version {checkpoint['version']}, expected {CHECKPOINT_VERSION}")
+			RestoreSnapshot(self.controller, checkpoint["snapshot"])
+			self.offset = checkpoint["offset"]
+			self._fieldnames = checkpoint["fieldnames"]
+			date = checkpoint["date"]
+
+		self.interactor = Interactor(self.controller, date)
+
+	def Poll(self, final=False):
+		"""
+		Apply every complete row appended since the last poll and return how many actions were applied.
+
+		A row only counts as complete once its newline has been written. Pass final=True when the log is known to be
+		finished to also apply a last row that has no newline. offset moves past each row as it's handled, a row whose
+		action raises is skipped and recorded in skipped rather than applied again by the next poll.
+		"""
+		with open(self.logPath, "rb") as log:
+			log.seek(0, os.SEEK_END)
+			if log.tell() < self.offset:
+				raise Exception(f"{self.logPath} is shorter than the {self.offset} bytes already applied, was it rewritten?")
+			log.seek(self.offset)
+			data = log.read()
+
+		end = len(data) if final else data.rfind(b"\n") + 1
+		if end == 0: return 0
+
+		text = data[:end].decode("utf-8")
+		stream = io.StringIO(text, newline="")
+		rows = csv.reader(stream, strict=True)
+		applied = 0
+		position = 0
+		try:
+			while True:
+				try:
+					row = next(rows)
+				except StopIteration:
+					break
+				except csv.Error:
+					# A quoted field still waiting for the rest of its lines
+					if final: raise
+					break
+
+				rowEnd = stream.tell()
+				rowOffset = self.offset
+				self.offset += len(text[position:rowEnd].encode("utf-8"))
+				position = rowEnd
+				if not row: continue
+				if self._fieldnames is None:
+					self._fieldnames = row
+					continue
+
+				try:
+					fields = dict(zip(self._fieldnames, row))
+					self.interactor.TakeAction(Action(fields["date"], fields["actor"], fields["action_type"], fields["target"], fields.get("metadata", "")))
+				except Exception as error:
+					logger.warning("Skipped the row at byte %d of %s: %s", rowOffset, self.logPath, error)
+					self.skipped.append((rowOffset, row, str(error)))
+					continue
+				applied += 1
+		finally:
+			self.SaveCheckpoint()
+		return applied
+
+	def SaveCheckpoint(self):
+		if self.checkpointPath is None: return
+
+		checkpoint = {
+			"version": CHECKPOINT_VERSION,
+			"offset": self.offset,
+			"fieldnames": self._fieldnames,
+			"date": self.interactor.date,
+			"snapshot": CaptureSnapshot(self.controller),
+		}
+		# Write then rename so a crash mid write leaves the previous checkpoint intact
+		temporaryPath = self.checkpointPath + ".tmp"
+		with open(temporaryPath, "wb") as checkpointFile:
+			pickle.dump(checkpoint, checkpointFile)
+		os.replace(temporaryPath, self.checkpointPath)
+
+	def Follow(self, interval=1.0, on_update=None):
+		"""Poll forever, calling on_update(self) whenever new actions were applied."""
+		while True:
+			if self.Poll() and on_update is not None:
+				on_update(self)
+			time.sleep(interval)
+
+if __name__ == "__main__":
+	from TankGame import SetupSeason2, PrintTanks, CSV_PATH
+
+	def Show(follower):
+		PrintTanks(follower.controller)
+		follower.controller.board.Render()
+
+	logPath = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
+	checkpointPath = sys.argv[2] if len(sys.argv) > 2 else logPath + ".checkpoint"
+	LogFollower(SetupSeason2, logPath, checkpointPath).Follow(on_update=Show)
@@ -0,0 +1,127 @@
+"""
+Opt-in profiling of a game as it's played or replayed.
+
+GameController.EnableInstrumentation attaches an Instrumentation that times every Interactor action by action type,
+every StartOfTurn and Perform* call by method and by the rule policy that handled it, and counts the line of sight
+checks and board scans each one made. Nothing is measured until it's enabled, the only cost before then is checking
+for it on each call.
+"""
+import json
+import random
+import time
+
+# Latency samples kept per name for percentiles, later samples replace earlier ones at random so the kept ones stay a
+# fair sample of everything recorded
+RESERVOIR_SIZE = 1024
+
+# Family -> (label, description) used when exporting
+FAMILIES = {
+	"action": ("action_type", "Interactor.TakeAction calls by action type"),
+	"method": ("method", "GameController calls by method"),
+	"rule": ("rule", "GameController calls by the rule policy that handled them"),
+}
+
+class LatencyStats:
+	"""Count, total time, line of sight checks and board scans of the calls recorded under one name."""
+
+	def __init__(self, rng):
+		self.count = 0
+		self.seconds = 0.0
+		self.losCalls = 0
+		self.boardScans = 0
+		self._samples = []
+		self._rng = rng
+
+	def Add(self, seconds, losCalls, boardScans):
+		self.count += 1
+		self.seconds += seconds
+		self.losCalls += losCalls
+		self.boardScans += boardScans
+		if len(self._samples) < RESERVOIR_SIZE:
+			self._samples.append(seconds)
+		else:
+			index = self._rng.randrange(self.count)
+			if index < RESERVOIR_SIZE: self._samples[index] = seconds
+
+	def Percentile(self, fraction):
+		"""The latency fraction of calls finished within, exact until RESERVOIR_SIZE calls and estimated after."""
+		if not self._samples: return 0.0
+		ordered = sorted(self._samples)
+		return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+	def ToDict(self):
+		return {
+			"count": self.count,
+			"seconds": self.seconds,
+			"p50_seconds": self.Percentile(0.5),
+			"p99_seconds": self.Percentile(0.99),
+			"los_calls": self.losCalls,
+			"board_scans": self.boardScans,
+		}
+
+class Instrumentation:
+
+	def __init__(self, controller, seed=0):
+		"""controller - The GameController whose board is watched for line of sight checks and scans"""
+		self._controller = controller
+		self._rng = random.Random(seed)
+		self.stats = {family: {} for family in FAMILIES}
+
+	def Measure(self, names, function, *args, **kwargs):
+		"""
+		Call function and record how long it took under every (family, name) in names.
+
+		Line of sight checks count every DoesLineOfSightExist call, board scans count the ones that missed the cache
+		and walked the board plus every VisibleCells sweep.
+		"""
+		losCalls, boardScans = self._BoardCounters()
+		start = time.perf_counter()
+		try:
+			return function(*args, **kwargs)
+		finally:
+			seconds = time.perf_counter() - start
+			losCallsAfter, boardScansAfter = self._BoardCounters()
+			for family, name in names:
+				stats = self.stats[family].get(name)
+				if stats is None:
+					stats = LatencyStats(self._rng)
+					self.stats[family][name] = stats
+				stats.Add(seconds, losCallsAfter - losCalls, boardScansAfter - boardScans)
+
+	def Reset(self):
+		self.stats = {family: {} for family in FAMILIES}
+
+	def ToDict(self):
+		return {family: {name: stats.ToDict() for name, stats in byName.items()} for family, byName in self.stats.items()}
+
+	def ToJson(self, indent=None):
+		return json.dumps(self.ToDict(), indent=indent)
+
+	def ToPrometheus(self, prefix="tankgame"):
+		"""Export every family as a Prometheus summary with call, line of sight and board scan counters alongside."""
+		lines = []
+		for family, (label, description) in FAMILIES.items():
+			byName = self.stats[family]
+			metric = f"{prefix}_{family}"
+			lines.append(f"# HELP {metric}_seconds Latency of {description}")
+			lines.append(f"# TYPE {metric}_seconds summary")
+			for name, stats in byName.items():
+				labels = f'{label}="{_EscapeLabel(name)}"'
+				for quantile in (0.5, 0.99):
+					lines.append(f'{metric}_seconds{{{labels},quantile="{quantile}"}} {stats.Percentile(quantile)!r}')
+				lines.append(f"{metric}_seconds_sum{{{labels}}} {stats.seconds!r}")
+				lines.append(f"{metric}_seconds_count{{{labels}}} {stats.count}")
+
+			for counter, attribute, what in (("los_calls", "losCalls", "Line of sight checks"), ("board_scans", "boardScans", "Board scans")):
+				lines.append(f"# HELP {metric}_{counter}_total {what} made by {description}")
+				lines.append(f"# TYPE {metric}_{counter}_total counter")
+				for name, stats in byName.items():
+					lines.append(f'{metric}_{counter}_total{{{label}="{_EscapeLabel(name)}"}} {getattr(stats, attribute)}')
+		return "\n".join(lines) + "\n"
+
+	def _BoardCounters(self):
+		board = self._controller.board
+		return board.losCacheHits + board.losCacheMisses, board.losCacheMisses + board.visibleCellScans
+
+def _EscapeLabel(value):
+	return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -1,54 +1,95 @@
-from TankGameController import GameController
-from Entities import Position
+from TankGameController import GameController, MOVE_ACTION, FIRE_ACTION, UPGRADE_ACTION, TRADE_ACTION, \
+    SHARE_AP_ACTION, SHARE_LIFE_ACTION, TRANSFER_GOLD_ACTION
+from Entities import Position, InternPosition, INTERNED_POSITIONS
 from collections import namedtuple
-
-MOVE_ACTION = "move"
-FIRE_ACTION = "fire"
-UPGRADE_ACTION = "upgrade"
-TRADE_ACTION = "trade"
-SHARE_AP_ACTION = "share_ap"
-SHARE_LIFE_ACTION = "share_life"
-TRANSFER_GOLD_ACTION = "transfer_gold"
+from functools import lru_cache
 
 class Interactor:
 
-    def __init__(self, gameController):
+    def __init__(self, gameController, date=None):
+        """date - The date of the last action already applied to gameController, if resuming a game"""
         self._controller = gameController
-        self._date = None
-
-    def TakeActions(self, action_source):
-        while(action_source.HasAnotherAction()):
-            action = action_source.NextAction()
-            self._CheckDate(action)
-
-            action_type = action.action_type
-            if action_type == MOVE_ACTION:
-                self._DoMoveAction(action)
-            elif action_type == FIRE_ACTION:
-                self._DoFireAction(action)
-            elif action_type == UPGRADE_ACTION:
-                self._DoUpgradeAction(action)
-            elif action_type == TRADE_ACTION:
-                self._DoTradeAction(action)
-            elif action_type == SHARE_AP_ACTION:
-                self._DoShareAPAction(action)
-            elif action_type == SHARE_LIFE_ACTION:
-                self._DoShareLifeAction(action)
-            elif action_type == TRANSFER_GOLD_ACTION:
-                self._DoTransferGold(action)
-            else:
-                raise Exception("Unhandled action type: " + action_type)
+        self._date = date
+
+    @property
+    def date(self):
+        return self._date
+
+    def TakeActions(self, action_source, checksums=None):
+        """
+        checksums - Optional {date: state hash at the end of that date}, see TankGameChecksums. The replay stops with a
+                    ChecksumMismatch at the end of the first day that doesn't match, days that aren't listed are skipped.
+        """
+        if checksums is None:
+            while(action_source.HasAnotherAction()):
+                self.TakeAction(action_source.NextAction())
+            return
+
+        # Leave the hash the way we found it, it costs every later write while it's on
+        wasHashing = self._controller.zobrist is not None
+        self._controller.EnableStateHash()
+        try:
+            while(action_source.HasAnotherAction()):
+                action = action_source.NextAction()
+                if self._date is not None and action.date != self._date:
+                    self._VerifyChecksum(checksums)
+                self.TakeAction(action)
+
+            if self._date is not None:
+                self._VerifyChecksum(checksums)
+        finally:
+            if not wasHashing: self._controller.DisableStateHash()
+
+    def _VerifyChecksum(self, checksums):
+        expected = checksums.get(self._date)
+        if expected is None: return
+        actual = self._controller.StateHash()
+        if actual != expected:
+            raise ChecksumMismatch(self._date, expected, actual)
+
+    def TakeAction(self, action):
+        self._CheckDate(action)
+
+        instrumentation = self._controller.instrumentation
+        if instrumentation is None:
+            self._PerformAction(action)
+        else:
+            instrumentation.Measure([("action", action.action_type)], self._PerformAction, action)
+
+    def _PerformAction(self, action):
+        action_type = action.action_type
+        if action_type == MOVE_ACTION:
+            self._DoMoveAction(action)
+        elif action_type == FIRE_ACTION:
+            self._DoFireAction(action)
+        elif action_type == UPGRADE_ACTION:
+            self._DoUpgradeAction(action)
+        elif action_type == TRADE_ACTION:
+            self._DoTradeAction(action)
+        elif action_type == SHARE_AP_ACTION:
+            self._DoShareAPAction(action)
+        elif action_type == SHARE_LIFE_ACTION:
+            self._DoShareLifeAction(action)
+        elif action_type == TRANSFER_GOLD_ACTION:
+            self._DoTransferGold(action)
+        else:
+            raise Exception("Unhandled action type: " + action_type)
+
+    def StartDay(self, date):
+        """Start date's turn unless it's already the current date, returns whether a new turn started."""
+        if self._date is not None and self._date == date: return False
+        self._controller.StartOfTurn()
+        self._date = date
+        return True
 
     def _CheckDate(self, action):
-        if self._date is None or self._date != action.date:
-            self._controller.StartOfTurn()
-            self._date = action.date
+        self.StartDay(action.date)
 
     def _DoMoveAction(self, action):
-        self._controller.PerformMove(action.actor, AlgebraicNotationToPosition(action.target))
+        self._controller.PerformMove(action.actor, TargetToPosition(action.target))
 
     def _DoFireAction(self, action):
-        self._controller.PerformFire(action.actor, AlgebraicNotationToPosition(action.target), doesHit = bool(action.metadata))
+        self._controller.PerformFire(action.actor, TargetToPosition(action.target), doesHit = bool(action.metadata))
 
     def _DoUpgradeAction(self, action):
         self._controller.PerformUpgrade(action.actor)
@@ -63,20 +104,56 @@ class Interactor:
         self._controller.PerformShareLife(action.actor, action.target)
         
     def _DoTransferGold(self, action):
-        self._controller.PerformTransferGold(action.actor, action.target, action.metadata)
+        self._controller.PerformTransferGold(action.actor, action.target, int(action.metadata))
         
 def AlgebraicNotationToPosition(alg_notation):
-	alg_notation = alg_notation.lower()
-	x = ord(alg_notation[0]) - ord('a')
-	y = int(alg_notation[1:]) - 1
-	return Position(x, y)
+	"""Parse a space like B7 to the interned Position, recently seen spellings aren't parsed again."""
+	return InternPosition(*_ParseAlgebraicNotation(alg_notation))
+
+# Caches the coordinates rather than the Position so it always agrees with InternPosition's cache
+@lru_cache(maxsize=INTERNED_POSITIONS)
+def _ParseAlgebraicNotation(alg_notation):
+	lowered = alg_notation.lower()
+	return ord(lowered[0]) - ord('a'), int(lowered[1:]) - 1
+
+def TargetToPosition(target):
+	"""Action sources may hand over targets already decoded to a Position."""
+	if isinstance(target, Position): return target
+	return AlgebraicNotationToPosition(target)
+
+def PositionToAlgebraicNotation(position):
+	return chr(ord('A') + position.x) + str(position.y + 1)
 
 Action = namedtuple("Action", ["date", "actor", "action_type", "target", "metadata"])
 
+class ChecksumMismatch(Exception):
+    """The game state at the end of a day doesn't match the checksum recorded for it."""
+
+    def __init__(self, date, expected, actual):
+        super().__init__(f"State at the end of {date} has checksum {actual:016x}, expected {expected:016x}")
+        self.date = date
+        self.expected = expected
+        self.actual = actual
+
 class I_ActionSource:
 
     def HasAnotherAction(self):
         pass
 
     def NextAction(self):
-        pass
\ No newline at end of file
+        pass
+
+class ListActionSource(I_ActionSource):
+    """Actions from a list already in memory."""
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.next_action = 0
+
+    def HasAnotherAction(self):
+        return self.next_action < len(self.actions)
+
+    def NextAction(self):
+        action = self.actions[self.next_action]
+        self.next_action += 1
+        return action
@@ -0,0 +1,228 @@
+"""
+Season leaderboards kept up to date as the game is played.
+
+Leaderboards subscribes to a GameController's events and keeps one IndexedHeap per board, so each event costs
+O(log n) in the number of tanks and the top k of any board can be read at any point in a replay in O(k log k) without
+looking at the other tanks. Attach it before the first action to count the whole season.
+
+Only events are counted, so changes made without them aren't: Undo, Redo and a Timeline's ApplyDelta or
+RestoreSnapshot all leave the leaderboards wrong. Leaderboards won't attach to a controller with undo enabled and the
+controller won't enable undo until they are detached. After a Timeline jump start new leaderboards and replay from the
+start instead.
+
+	gold - Gold earned from mines, kills and transfers, the same as each tank's total gold
+	kills - Tanks destroyed
+	moves - Spaces moved
+	survival - Days survived, tanks that are still alive count every day so far
+	council - Gold paid to the council in taxes
+"""
+from TankGameEvents import DayStarted, Moved, Destroyed, GoldAwarded, GoldTransferred, TaxedToCouncil
+
+LEADERBOARDS = ("gold", "kills", "moves", "survival", "council")
+
+# Survival score of a tank that hasn't been destroyed, higher than any day so they stay on top
+ALIVE = float("inf")
+
+class IndexedHeap:
+	"""A max heap of keys by score that can change the score of any key in O(log n), ties go to the key added first."""
+
+	def __init__(self):
+		self._heap = []
+		self._positions = {}
+		self._scores = {}
+		self._order = {}
+
+	def __len__(self):
+		return len(self._heap)
+
+	def __contains__(self, key):
+		return key in self._positions
+
+	def Get(self, key, default=None):
+		return self._scores.get(key, default)
+
+	def Set(self, key, score):
+		if key not in self._positions:
+			self._order[key] = len(self._order)
+			self._scores[key] = score
+			self._heap.append(key)
+			self._positions[key] = len(self._heap) - 1
+			self._SiftUp(len(self._heap) - 1)
+			return
+
+		oldScore = self._scores[key]
+		self._scores[key] = score
+		if score > oldScore:
+			self._SiftUp(self._positions[key])
+		elif score < oldScore:
+			self._SiftDown(self._positions[key])
+
+	def Add(self, key, amount):
+		self.Set(key, self._scores.get(key, 0) + amount)
+
+	def Top(self, k):
+		"""The k highest (key, score) pairs, highest first."""
+		heap = self._heap
+		top = []
+		# The heap is a tree, so the next highest is always a child of one already taken. Keep those children in a
+		# small heap of positions ordered the same way.
+		frontier = _FrontierHeap(self)
+		if heap: frontier.Push(0)
+		while frontier and len(top) < k:
+			position = frontier.Pop()
+			key = heap[position]
+			top.append((key, self._scores[key]))
+			for child in (2 * position + 1, 2 * position + 2):
+				if child < len(heap): frontier.Push(child)
+		return top
+
+	def _Higher(self, a, b):
+		scoreA = self._scores[a]
+		scoreB = self._scores[b]
+		return scoreA > scoreB or (scoreA == scoreB and self._order[a] < self._order[b])
+
+	def _Swap(self, i, j):
+		heap = self._heap
+		heap[i], heap[j] = heap[j], heap[i]
+		self._positions[heap[i]] = i
+		self._positions[heap[j]] = j
+
+	def _SiftUp(self, position):
+		heap = self._heap
+		while position > 0:
+			parent = (position - 1) // 2
+			if not self._Higher(heap[position], heap[parent]): break
+			self._Swap(position, parent)
+			position = parent
+
+	def _SiftDown(self, position):
+		heap = self._heap
+		while True:
+			highest = position
+			for child in (2 * position + 1, 2 * position + 2):
+				if child < len(heap) and self._Higher(heap[child], heap[highest]): highest = child
+			if highest == position: break
+			self._Swap(position, highest)
+			position = highest
+
+class _FrontierHeap:
+	"""Positions in an IndexedHeap ordered by the keys at them, highest first."""
+
+	def __init__(self, indexedHeap):
+		self._indexedHeap = indexedHeap
+		self._positions = []
+
+	def __len__(self):
+		return len(self._positions)
+
+	def Push(self, position):
+		positions = self._positions
+		positions.append(position)
+		index = len(positions) - 1
+		while index > 0:
+			parent = (index - 1) // 2
+			if not self._Higher(positions[index], positions[parent]): break
+			positions[index], positions[parent] = positions[parent], positions[index]
+			index = parent
+
+	def Pop(self):
+		positions = self._positions
+		top = positions[0]
+		last = positions.pop()
+		if positions:
+			positions[0] = last
+			index = 0
+			while True:
+				highest = index
+				for child in (2 * index + 1, 2 * index + 2):
+					if child < len(positions) and self._Higher(positions[child], positions[highest]): highest = child
+				if highest == index: break
+				positions[index], positions[highest] = positions[highest], positions[index]
+				index = highest
+		return top
+
+	def _Higher(self, a, b):
+		heap = self._indexedHeap._heap
+		return self._indexedHeap._Higher(heap[a], heap[b])
+
+class Leaderboards:
+
+	def __init__(self, controller):
+		"""Start counting controller's game, every tank starts at 0 on every board."""
+		# Undo and Redo don't publish events, see the module docstring
+		if controller._undoStack is not None:
+			raise Exception("Leaderboards can't follow Undo and Redo, call DisableUndo first")
+		self.day = controller.day
+		self.boards = {name: IndexedHeap() for name in LEADERBOARDS}
+		for tank in controller.tanks:
+			for name, board in self.boards.items():
+				board.Set(tank.owner, ALIVE if name == "survival" else 0)
+
+		self._events = controller.EnableEvents()
+		self._events.needEveryChange.add(self)
+		events = self._events
+		events.Subscribe(self._OnDayStarted, DayStarted)
+		events.Subscribe(self._OnMoved, Moved)
+		events.Subscribe(self._OnDestroyed, Destroyed)
+		events.Subscribe(self._OnGoldAwarded, GoldAwarded)
+		events.Subscribe(self._OnGoldTransferred, GoldTransferred)
+		events.Subscribe(self._OnTaxedToCouncil, TaxedToCouncil)
+
+	def Detach(self):
+		"""Stop counting, the boards keep their scores."""
+		for handler in (self._OnDayStarted, self._OnMoved, self._OnDestroyed, self._OnGoldAwarded, self._OnGoldTransferred,
+						self._OnTaxedToCouncil):
+			self._events.Unsubscribe(handler)
+		self._events.needEveryChange.discard(self)
+
+	def Top(self, name, k=3):
+		"""The k (owner, score) pairs leading the board called name, highest first."""
+		top = self.boards[name].Top(k)
+		if name == "survival":
+			top = [(owner, self.day if days == ALIVE else days) for owner, days in top]
+		return top
+
+	def Accolades(self):
+		"""The leader of every board as board name -> (owner, score), boards nobody has scored on are left out."""
+		accolades = {}
+		for name in LEADERBOARDS:
+			top = self.Top(name, 1)
+			if top and top[0][1]: accolades[name] = top[0]
+		return accolades
+
+	def _OnDayStarted(self, event):
+		self.day = event.day
+
+	def _OnMoved(self, event):
+		self.boards["moves"].Add(event.owner, 1)
+
+	def _OnDestroyed(self, event):
+		if event.target_owner is None: return
+		self.boards["kills"].Add(event.owner, 1)
+		if self.boards["survival"].Get(event.target_owner, ALIVE) == ALIVE:
+			self.boards["survival"].Set(event.target_owner, self.day)
+
+	def _OnGoldAwarded(self, event):
+		self.boards["gold"].Add(event.owner, event.amount)
+
+	def _OnGoldTransferred(self, event):
+		self.boards["gold"].Add(event.target_owner, event.amount)
+
+	def _OnTaxedToCouncil(self, event):
+		if event.owner is not None: self.boards["council"].Add(event.owner, event.amount)
+
+def PrintLeaderboards(leaderboards, k=3):
+	for name in LEADERBOARDS:
+		print(f"{name.capitalize()}: " + ", ".join(f"{owner} {score}" for owner, score in leaderboards.Top(name, k)))
+
+if __name__ == "__main__":
+	import sys
+	from CsvActionSource import CsvActionSource
+	from TankGame import SetupSeason2, CSV_PATH
+	from TankGameInteractor import Interactor
+
+	controller = SetupSeason2()
+	leaderboards = Leaderboards(controller)
+	with CsvActionSource(sys.argv[1] if len(sys.argv) > 1 else CSV_PATH) as actionSource:
+		Interactor(controller).TakeActions(actionSource)
+	PrintLeaderboards(leaderboards)
@@ -0,0 +1,366 @@
+"""
+Run a live game that many players can send actions to at once.
+
+GameServer listens on TCP or a unix socket for newline separated JSON. Every change to the game goes through one queue
+drained by a single writer task, so the controller only ever sees one request at a time. The writer takes everything
+that has queued up as one batch: each action is checked with GameController.IsLegalAction against the state it is
+actually applied to, and subscribers get one update for the whole batch instead of one per action.
+
+Starting a day goes through Interactor.StartDay, so however many players ask for the same day its turn starts once.
+The csv log the server can write replays to the same game, except that a day nobody took an action on can't be
+recorded in a log and so is not started on replay.
+
+A connection acts for one player. It joins as that player, with the player's token when the server was given tokens, and
+after that any action naming a different owner is rejected.
+
+Requests, an "id" is echoed back in the reply:
+	{"op": "join", "owner": "Ryan", "token": "..."}
+	{"op": "action", "action_type": "move", "target": "C3"}
+	{"op": "action", "owner": "Ryan", "action_type": "share_ap", "target": "Stomp", "amount": 1}
+	{"op": "action", "action_type": "fire", "target": "D3", "hit": true}
+	{"op": "start_day", "date": "10/19/23", "token": "..."}
+	{"op": "legal_actions", "owner": "Ryan"}
+	{"op": "subscribe"}
+	{"op": "subscribe", "stream": "board"}
+Targets that are spaces can be algebraic notation or [x, y]. Fire actions must say whether the shot hit, no other
+action takes "hit". Replies are {"id": ..., "ok": true} or
+{"id": ..., "ok": false, "error": "..."}, legal_actions replies also have "actions". Subscribers are sent
+{"op": "update", "version": ..., "date": ..., "tanks": [...], "walls": [...]} after every batch that changed the game, one
+that falls behind skips straight to the newest update. Board subscribers are sent {"op": "frame", ...} instead, a
+TankGameSpectator key frame and then the deltas, one that falls behind gets a new key frame.
+"""
+import asyncio
+import contextlib
+import csv
+import hmac
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from Entities import Position, InternPosition
+from TankGameController import LegalAction, FIRE_ACTION, SHARE_LIFE_ACTION
+from TankGameInteractor import Interactor, Action, AlgebraicNotationToPosition, PositionToAlgebraicNotation
+from TankGameSpectator import BoardStream
+
+class GameServer:
+
+	def __init__(self, controller, date=None, admin_token=None, player_tokens=None, log_path=None, max_batch=1024,
+				 max_queue=4096):
+		"""
+		date - The date of the last action already applied to controller, if resuming a game
+		admin_token - Required in start_day requests when set
+		player_tokens - {owner: token}, a connection joining as owner needs its token. When None a connection can join
+		                as any player without one, which only suits a game on a trusted network.
+		log_path - Append every applied action to this csv log
+		max_batch - Most requests the writer applies before sending out an update
+		max_queue - Most requests waiting for the writer, more are rejected until it catches up
+		"""
+		self.controller = controller
+		self.interactor = Interactor(controller, date)
+		self.date = date
+		self.adminToken = admin_token
+		self.playerTokens = player_tokens
+		self.maxBatch = max_batch
+		self.maxQueue = max_queue
+		self.version = 0
+		self._logPath = log_path
+		self._log = None
+		self._requests = None
+		self._writerTask = None
+		self._server = None
+		self._subscribers = set()
+		self._boardStream = BoardStream(controller)
+		self._boardSubscribers = set()
+
+	async def Start(self, host="127.0.0.1", port=0, path=None):
+		"""Start listening, on the unix socket at path if given, and return the asyncio server."""
+		self._requests = asyncio.Queue(self.maxQueue)
+		if self._logPath is not None:
+			isNew = not os.path.exists(self._logPath) or os.path.getsize(self._logPath) == 0
+			self._log = open(self._logPath, "a", newline="")
+			self._logWriter = csv.writer(self._log)
+			if isNew: self._logWriter.writerow(Action._fields)
+
+		self._writerTask = asyncio.create_task(self._WriteLoop())
+		if path is None:
+			self._server = await asyncio.start_server(self._HandleConnection, host, port)
+		else:
+			self._server = await asyncio.start_unix_server(self._HandleConnection, path)
+		return self._server
+
+	async def Close(self):
+		self._server.close()
+		for subscriber in list(self._subscribers) + list(self._boardSubscribers):
+			subscriber.Close()
+		await self._server.wait_closed()
+		self._writerTask.cancel()
+		with contextlib.suppress(asyncio.CancelledError):
+			await self._writerTask
+		if self._log is not None: self._log.close()
+
+	def SubmitAction(self, owner, legalAction, hit=None):
+		"""
+		Queue an action, returns a future for None once it's applied or the reason it was rejected.
+
+		hit - Whether a fire action hit, True or False, and None for every other action
+
+		Raises an exception if max_queue requests are already waiting.
+		"""
+		return self._Enqueue("action", (owner, legalAction, hit))
+
+	def StartDay(self, date):
+		"""Queue the start of a new day, a future for None once it's started or already current."""
+		return self._Enqueue("day", date)
+
+	def _Enqueue(self, kind, payload):
+		future = asyncio.get_running_loop().create_future()
+		try:
+			self._requests.put_nowait((kind, payload, future))
+		except asyncio.QueueFull:
+			raise Exception("The server is busy, try again") from None
+		return future
+
+	async def _WriteLoop(self):
+		while True:
+			batch = [await self._requests.get()]
+			while len(batch) < self.maxBatch and not self._requests.empty():
+				batch.append(self._requests.get_nowait())
+
+			changed = False
+			dateBefore = self.date
+			# Nothing in here awaits so no other task sees the game part way through a batch or the redirected stdout
+			with redirect_stdout(io.StringIO()):
+				for kind, payload, future in batch:
+					if kind == "day":
+						error = self._StartDay(payload)
+					else:
+						error = self._ApplyAction(*payload)
+						changed = changed or error is None
+					if not future.done(): future.set_result(error)
+
+			if self._log is not None: self._log.flush()
+			if changed or self.date != dateBefore:
+				self.version += 1
+				self._Publish(self.Update())
+
+	def _StartDay(self, date):
+		try:
+			if not self.interactor.StartDay(date): return None
+		except Exception as error:
+			return str(error)
+		self.date = date
+		return None
+
+	def _ApplyAction(self, owner, legalAction, hit):
+		if self.date is None: return "No day has been started"
+		if legalAction.action_type == FIRE_ACTION:
+			if type(hit) is not bool: return "A fire action needs a hit of true or false"
+		elif hit is not None:
+			return f"Only fire actions take a hit, not {legalAction.action_type}"
+		try:
+			if not self.controller.IsLegalAction(owner, legalAction):
+				return f"{legalAction.action_type} is not a legal action for {owner}"
+
+			action = _ToAction(self.date, owner, legalAction, hit)
+			self.interactor.TakeAction(action)
+		except Exception as error:
+			return str(error)
+
+		if self._log is not None:
+			target = PositionToAlgebraicNotation(action.target) if isinstance(action.target, Position) else action.target
+			self._logWriter.writerow(action._replace(target=target))
+		return None
+
+	def Update(self):
+		"""The message subscribers are sent, the whole visible state of the game."""
+		grid = self.controller.board.grid
+		return {
+			"op": "update",
+			"version": self.version,
+			"date": self.date,
+			"tanks": [{"owner": tank.owner, "tile": tank.tile, "x": tank.position.x, "y": tank.position.y,
+					   "onBoard": grid[tank.position.x][tank.position.y] is tank, "lives": tank.lives, "AP": tank.AP,
+					   "gold": tank._gold, "range": tank.range, "kills": tank.kills} for tank in self.controller.tanks],
+			"walls": [{"x": wall.position.x, "y": wall.position.y, "durability": wall.durability}
+					  for wall in self.controller.walls if grid[wall.position.x][wall.position.y] is wall],
+		}
+
+	def _Publish(self, message):
+		# Encoded once and shared by every subscriber
+		data = _Encode(message)
+		for subscriber in self._subscribers:
+			subscriber.Send(data)
+
+		# Always advance the stream so the next delta starts from this batch, even with nobody watching
+		frame = self._boardStream.Frame()
+		if frame is not None and self._boardSubscribers:
+			data = _Encode(dict(frame, op="frame"))
+			keyFrame = []
+			for subscriber in self._boardSubscribers:
+				if subscriber.IsBehind():
+					if not keyFrame: keyFrame.append(self._KeyFrame())
+					subscriber.Send(keyFrame[0])
+				else:
+					subscriber.Send(data)
+
+	def _KeyFrame(self):
+		return _Encode(dict(self._boardStream.KeyFrame(), op="frame"))
+
+	def _Join(self, owner, token):
+		"""The owner a connection joining with owner and token acts for."""
+		tank = self.controller._FindTank(owner) if isinstance(owner, str) else None
+		if tank is None or tank.owner != owner: raise Exception(f"There is no player {owner}")
+		if self.playerTokens is not None:
+			expected = self.playerTokens.get(owner)
+			if expected is None or not isinstance(token, str) or not hmac.compare_digest(token.encode(), expected.encode()):
+				raise Exception(f"Joining as {owner} needs their token")
+		return owner
+
+	async def _HandleConnection(self, reader, writer):
+		subscriber = None
+		player = None
+		try:
+			while True:
+				line = await reader.readline()
+				if not line: break
+
+				try:
+					request = json.loads(line)
+					requestId = request.get("id")
+					op = request.get("op")
+				except (ValueError, AttributeError):
+					writer.write(_Encode({"id": None, "ok": False, "error": "Requests must be JSON objects"}))
+					continue
+
+				try:
+					if op == "join":
+						if player is not None: raise Exception(f"Already joined as {player}")
+						player = self._Join(request.get("owner"), request.get("token"))
+						writer.write(_Encode({"id": requestId, "ok": True}))
+					elif op == "action":
+						if player is None: raise Exception("Join as a player before taking actions")
+						if request.get("owner", player) != player: raise Exception(f"Joined as {player}, can't act for {request['owner']}")
+						future = self.SubmitAction(player, _ParseAction(request), request.get("hit"))
+						future.add_done_callback(lambda done, requestId=requestId: _WriteResult(writer, requestId, done.result()))
+					elif op == "start_day":
+						if self.adminToken is not None and request.get("token") != self.adminToken:
+							raise Exception("Starting a day needs the admin token")
+						future = self.StartDay(str(request["date"]))
+						future.add_done_callback(lambda done, requestId=requestId: _WriteResult(writer, requestId, done.result()))
+					elif op == "legal_actions":
+						actions = [_FormatAction(action) for action in self.controller.LegalActions(request["owner"])]
+						writer.write(_Encode({"id": requestId, "ok": True, "actions": actions}))
+					elif op == "subscribe":
+						board = request.get("stream") == "board"
+						if subscriber is None:
+							subscriber = _Subscriber(writer)
+						(self._boardSubscribers if board else self._subscribers).add(subscriber)
+						writer.write(_Encode({"id": requestId, "ok": True}))
+						subscriber.Send(self._KeyFrame() if board else _Encode(self.Update()))
+					else:
+						raise Exception(f"Unknown op {op}")
+				except Exception as error:
+					_WriteResult(writer, requestId, str(error) or type(error).__name__)
+
+				await writer.drain()
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			if subscriber is not None:
+				self._subscribers.discard(subscriber)
+				self._boardSubscribers.discard(subscriber)
+				subscriber.Close()
+			writer.close()
+
+class _Subscriber:
+	"""Pushes updates to one connection, only the newest is kept while the last one is still being written."""
+
+	def __init__(self, writer):
+		self._writer = writer
+		self._pending = None
+		self._ready = asyncio.Event()
+		self._task = asyncio.create_task(self._Run())
+
+	def Send(self, data):
+		self._pending = data
+		self._ready.set()
+
+	def IsBehind(self):
+		"""Whether the last update sent is still waiting to be written."""
+		return self._pending is not None
+
+	def Close(self):
+		self._task.cancel()
+
+	async def _Run(self):
+		try:
+			while True:
+				await self._ready.wait()
+				self._ready.clear()
+				data, self._pending = self._pending, None
+				self._writer.write(data)
+				await self._writer.drain()
+		except ConnectionError:
+			pass
+
+def _Encode(message):
+	return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+def _WriteResult(writer, requestId, error):
+	if writer.is_closing(): return
+	reply = {"id": requestId, "ok": True} if error is None else {"id": requestId, "ok": False, "error": error}
+	writer.write(_Encode(reply))
+
+def _ParseAction(request):
+	target = request.get("target")
+	if isinstance(target, list):
+		target = InternPosition(int(target[0]), int(target[1]))
+	elif request["action_type"] in ("move", "fire"):
+		target = AlgebraicNotationToPosition(target)
+	return LegalAction(request["action_type"], target, request.get("amount"))
+
+def _FormatAction(legalAction):
+	target = legalAction.target
+	if isinstance(target, Position): target = [target.x, target.y]
+	return {"action_type": legalAction.action_type, "target": target, "amount": legalAction.amount}
+
+def _ToAction(date, owner, legalAction, hit):
+	"""The Action that a log would hold for legalAction, targets that are spaces are left as a Position."""
+	action_type, target, amount = legalAction
+	if action_type == FIRE_ACTION:
+		# Interactor treats any metadata as a hit
+		metadata = "True" if hit else ""
+	elif amount is None or action_type == SHARE_LIFE_ACTION:
+		metadata = ""
+	else:
+		metadata = str(amount)
+	return Action(date, owner, action_type, "" if target is None else target, metadata)
+
+if __name__ == "__main__":
+	from TankGame import SetupSeason2, SetupSeason3
+
+	setups = {"2": SetupSeason2, "3": SetupSeason3}
+	if len(sys.argv) not in (3, 4) or sys.argv[1] not in setups:
+		print("Usage: python TankGameServer.py <season 2|3> <[host:]port|unix socket path> [log.csv]")
+		print("Without a host the server only listens on 127.0.0.1")
+		print("Set TANKGAME_ADMIN_TOKEN to require a token to start days and TANKGAME_PLAYER_TOKENS to a json file of")
+		print("{owner: token} to require players to join with their token")
+		sys.exit(1)
+
+	async def Main():
+		playerTokens = None
+		if os.environ.get("TANKGAME_PLAYER_TOKENS"):
+			with open(os.environ["TANKGAME_PLAYER_TOKENS"]) as tokensFile:
+				playerTokens = json.load(tokensFile)
+		server = GameServer(setups[sys.argv[1]](), admin_token=os.environ.get("TANKGAME_ADMIN_TOKEN"),
+							player_tokens=playerTokens, log_path=sys.argv[3] if len(sys.argv) == 4 else None)
+		host, separator, port = sys.argv[2].rpartition(":")
+		if port.isdigit():
+			listener = await server.Start(host if separator else "127.0.0.1", int(port))
+		else:
+			listener = await server.Start(path=sys.argv[2])
+		print("Listening on", ", ".join(str(socket.getsockname()) for socket in listener.sockets))
+		await listener.serve_forever()
+
+	asyncio.run(Main())
@@ -0,0 +1,141 @@
+"""
+Monte Carlo simulation of whole games for comparing rule sets.
+
+Every tank is driven by a Policy that picks one of its LegalActions at a time. Games are spread across a process pool
+and each one gets its own seeded random number generator, so a simulation gives the same results for the same seed no
+matter how many workers run it.
+"""
+import random
+import statistics
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from TankGameController import Distance, MOVE_ACTION, FIRE_ACTION, UPGRADE_ACTION, TRADE_ACTION
+
+# setup - A picklable function that builds the starting controller, for example SetupSeason3
+SimulationJob = namedtuple("SimulationJob", ["setup", "policy", "seed", "max_days", "actions_per_day"])
+
+# gold, kills and survival_days are per tank in controller.tanks order, survival_days is the last day a tank was alive
+GameResult = namedtuple("GameResult", ["seed", "days", "survivors", "gold", "kills", "survival_days", "actions"])
+
+Summary = namedtuple("Summary", ["mean", "stdev", "min", "max"])
+SimulationReport = namedtuple("SimulationReport", ["games", "seconds", "days", "survivors", "gold_per_tank", "kills_per_game", "survival_days", "results"])
+
+class Policy(ABC):
+
+	@abstractmethod
+	def ChooseAction(self, controller, owner, legalActions, rng):
+		"""Return one of legalActions, or None to end this tank's turn for the day."""
+		pass
+
+class RandomPolicy(Policy):
+	"""Pick uniformly between every legal action and ending the turn."""
+
+	def ChooseAction(self, controller, owner, legalActions, rng):
+		choice = rng.randrange(len(legalActions) + 1)
+		return legalActions[choice] if choice < len(legalActions) else None
+
+class AggressivePolicy(Policy):
+	"""Shoot tanks when possible, otherwise spend gold on upgrades or AP and close in on the nearest tank."""
+
+	def ChooseAction(self, controller, owner, legalActions, rng):
+		actor = controller._GetTankByOwner(owner)
+		grid = controller.board.grid
+		byType = {}
+		for action in legalActions:
+			byType.setdefault(action.action_type, []).append(action)
+
+		tankShots = [action for action in byType.get(FIRE_ACTION, []) if grid[action.target.x][action.target.y] in controller.tanks]
+		if tankShots: return rng.choice(tankShots)
+		if UPGRADE_ACTION in byType: return byType[UPGRADE_ACTION][0]
+		if TRADE_ACTION in byType: return byType[TRADE_ACTION][-1]
+
+		moves = byType.get(MOVE_ACTION)
+		enemies = [tank.position for tank in controller.tanks if tank is not actor and tank.lives > 0]
+		if not moves or not enemies: return None
+		nearest = min(enemies, key=lambda position: Distance(actor.position, position))
+		best = min(moves, key=lambda action: Distance(action.target, nearest))
+		if Distance(best.target, nearest) >= Distance(actor.position, nearest): return None
+		return best
+
+def SimulateGame(job):
+	"""Play one game to the end, or to job.max_days, and describe how it went."""
+	rng = random.Random(job.seed)
+	controller = job.setup()
+	tanks = controller.tanks
+	survivalDays = [0] * len(tanks)
+	actions = 0
+
+	day = 0
+	while day < job.max_days and sum(tank.lives > 0 for tank in tanks) > 1:
+		day += 1
+		controller.StartOfTurn()
+
+		order = [tank for tank in tanks if tank.lives > 0]
+		rng.shuffle(order)
+		for tank in order:
+			for _ in range(job.actions_per_day):
+				legalActions = controller.LegalActions(tank.owner)
+				if not legalActions: break
+				action = job.policy.ChooseAction(controller, tank.owner, legalActions, rng)
+				if action is None: break
+				controller.PerformLegalAction(tank.owner, action)
+				actions += 1
+
+		for index, tank in enumerate(tanks):
+			if tank.lives > 0: survivalDays[index] = day
+
+	return GameResult(job.seed, day, sum(tank.lives > 0 for tank in tanks), [tank._totalGold for tank in tanks],
+					  [tank.kills for tank in tanks], survivalDays, actions)
+
+def _Summarize(values):
+	values = list(values)
+	if not values: return Summary(0, 0, 0, 0)
+	return Summary(statistics.fmean(values), statistics.pstdev(values), min(values), max(values))
+
+def GameSeed(seed, game):
+	"""Seed for a single game, derived from the simulation seed so games don't depend on which worker runs them."""
+	return seed * 1000003 + game
+
+def RunSimulation(setup, policy, games, seed=0, max_days=100, actions_per_day=10, max_workers=None):
+	"""Simulate games games of setup with every tank following policy and summarize the results."""
+	jobs = [SimulationJob(setup, policy, GameSeed(seed, game), max_days, actions_per_day) for game in range(games)]
+
+	start = time.perf_counter()
+	if max_workers == 1:
+		results = [SimulateGame(job) for job in jobs]
+	else:
+		with ProcessPoolExecutor(max_workers=max_workers) as executor:
+			results = list(executor.map(SimulateGame, jobs, chunksize=max(1, games // 64)))
+	seconds = time.perf_counter() - start
+
+	return SimulationReport(
+		games,
+		seconds,
+		_Summarize(result.days for result in results),
+		_Summarize(result.survivors for result in results),
+		_Summarize(gold for result in results for gold in result.gold),
+		_Summarize(sum(result.kills) for result in results),
+		_Summarize(days for result in results for days in result.survival_days),
+		results)
+
+def PrintReport(report):
+	print(f"{report.games} games in {report.seconds:.2f}s")
+	for name in ("days", "survivors", "gold_per_tank", "kills_per_game", "survival_days"):
+		summary = getattr(report, name)
+		print(f"  {name:15} mean {summary.mean:8.2f}  stdev {summary.stdev:8.2f}  min {summary.min:6}  max {summary.max:6}")
+
+if __name__ == "__main__":
+	from TankGame import SetupSeason2, SetupSeason3
+
+	setups = {"2": SetupSeason2, "3": SetupSeason3}
+	policies = {"random": RandomPolicy(), "aggressive": AggressivePolicy()}
+	if len(sys.argv) < 3 or sys.argv[1] not in setups or (len(sys.argv) > 3 and sys.argv[3] not in policies):
+		print("Usage: python TankGameSimulator.py <season 2|3> <games> [random|aggressive] [seed]")
+		sys.exit(1)
+
+	policy = policies[sys.argv[3]] if len(sys.argv) > 3 else policies["aggressive"]
+	seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+	PrintReport(RunSimulation(setups[sys.argv[1]], policy, int(sys.argv[2]), seed))
@@ -0,0 +1,208 @@
+"""
+Stream a game's board to spectators as deltas instead of whole frames.
+
+A BoardStream remembers the state it last sent and each Frame holds only what changed since, as a list of ops that
+can be sent as JSON:
+	["a", id, x, y, tile, stats]	the entity was put on the board
+	["r", id]						the entity was taken off the board
+	["m", id, x, y]					the entity moved
+	["s", id, stats]				only the stats that changed, and "tile" when that changed
+ids are "t" or "w" followed by the entity's index in controller.tanks or controller.walls. A BoardView applies the
+frames in order and renders the same text as Board.Render. A viewer that joins late or misses a frame starts again from
+a KeyFrame, which adds every entity.
+
+A stream doesn't rescan the game for each frame. The board tells it about every entity put on or taken off a space and
+the controller's events name the tanks whose stats changed, so a frame only looks at those entities. Undo, Redo and
+changes to stats made outside the controller aren't published, send a KeyFrame after them.
+"""
+from Entities import Board
+from TankGameEvents import DayStarted, Fired
+from TankGameState import CaptureEntityState
+
+# State fields sent as stats, keyed by the entity's id prefix
+STAT_FIELDS = {
+	"t": ("lives", "AP", "gold", "range", "kills"),
+	"w": ("durability",),
+}
+
+class BoardStream:
+
+	def __init__(self, controller):
+		self._controller = controller
+		self.seq = 0
+		self._tiles = {}
+		# The state each entity was last sent with and the entities that may have changed since, by entity id
+		self._sent = {}
+		self._changed = {}
+		self._ids = {}
+		self._IndexEntities()
+		for entityId, entity in self._Entities():
+			self._sent[entityId] = CaptureEntityState(controller.board, entity)
+
+		controller.board.boardStream = self
+		self._events = controller.EnableEvents()
+		self._events.Subscribe(self._OnEvent)
+
+	def Detach(self):
+		"""Stop following the game."""
+		if self._controller.board.boardStream is self: self._controller.board.boardStream = None
+		self._events.Unsubscribe(self._OnEvent)
+
+	def EntityChanged(self, entity):
+		entityId = self._ids.get(id(entity))
+		if entityId is None:
+			# Added to the game after the stream started
+			self._IndexEntities()
+			entityId = self._ids[id(entity)]
+		self._changed[entityId] = entity
+
+	def Frame(self):
+		"""The changes since the last frame or key frame, None if nothing a viewer can see changed."""
+		board = self._controller.board
+		changed, self._changed = self._changed, {}
+		ops = []
+		for entityId, entity in changed.items():
+			state = CaptureEntityState(board, entity)
+			old = self._sent.get(entityId)
+			if state != old:
+				self._EntityOps(ops, entityId, entity, old, state)
+				self._sent[entityId] = state
+
+		if not ops: return None
+		self.seq += 1
+		return {"seq": self.seq, "ops": ops}
+
+	def KeyFrame(self):
+		"""Everything a new viewer needs, frames after it continue from the same seq."""
+		board = self._controller.board
+		self._IndexEntities()
+		self._changed = {}
+		ops = []
+		for entityId, entity in self._Entities():
+			state = CaptureEntityState(board, entity)
+			self._sent[entityId] = state
+			# Walls off the board have been destroyed, tanks off the board still have stats to show
+			if not state.onBoard and entityId[0] == "w": continue
+			self._EntityOps(ops, entityId, entity, None, state)
+
+		return {"seq": self.seq, "key": True, "width": board.width, "height": board.height, "ops": ops}
+
+	def _Entities(self):
+		for prefix, entities in (("t", self._controller.tanks), ("w", self._controller.walls)):
+			for index, entity in enumerate(entities):
+				yield f"{prefix}{index}", entity
+
+	def _IndexEntities(self):
+		self._ids = {id(entity): entityId for entityId, entity in self._Entities()}
+
+	def _OnEvent(self, event):
+		controller = self._controller
+		if type(event) is DayStarted:
+			# Every living tank is about to gain AP
+			for tank in controller.tanks: self.EntityChanged(tank)
+			return
+
+		if type(event) is Fired:
+			# Published before the damage is done so the target is still on the board
+			target = controller.board.grid[event.target.x][event.target.y]
+			if target is not None: self.EntityChanged(target)
+
+		for field in ("owner", "target_owner"):
+			owner = getattr(event, field, None)
+			if owner is not None: self.EntityChanged(controller._GetTankByOwner(owner))
+
+	def _EntityOps(self, ops, entityId, entity, old, new):
+		fields = STAT_FIELDS[entityId[0]]
+		tile = entity.tile
+		if old is None or self._tiles.get(entityId) != tile:
+			self._tiles[entityId] = tile
+		else:
+			tile = None
+
+		if new.onBoard and (old is None or not old.onBoard):
+			stats = {field: getattr(new, field) for field in fields}
+			ops.append(["a", entityId, new.position.x, new.position.y, self._tiles[entityId], stats])
+			return
+
+		if old is not None and old.onBoard and not new.onBoard:
+			ops.append(["r", entityId])
+		elif new.onBoard and old.position != new.position:
+			ops.append(["m", entityId, new.position.x, new.position.y])
+
+		stats = {field: getattr(new, field) for field in fields if old is None or getattr(old, field) != getattr(new, field)}
+		if tile is not None: stats["tile"] = tile
+		if stats: ops.append(["s", entityId, stats])
+
+class _ViewEntity:
+	__slots__ = ("x", "y", "tile", "onBoard", "stats")
+
+	def __init__(self):
+		self.x = None
+		self.y = None
+		self.tile = "  "
+		self.onBoard = False
+		self.stats = {}
+
+class BoardView:
+	"""A spectator's copy of the board built from BoardStream frames."""
+
+	def __init__(self):
+		self.width = 0
+		self.height = 0
+		self.grid = []
+		self.entities = {}
+		self.seq = None
+
+	def Apply(self, frame):
+		if frame.get("key"):
+			self.width = frame["width"]
+			self.height = frame["height"]
+			self.grid = [[None] * self.height for x in range(self.width)]
+			self.entities = {}
+		elif self.seq is None or frame["seq"] != self.seq + 1:
+			raise Exception(f"Frame {frame['seq']} doesn't follow frame {self.seq}, the view needs a key frame")
+
+		for op in frame["ops"]:
+			OPS[op[0]](self, *op[1:])
+		self.seq = frame["seq"]
+
+	# Board only reads width, height and the tiles of grid to render
+	Render = Board.Render
+	RenderFrame = Board.RenderFrame
+
+	def _Entity(self, entityId):
+		entity = self.entities.get(entityId)
+		if entity is None:
+			entity = _ViewEntity()
+			self.entities[entityId] = entity
+		return entity
+
+	def _Leave(self, entity):
+		# Another entity may have already moved into the space earlier in the same frame
+		if entity.onBoard and self.grid[entity.x][entity.y] is entity:
+			self.grid[entity.x][entity.y] = None
+
+	def _Add(self, entityId, x, y, tile, stats):
+		entity = self._Entity(entityId)
+		self._Leave(entity)
+		entity.x, entity.y, entity.tile, entity.onBoard = x, y, tile, True
+		entity.stats.update(stats)
+		self.grid[x][y] = entity
+
+	def _Remove(self, entityId):
+		entity = self.entities[entityId]
+		self._Leave(entity)
+		entity.onBoard = False
+
+	def _Move(self, entityId, x, y):
+		entity = self.entities[entityId]
+		self._Leave(entity)
+		entity.x, entity.y = x, y
+		self.grid[x][y] = entity
+
+	def _Stats(self, entityId, stats):
+		entity = self._Entity(entityId)
+		entity.tile = stats.get("tile", entity.tile)
+		entity.stats.update((field, value) for field, value in stats.items() if field != "tile")
+
+OPS = {"a": BoardView._Add, "r": BoardView._Remove, "m": BoardView._Move, "s": BoardView._Stats}
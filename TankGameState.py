@@ -0,0 +1,58 @@
+"""
+Capturing and restoring the parts of a game that change while it is played.
+
+Undo and the Timeline both record games through these helpers. An entity's state is a TankState or WallState, which also
+says whether the entity is on the board. Day lists are the tanks already in the once per day give AP and give life rules,
+held as indices into controller.tanks and None for rules that don't keep one.
+"""
+from collections import namedtuple
+from Entities import Wall
+
+TankState = namedtuple("TankState", ["position", "onBoard", "lives", "maxLives", "AP", "maxAp", "gold", "range", "kills", "totalMoves", "totalGold"])
+WallState = namedtuple("WallState", ["position", "onBoard", "durability"])
+
+DAY_LIST_RULES = ("giveApRule", "giveLifeRule")
+
+def IsOnBoard(board, entity):
+	return board.grid[entity.position.x][entity.position.y] is entity
+
+def CaptureEntityState(board, entity):
+	state = entity.GetState()
+	stateType = WallState if isinstance(entity, Wall) else TankState
+	return stateType(state[0], IsOnBoard(board, entity), *state[1:])
+
+def RestoreEntityStates(board, entityStates):
+	"""Put each (entity, state) pair back, entities can move into spaces vacated by others in the same call."""
+	# Take everything that moves off the board first
+	moving = [(entity, state) for entity, state in entityStates
+			  if entity.position != state.position or IsOnBoard(board, entity) != state.onBoard]
+	for entity, state in moving:
+		if IsOnBoard(board, entity): board.RemoveEntity(entity)
+
+	for entity, state in entityStates:
+		entity.SetState((state.position,) + tuple(state[2:]))
+
+	for entity, state in moving:
+		if state.onBoard: board.AddEntity(entity)
+
+def CaptureDayLists(controller):
+	tankIndices = controller._ownerIndex
+	dayLists = []
+	for ruleName in DAY_LIST_RULES:
+		actorList = getattr(getattr(controller.gameRules, ruleName), "actorList", None)
+		dayLists.append(None if actorList is None else tuple(tankIndices[tank.owner] for tank in actorList))
+	return tuple(dayLists)
+
+def DayActorLists(controller):
+	"""The rules' own day list objects, restoring into them keeps anything that holds one up to date."""
+	return tuple(getattr(getattr(controller.gameRules, ruleName), "actorList", None) for ruleName in DAY_LIST_RULES)
+
+def RestoreDayLists(controller, dayLists, actorLists=None):
+	"""Put captured day lists back, refilling the list objects in actorLists rather than making new ones when given."""
+	for index, (ruleName, tankIndices) in enumerate(zip(DAY_LIST_RULES, dayLists)):
+		if tankIndices is None: continue
+		tanks = [controller.tanks[tankIndex] for tankIndex in tankIndices]
+		if actorLists is not None:
+			actorLists[index][:] = tanks
+			tanks = actorLists[index]
+		getattr(controller.gameRules, ruleName).actorList = tanks
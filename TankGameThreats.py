@@ -0,0 +1,150 @@
+"""
+Which tanks can shoot each space, kept up to date as the board changes.
+
+A ThreatMap holds every space's threat count and a bitset of the tanks covering it, bit i for controller.tanks[i]. A
+tank covers the spaces within its range it has line of sight to, the same spaces LegalActions would let it fire on if
+they were occupied, whether or not it has the AP to fire right now. Tanks off the board cover nothing.
+
+The board tells the map about every space an entity is added to or removed from, which covers moves, kills and walls
+being destroyed. Only tanks within range of a changed space can see differently, so the map also keeps which tanks
+each space is within range of. Only those tanks, plus any that moved or whose range changed, are swept again, and only
+when the map is next read.
+"""
+
+class ThreatMap:
+
+	def __init__(self, controller):
+		self._controller = controller
+		board = controller.board
+		self.counts = [[0] * board.height for x in range(board.width)]
+		# (x, y) -> bitset, only spaces covered by at least one tank
+		self._bits = {}
+		# (x, y) -> bitset of the tanks on the board the space is within range of, only spaces within range of one
+		self._reach = {}
+		# Per tank, the (position, range, on board) its coverage was swept with, the spaces it covers and the
+		# (x, y) keys of the spaces within its range
+		self._tankStates = []
+		self._coverage = []
+		self._reachKeys = []
+		self._dirtySpaces = set()
+		self.sweeps = 0
+		board.threatMap = self
+		self.Rebuild()
+
+	def Detach(self):
+		"""Stop following the board."""
+		if self._controller.board.threatMap is self: self._controller.board.threatMap = None
+
+	def SpaceChanged(self, position):
+		self._dirtySpaces.add((position.x, position.y))
+
+	def Rebuild(self):
+		"""Sweep every tank again, for changes made behind the board's back such as a Timeline restoring a day."""
+		for index in range(len(self._tankStates)):
+			self._Sweep(index)
+		self._dirtySpaces.clear()
+		self.Refresh()
+
+	def Refresh(self):
+		"""Sweep the tanks affected by changes since the last refresh, every query does this first."""
+		tanks = self._controller.tanks
+		grid = self._controller.board.grid
+		while len(self._tankStates) < len(tanks):
+			self._tankStates.append(None)
+			self._coverage.append(())
+			self._reachKeys.append(())
+
+		# Work out every tank to sweep before sweeping any, sweeping changes which tanks are in range of a space
+		dirty = set()
+		reach = self._reach
+		for key in self._dirtySpaces:
+			inRange = reach.get(key, 0)
+			while inRange:
+				lowest = inRange & -inRange
+				dirty.add(lowest.bit_length() - 1)
+				inRange ^= lowest
+		self._dirtySpaces.clear()
+
+		for index, tank in enumerate(tanks):
+			position = tank.position
+			if (position, tank.range, grid[position.x][position.y] is tank) != self._tankStates[index]: dirty.add(index)
+
+		for index in dirty:
+			self._Sweep(index)
+
+	def ThreatCount(self, position):
+		"""How many tanks can shoot position."""
+		self.Refresh()
+		return self.counts[position.x][position.y]
+
+	def ThreatBits(self, position):
+		"""Bitset of the indices in controller.tanks of the tanks that can shoot position."""
+		self.Refresh()
+		return self._bits.get((position.x, position.y), 0)
+
+	def Threats(self, position):
+		"""The tanks that can shoot position."""
+		bits = self.ThreatBits(position)
+		tanks = self._controller.tanks
+		threats = []
+		while bits:
+			lowest = bits & -bits
+			threats.append(tanks[lowest.bit_length() - 1])
+			bits ^= lowest
+		return threats
+
+	def Coverage(self, owner):
+		"""The spaces the tank belonging to owner can shoot."""
+		self.Refresh()
+		tank = self._controller._GetTankByOwner(owner)
+		return set(self._coverage[self._controller.tanks.index(tank)])
+
+	def Overlay(self):
+		"""An overlay for Board.Render showing the threat count of each empty space."""
+		self.Refresh()
+		counts = self.counts
+		return lambda x, y: f"{counts[x][y]:2}" if counts[x][y] else "  "
+
+	def _Sweep(self, index):
+		tank = self._controller.tanks[index]
+		board = self._controller.board
+		bit = 1 << index
+		counts = self.counts
+		bits = self._bits
+
+		for position in self._coverage[index]:
+			counts[position.x][position.y] -= 1
+			key = (position.x, position.y)
+			remaining = bits[key] & ~bit
+			if remaining: bits[key] = remaining
+			else: del bits[key]
+
+		position = tank.position
+		onBoard = board.grid[position.x][position.y] is tank
+		coverage = board.VisibleCells(position, tank.range) if onBoard else ()
+		self.sweeps += 1
+		for cell in coverage:
+			counts[cell.x][cell.y] += 1
+			key = (cell.x, cell.y)
+			bits[key] = bits.get(key, 0) | bit
+
+		self._coverage[index] = coverage
+		self._SetReach(index, bit, position, tank.range if onBoard else None)
+		self._tankStates[index] = (position, tank.range, onBoard)
+
+	def _SetReach(self, index, bit, position, tankRange):
+		reach = self._reach
+		for key in self._reachKeys[index]:
+			remaining = reach[key] & ~bit
+			if remaining: reach[key] = remaining
+			else: del reach[key]
+
+		keys = ()
+		if tankRange is not None:
+			board = self._controller.board
+			xs = range(max(0, position.x - tankRange), min(board.width, position.x + tankRange + 1))
+			ys = range(max(0, position.y - tankRange), min(board.height, position.y + tankRange + 1))
+			keys = [(x, y) for x in xs for y in ys]
+			for key in keys:
+				reach[key] = reach.get(key, 0) | bit
+		self._reachKeys[index] = keys
@@ -0,0 +1,112 @@
+"""
+Random access to the state of a game at the end of any day.
+
+A Timeline keeps a full snapshot every keyframe_interval days and a delta with only the tanks, walls, council coffer and
+day counter that changed on each day in between. Rebuilding a day starts a fresh controller from the same setup, restores the
+closest earlier keyframe and applies at most keyframe_interval - 1 deltas so the cost does not grow with the log.
+"""
+from collections import namedtuple
+from TankGameInteractor import Interactor
+from TankGameState import CaptureEntityState, RestoreEntityStates, CaptureDayLists, RestoreDayLists
+
+# tanks and walls map an index into controller.tanks / controller.walls to that entity's TankState or WallState, dayLists
+# are as TankGameState captures them.
+Snapshot = namedtuple("Snapshot", ["tanks", "walls", "coffer", "dayLists", "day"])
+# Same shape as a snapshot but only holds the entities that changed, coffer, dayLists and day are None when unchanged
+Delta = namedtuple("Delta", ["tanks", "walls", "coffer", "dayLists", "day"])
+
+def CaptureSnapshot(controller):
+	board = controller.board
+	tanks = {index: CaptureEntityState(board, tank) for index, tank in enumerate(controller.tanks)}
+	walls = {index: CaptureEntityState(board, wall) for index, wall in enumerate(controller.walls)}
+	return Snapshot(tanks, walls, controller.council.coffer, CaptureDayLists(controller), controller.day)
+
+def DiffSnapshots(old, new):
+	"""Find what changed between two snapshots of the same game."""
+	return Delta(
+		{index: state for index, state in new.tanks.items() if old.tanks[index] != state},
+		{index: state for index, state in new.walls.items() if old.walls[index] != state},
+		None if old.coffer == new.coffer else new.coffer,
+		None if old.dayLists == new.dayLists else new.dayLists,
+		None if old.day == new.day else new.day)
+
+def ApplyDelta(controller, delta):
+	"""Apply a Delta, or a whole Snapshot, to a controller that was set up the same way as the one it came from."""
+	RestoreEntityStates(controller.board,
+		[(controller.tanks[index], state) for index, state in delta.tanks.items()] +
+		[(controller.walls[index], state) for index, state in delta.walls.items()])
+
+	if delta.coffer is not None:
+		controller.council.coffer = delta.coffer
+
+	if delta.day is not None:
+		controller._SetDay(delta.day)
+
+	if delta.dayLists is not None:
+		RestoreDayLists(controller, delta.dayLists)
+
+def RestoreSnapshot(controller, snapshot):
+	ApplyDelta(controller, snapshot)
+
+class Timeline:
+
+	def __init__(self, controller_factory, keyframe_interval=10):
+		"""
+		controller_factory - Builds a controller in the state the game started in, for example SetupSeason2
+		keyframe_interval - Days between full snapshots
+		"""
+		self._controllerFactory = controller_factory
+		self.keyframeInterval = keyframe_interval
+		self.dates = []
+		self._keyframes = {}
+		self._deltas = {}
+		self._lastSnapshot = None
+
+	def Record(self, controller, date):
+		"""Record controller as the state at the end of date, days must be recorded in order."""
+		snapshot = CaptureSnapshot(controller)
+		day = len(self.dates)
+		if day % self.keyframeInterval == 0:
+			self._keyframes[day] = snapshot
+		else:
+			self._deltas[day] = DiffSnapshots(self._lastSnapshot, snapshot)
+
+		self._lastSnapshot = snapshot
+		self.dates.append(date)
+
+	def Rebuild(self, day):
+		"""Build a new controller in the state at the end of the day-th recorded day (0 is the first)."""
+		if not 0 <= day < len(self.dates):
+			raise Exception(f"Day {day} has not been recorded, the timeline has {len(self.dates)} days")
+
+		controller = self._controllerFactory()
+		keyframeDay = day - day % self.keyframeInterval
+		RestoreSnapshot(controller, self._keyframes[keyframeDay])
+		for deltaDay in range(keyframeDay + 1, day + 1):
+			ApplyDelta(controller, self._deltas[deltaDay])
+		return controller
+
+	def RebuildDate(self, date):
+		return self.Rebuild(self.dates.index(date))
+
+	def __len__(self):
+		return len(self.dates)
+
+def RecordTimeline(controller_factory, action_source, keyframe_interval=10):
+	"""Replay action_source on a new controller and record the state at the end of every day."""
+	controller = controller_factory()
+	interactor = Interactor(controller)
+	timeline = Timeline(controller_factory, keyframe_interval)
+
+	date = None
+	while action_source.HasAnotherAction():
+		action = action_source.NextAction()
+		if date is not None and action.date != date:
+			timeline.Record(controller, date)
+		date = action.date
+		interactor.TakeAction(action)
+
+	if date is not None:
+		timeline.Record(controller, date)
+
+	return timeline
@@ -0,0 +1,93 @@
+"""
+Struct-of-arrays storage for tanks.
+
+A TankTable keeps the fields that change most during a game, lives, AP, gold, range, kills and the x and y of each
+tank's position, in one typed array per field instead of on every tank. Its rows are TableTanks which behave exactly
+like a Tank so GameController and the rules use them unchanged, while code that looks at every tank at once can read a
+whole column. numpy.frombuffer(table.gold, dtype=numpy.int64) gives a numpy view without copying, as long as no tank is
+added while the view is in use.
+"""
+from array import array
+from Entities import BaseTank
+
+# 64 bit signed, the same as numpy.int64
+TYPECODE = "q"
+COLUMNS = ("lives", "AP", "gold", "range", "kills", "x", "y")
+
+# Tank fields that stay on the row object rather than in a column
+ROW_FIELDS = ("owner", "maxLives", "maxAp", "_totalMoves", "_totalGold", "tile")
+
+class TankTable:
+
+	def __init__(self):
+		for column in COLUMNS:
+			setattr(self, column, array(TYPECODE))
+		# The Position object of each row so reading tank.position doesn't build a new one
+		self.positions = []
+		self.tanks = []
+
+	def AddTank(self, position, owner, tile=None):
+		"""Add a row and return the TableTank for it, set up the same as Tank(position, owner, tile)."""
+		row = len(self.tanks)
+		for column in COLUMNS:
+			getattr(self, column).append(0)
+		self.positions.append(position)
+		tank = TableTank(self, row, position, owner, tile)
+		self.tanks.append(tank)
+		return tank
+
+	def Copy(self):
+		"""Make an independent table with a copy of every row, copy.tanks[i] is the copy of tanks[i]."""
+		copy = TankTable()
+		for column in COLUMNS:
+			setattr(copy, column, array(TYPECODE, getattr(self, column)))
+		copy.positions = list(self.positions)
+		copy.tanks = [tank._CopyInto(copy) for tank in self.tanks]
+		return copy
+
+	def __len__(self):
+		return len(self.tanks)
+
+def _ColumnProperty(column, field):
+	def Get(self):
+		return getattr(self._table, column)[self._row]
+
+	def Set(self, value):
+		getattr(self._table, column)[self._row] = value
+
+	return property(Get, Set, doc=f"Tank.{field} stored in the {column} column")
+
+class TableTank(BaseTank):
+	"""A tank that behaves exactly like a Tank but keeps lives, AP, gold, range, kills and position in a TankTable row."""
+	__slots__ = ("_table", "_row")
+
+	def __init__(self, table, row, position, owner, tile=None):
+		# BaseTank.__init__ writes to the columns so the row has to be known first
+		object.__setattr__(self, "_table", table)
+		object.__setattr__(self, "_row", row)
+		super().__init__(position, owner, tile)
+
+	lives = _ColumnProperty("lives", "lives")
+	AP = _ColumnProperty("AP", "AP")
+	_gold = _ColumnProperty("gold", "_gold")
+	range = _ColumnProperty("range", "range")
+	kills = _ColumnProperty("kills", "kills")
+
+	@property
+	def position(self):
+		return self._table.positions[self._row]
+
+	@position.setter
+	def position(self, value):
+		table = self._table
+		table.positions[self._row] = value
+		table.x[self._row] = value.x
+		table.y[self._row] = value.y
+
+	def _CopyInto(self, table):
+		copy = TableTank.__new__(TableTank)
+		object.__setattr__(copy, "_table", table)
+		object.__setattr__(copy, "_row", self._row)
+		for name in ROW_FIELDS:
+			object.__setattr__(copy, name, getattr(self, name))
+		return copy
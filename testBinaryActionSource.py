@@ -0,0 +1,76 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+from BinaryActionSource import BinaryActionSource, ConvertCsvToBinary
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2, PrintTanks
+from TankGameInteractor import Interactor, TargetToPosition
+
+class TestBinaryActionSource(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".tgal")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def _read_all(self, source):
+        actions = []
+        while source.HasAnotherAction():
+            actions.append(source.NextAction())
+        return actions
+
+    def test_round_trip(self):
+        with CsvActionSource("game2.csv") as source:
+            expected = self._read_all(source)
+        self.assertEqual(ConvertCsvToBinary("game2.csv", self.path), len(expected))
+        with BinaryActionSource(self.path) as source:
+            actual = self._read_all(source)
+
+        self.assertEqual(len(actual), len(expected))
+        for binaryAction, csvAction in zip(actual, expected):
+            self.assertEqual(binaryAction._replace(target=None), csvAction._replace(target=None))
+            if csvAction.action_type in ("move", "fire"):
+                self.assertEqual(binaryAction.target, TargetToPosition(csvAction.target))
+            else:
+                self.assertEqual(binaryAction.target, csvAction.target)
+
+    def test_replay_matches_csv(self):
+        ConvertCsvToBinary("game2.csv", self.path)
+        results = []
+        for source in (CsvActionSource("game2.csv"), BinaryActionSource(self.path)):
+            controller = SetupSeason2()
+            output = io.StringIO()
+            with source, redirect_stdout(output):
+                Interactor(controller).TakeActions(source)
+                PrintTanks(controller)
+                controller.board.Render()
+            results.append(output.getvalue())
+
+        self.assertEqual(results[0], results[1])
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as binary:
+            binary.write(b"date,actor,action_type,target,metadata\n" * 2)
+        with self.assertRaises(Exception):
+            BinaryActionSource(self.path)
+
+    def test_rejects_empty_and_truncated_files(self):
+        ConvertCsvToBinary("game2.csv", self.path)
+        with open(self.path, "rb") as binary:
+            data = binary.read()
+
+        opened = []
+        realOpen = open
+        def TrackingOpen(*args, **kwargs):
+            opened.append(realOpen(*args, **kwargs))
+            return opened[-1]
+
+        for length in (0, 10, len(data) // 2, len(data) - 1):
+            with open(self.path, "wb") as binary:
+                binary.write(data[:length])
+            with mock.patch("builtins.open", TrackingOpen):
+                with self.assertRaisesRegex(Exception, "not a version 1 binary action log"):
+                    BinaryActionSource(self.path)
+            self.assertTrue(opened[-1].closed, length)
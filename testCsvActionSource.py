@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from csv import DictReader
+from CsvActionSource import CsvActionSource
+from TankGameInteractor import Action
+
+class TestCsvActionSource(unittest.TestCase):
+    def _write_log(self, rows):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as log:
+            log.write("date,actor,action_type,target,metadata\n")
+            for row in rows:
+                log.write(row + "\n")
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_reads_every_row_in_order(self):
+        with open("game2.csv", newline="") as log:
+            expected = [Action(**row) for row in DictReader(log)]
+
+        actions = []
+        with CsvActionSource("game2.csv") as source:
+            while source.HasAnotherAction():
+                actions.append(source.NextAction())
+
+        self.assertEqual(actions, expected)
+
+    def test_file_closed_after_last_action(self):
+        source = CsvActionSource(self._write_log(["1/1/24,Ryan,move,B2,"]))
+        self.assertFalse(source._file.closed)
+        source.NextAction()
+        self.assertFalse(source.HasAnotherAction())
+        self.assertTrue(source._file.closed)
+
+    def test_close_early(self):
+        with CsvActionSource(self._write_log(["1/1/24,Ryan,move,B2,", "1/1/24,Ryan,move,B3,"])) as source:
+            source.NextAction()
+        self.assertTrue(source._file.closed)
+        self.assertFalse(source.HasAnotherAction())
+
+    def test_empty_log(self):
+        source = CsvActionSource(self._write_log([]))
+        self.assertFalse(source.HasAnotherAction())
+        self.assertTrue(source._file.closed)
+        self.assertEqual(source.num_actions, 0)
+
+    def test_exhausted_log_raises_index_error(self):
+        with CsvActionSource(self._write_log(["1/1/24,Ryan,move,B2,", "1/1/24,Ryan,move,B3,"])) as source:
+            self.assertEqual(source.num_actions, 2)
+            source.NextAction()
+            source.NextAction()
+            with self.assertRaises(IndexError):
+                source.NextAction()
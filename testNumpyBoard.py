@@ -0,0 +1,83 @@
+import io
+import random
+import unittest
+from contextlib import redirect_stdout
+import testTankGameBoard
+from Entities import Board, Position, Tank, Wall
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2, PrintTanks
+from TankGameInteractor import Interactor
+
+try:
+    from NumpyBoard import NumpyBoard
+except ImportError:
+    NumpyBoard = None
+
+@unittest.skipIf(NumpyBoard is None, "numpy is not installed")
+class TestNumpyBoardLineOfSight(testTankGameBoard.TestBoard):
+    def _make_board(self):
+        board = NumpyBoard(testTankGameBoard.WIDTH, testTankGameBoard.HEIGHT)
+        for entity in self.entities:
+            board.AddEntity(entity)
+        return board
+
+@unittest.skipIf(NumpyBoard is None, "numpy is not installed")
+class TestNumpyBoard(unittest.TestCase):
+    def test_grid_matches_list_board(self):
+        rng = random.Random(5)
+        listBoard = Board(12, 10)
+        numpyBoard = NumpyBoard(12, 10)
+        entities = []
+        for x in range(12):
+            for y in range(10):
+                if rng.random() < 0.3:
+                    entity = Wall(Position(x, y), 3) if rng.random() < 0.5 else Tank(Position(x, y), "TT")
+                    listBoard.AddEntity(entity)
+                    numpyBoard.AddEntity(entity)
+                    entities.append(entity)
+
+        for entity in entities[::2]:
+            listBoard.RemoveEntity(entity)
+            numpyBoard.RemoveEntity(entity)
+
+        for x in range(12):
+            for y in range(10):
+                self.assertIs(numpyBoard.grid[x][y], listBoard.grid[x][y])
+                self.assertEqual(numpyBoard.IsSpaceOccupied(Position(x, y)), listBoard.IsSpaceOccupied(Position(x, y)))
+
+        for _ in range(200):
+            a = Position(rng.randrange(12), rng.randrange(10))
+            b = Position(rng.randrange(12), rng.randrange(10))
+            ignored = rng.choice([[], [Wall], [Tank]])
+            self.assertEqual(numpyBoard._ComputeLineOfSight(a, b, ignored), listBoard._ComputeLineOfSight(a, b, ignored))
+
+    def test_add_to_occupied_space_fails(self):
+        board = NumpyBoard(3, 3)
+        board.AddEntity(Wall(Position(1, 1), 3))
+        with self.assertRaises(Exception):
+            board.AddEntity(Tank(Position(1, 1), "TT"))
+
+    def test_season_2_replay_matches(self):
+        results = []
+        for board_class in (Board, NumpyBoard):
+            controller = SetupSeason2(board_class)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                Interactor(controller).TakeActions(CsvActionSource("game2.csv"))
+                PrintTanks(controller)
+                controller.board.Render()
+            results.append(output.getvalue())
+
+        self.assertEqual(results[0], results[1])
+
+    def test_state_hash_matches_list_board(self):
+        hashes = []
+        for board_class in (Board, NumpyBoard):
+            controller = SetupSeason2(board_class)
+            controller.EnableStateHash()
+            with redirect_stdout(io.StringIO()), CsvActionSource("game2.csv") as source:
+                Interactor(controller).TakeActions(source)
+            self.assertEqual(controller.StateHash(), controller.ComputeStateHash())
+            hashes.append(controller.StateHash())
+
+        self.assertEqual(hashes[0], hashes[1])
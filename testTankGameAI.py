@@ -0,0 +1,51 @@
+import random
+import unittest
+from TankGame import SetupSeason2, SetupSeason3
+from TankGameAI import MctsPolicy, EvaluateTank, END_TURN
+from TankGameSimulator import RunSimulation
+from TankGameTimeline import CaptureSnapshot
+
+class TestMcts(unittest.TestCase):
+    def test_choice_is_legal_and_leaves_game_untouched(self):
+        controller = SetupSeason3()
+        for _ in range(3):
+            controller.StartOfTurn()
+        before = CaptureSnapshot(controller)
+        legalActions = controller.LegalActions("Ryan")
+
+        policy = MctsPolicy(time_budget=10, max_playouts=30)
+        action = policy.ChooseAction(controller, "Ryan", legalActions, random.Random(3))
+
+        self.assertTrue(action is END_TURN or action in legalActions)
+        self.assertEqual(policy.lastPlayouts, 30)
+        self.assertEqual(CaptureSnapshot(controller), before)
+
+    def test_takes_a_free_kill(self):
+        controller = SetupSeason2()
+        for _ in range(3):
+            controller.StartOfTurn()
+        # Taylore can shoot Beyer two spaces along the top row, Beyer is down to the last life
+        target = controller._GetTankByOwner("Beyer")
+        target.lives = 1
+        shooter = controller._GetTankByOwner("Taylore")
+        fire = [action for action in controller.LegalActions("Taylore") if action.target == target.position]
+        self.assertTrue(fire)
+
+        # Without rollouts the search only sees the evaluation so the answer doesn't depend on random play
+        policy = MctsPolicy(time_budget=10, max_playouts=200, rollout_days=0)
+        for seed in range(3):
+            action = policy.ChooseAction(controller, shooter.owner, controller.LegalActions(shooter.owner), random.Random(seed))
+            self.assertEqual(action, fire[0])
+
+    def test_evaluation_range(self):
+        controller = SetupSeason3()
+        ryan = controller._GetTankByOwner("Ryan")
+        self.assertAlmostEqual(EvaluateTank(controller, ryan), 0.5)
+        ryan._gold = 20
+        self.assertGreater(EvaluateTank(controller, ryan), 0.5)
+        ryan.lives = 0
+        self.assertEqual(EvaluateTank(controller, ryan), 0.0)
+
+    def test_plays_in_simulator(self):
+        report = RunSimulation(SetupSeason2, MctsPolicy(time_budget=10, max_playouts=3), 1, max_days=2, actions_per_day=2, max_workers=1)
+        self.assertEqual(report.days.max, 2)
@@ -0,0 +1,34 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2, SetupSeason3
+from TankGameBatch import ReplayBatch, ReplayJob
+from TankGameInteractor import Interactor
+from TankGameTimeline import CaptureSnapshot
+
+class TestReplayBatch(unittest.TestCase):
+    def test_batch_results(self):
+        jobs = [
+            ReplayJob("game2.csv", SetupSeason2),
+            ReplayJob("game3.csv", SetupSeason3),
+            ReplayJob("missing.csv", SetupSeason2),
+            ReplayJob("game2.csv", SetupSeason2),
+        ]
+        results = ReplayBatch(jobs, max_workers=2)
+
+        controller = SetupSeason2()
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            Interactor(controller).TakeActions(source)
+
+        self.assertEqual([result.log_path for result in results], [job.log_path for job in jobs])
+        for index in (0, 3):
+            self.assertIsNone(results[index].error)
+            self.assertEqual(results[index].snapshot, CaptureSnapshot(controller))
+            self.assertEqual(results[index].tanks, [str(tank) for tank in controller.tanks])
+        self.assertIsNone(results[1].error)
+        self.assertEqual(results[1].actions, 0)
+        self.assertIn("FileNotFoundError", results[2].error)
+
+    def test_empty_batch(self):
+        self.assertEqual(ReplayBatch([]), [])
@@ -0,0 +1,60 @@
+import copy
+import unittest
+from TankGameBenchmark import BuildSyntheticGame, GenerateMoveLog, TimeReplay, TankTile, CompareResults, \
+    BenchmarkBatchScaling, BenchmarkHookOverhead
+
+class TestSyntheticGame(unittest.TestCase):
+    def test_build(self):
+        game = BuildSyntheticGame(40, 30, 100, 200, 6, seed=3)
+        self.assertEqual(len(game.tanks), 100)
+        self.assertEqual(len(game.walls), 200)
+        self.assertEqual(len(game.goldMines), 6)
+        for entity in game.tanks + game.walls:
+            self.assertIs(game.board.grid[entity.position.x][entity.position.y], entity)
+        game.StartOfTurn()
+
+    def test_move_log_is_legal(self):
+        game = BuildSyntheticGame(40, 30, 100, 200, 0, seed=3)
+        actions = GenerateMoveLog(game, 2000, actionsPerDay=100, algebraic=False)
+        TimeReplay(game, actions)
+        finalPositions = {action.actor: action.target for action in actions}
+        for tank in game.tanks:
+            self.assertEqual(tank.position, finalPositions.get(tank.owner, tank.position))
+
+    def test_batch_scaling(self):
+        result = BenchmarkBatchScaling(numJobs=4, numTanks=20, numActions=100, max_workers=3)
+        self.assertEqual(list(result), ["jobs", "1_workers_seconds", "2_workers_seconds", "3_workers_seconds"])
+
+    def test_hook_overhead(self):
+        result = BenchmarkHookOverhead(numCalls=100)
+        self.assertEqual(result["calls"], 100)
+        self.assertGreater(result["hooked_seconds"], 0)
+
+    def test_tiles_are_unique(self):
+        tiles = [TankTile(index) for index in range(10000)]
+        self.assertEqual(len(set(tiles)), len(tiles))
+        self.assertEqual(TankTile(0), "AA")
+
+
+class TestCompareResults(unittest.TestCase):
+    def setUp(self):
+        self.baseline = {"scale": "small", "params": {"size": 10}, "results": {
+            "start_of_turn": {"days": 5, "start_of_turn_seconds": 1.0},
+            "line_of_sight": {"queries": 5, "cold_seconds": 2.0, "cached_seconds": 0.5},
+        }}
+
+    def test_regressions(self):
+        current = copy.deepcopy(self.baseline)
+        current["results"]["line_of_sight"]["cold_seconds"] = 3.0
+        current["results"]["start_of_turn"]["start_of_turn_seconds"] = 1.1
+        current["results"]["new_benchmark"] = {"days": 5, "new_seconds": 9.0}
+        self.assertEqual(CompareResults(self.baseline, current), [("line_of_sight", "cold_seconds", 2.0, 3.0)])
+
+    def test_different_parameters(self):
+        current = copy.deepcopy(self.baseline)
+        current["params"]["size"] = 20
+        with self.assertRaises(Exception):
+            CompareResults(self.baseline, current)
+
+if __name__ == '__main__':
+    unittest.main()
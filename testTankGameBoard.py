@@ -1,5 +1,7 @@
+import random
 import unittest
-from Entities import Board, Position, Wall, Tank
+from unittest import mock
+from Entities import Board, Position, Wall, Tank, Council, GoldMine, ExpandingGoldMine
 from TankGameInteractor import AlgebraicNotationToPosition
 
 WIDTH = 9
@@ -151,3 +153,182 @@ class TestBoard(unittest.TestCase):
 
         self._check_line_of_sight(0, 2, False) # T1 can't see T2
         self._check_line_of_sight(0, 2, True, ignoredEntities=[Wall]) # T1 can see T2
+
+
+class TestLineOfSightCache(unittest.TestCase):
+    def setUp(self):
+        self.board = Board(WIDTH, HEIGHT)
+        self.board.EnableLineOfSightCache()
+        self.t1 = Tank(Position(0, 0), "T1")
+        self.t2 = Tank(Position(4, 2), "T2")
+        self.board.AddEntity(self.t1)
+        self.board.AddEntity(self.t2)
+
+    def test_repeated_query_hits_cache(self):
+        self.assertTrue(self.board.DoesLineOfSightExist(self.t1, self.t2))
+        self.assertTrue(self.board.DoesLineOfSightExist(self.t1, self.t2))
+        self.assertEqual(self.board.losCacheMisses, 1)
+        self.assertEqual(self.board.losCacheHits, 1)
+
+    def test_ignored_types_are_part_of_the_key(self):
+        self.board.DoesLineOfSightExist(self.t1, self.t2)
+        self.board.DoesLineOfSightExist(self.t1, self.t2, ignoredEntities=[Wall])
+        self.assertEqual(self.board.losCacheMisses, 2)
+
+    def test_change_inside_bounding_box_invalidates(self):
+        self.assertTrue(self.board.DoesLineOfSightExist(self.t1, self.t2))
+        wall = Wall(Position(2, 1), 5)
+        self.board.AddEntity(wall)
+        self.assertFalse(self.board.DoesLineOfSightExist(self.t1, self.t2))
+        self.board.RemoveEntity(wall)
+        self.assertTrue(self.board.DoesLineOfSightExist(self.t1, self.t2))
+        self.assertEqual(self.board.losCacheHits, 0)
+
+    def test_change_outside_bounding_box_keeps_entry(self):
+        self.board.DoesLineOfSightExist(self.t1, self.t2)
+        self.board.AddEntity(Wall(Position(6, 6), 5))
+        self.board.DoesLineOfSightExist(self.t1, self.t2)
+        self.assertEqual(self.board.losCacheHits, 1)
+
+    def test_off_by_default(self):
+        board = Board(WIDTH, HEIGHT)
+        board.AddEntity(self.t1)
+        board.DoesLineOfSightExist(self.t1, self.t2)
+        board.DoesLineOfSightExist(self.t1, self.t2)
+        self.assertEqual((board.losCacheHits, board.losCacheMisses), (0, 2))
+        self.assertIsNone(board._losCache)
+        self.assertIsNotNone(self.board.Copy([])._losCache)
+
+    def test_cache_is_bounded(self):
+        # Each pair from t1 indexes a 5 x 3 bounding box
+        with mock.patch("Entities.LOS_CACHE_CELL_LIMIT", 40):
+            targets = [Tank(Position(4, y), f"X{y}") for y in (3, 4)]
+            for target in targets:
+                self.board.AddEntity(target)
+            for target in [self.t2] + targets:
+                self.board.DoesLineOfSightExist(self.t1, target)
+                self.assertLessEqual(self.board._losCacheCells, 40)
+            self.assertEqual(len(self.board._losCache), 1)
+            self.assertEqual(self.board._losCacheCells, 25)
+
+            self.board.DoesLineOfSightExist(self.t1, targets[1])
+            self.assertEqual(self.board.losCacheHits, 1)
+            self.board.AddEntity(Wall(Position(1, 1), 5))
+            self.assertEqual((self.board._losCache, self.board._losKeysByCell, self.board._losCacheCells), ({}, {}, 0))
+
+
+class TestVisibleCells(unittest.TestCase):
+    def _expected(self, board, origin, visionRange, ignoredEntities):
+        expected = set()
+        for x in range(board.width):
+            for y in range(board.height):
+                target = Position(x, y)
+                if target == origin or max(abs(x - origin.x), abs(y - origin.y)) > visionRange:
+                    continue
+                if board._ComputeLineOfSight(origin, target, ignoredEntities):
+                    expected.add(target)
+        return expected
+
+    def test_matches_line_of_sight_on_random_boards(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            board = Board(rng.randint(1, 16), rng.randint(1, 16))
+            density = rng.random() * 0.5
+            for x in range(board.width):
+                for y in range(board.height):
+                    if rng.random() < density:
+                        entity_type = rng.choice([Tank, Wall])
+                        board.AddEntity(Tank(Position(x, y), "TT") if entity_type is Tank else Wall(Position(x, y), 1))
+
+            origin = Position(rng.randrange(board.width), rng.randrange(board.height))
+            visionRange = rng.randint(0, 16)
+            ignoredEntities = rng.choice([[], [Wall], [Tank]])
+
+            self.assertEqual(board.VisibleCells(origin, visionRange, ignoredEntities),
+                             self._expected(board, origin, visionRange, ignoredEntities))
+
+    def test_matches_line_of_sight_on_a_large_sparse_board(self):
+        rng = random.Random(99)
+        board = Board(1000, 1000)
+        origin = Position(3, 500)
+        for _ in range(3000):
+            position = Position(rng.randrange(1000), rng.randrange(1000))
+            if position != origin and not board.IsSpaceOccupied(position): board.AddEntity(Wall(position, 1))
+        # A crowd of walls just in front of the origin casts long thin shadows right across the board
+        near = []
+        for x in range(origin.x + 1, origin.x + 100):
+            for y in range(origin.y - 12, origin.y + 1):
+                if rng.random() < 0.05 and not board.IsSpaceOccupied(Position(x, y)):
+                    board.AddEntity(Wall(Position(x, y), 1))
+                    near.append(Position(x, y))
+
+        # The reference walks the bounding box, keep the targets to ones it can check quickly
+        def Area(target):
+            return (abs(target.x - origin.x) + 1) * (abs(target.y - origin.y) + 1)
+
+        edges = set()
+        for wall in near:
+            dx, dy = wall.x - origin.x, wall.y - origin.y
+            for k in range(2, 999 // dx + 1):
+                for offset in (-1, 0, 1):
+                    target = Position(origin.x + k * dx, origin.y + k * dy + offset)
+                    if Area(target) <= 8000: edges.add(target)
+        targets = set(rng.sample(sorted(edges), 300))
+        while len(targets) < 600:
+            x = rng.randrange(origin.x + 1, 1000)
+            reach = 8000 // (x - origin.x + 1) - 1
+            targets.add(Position(x, origin.y + rng.randint(-reach, reach)))
+
+        visible = board.VisibleCells(origin, 999)
+        for target in targets:
+            self.assertEqual(target in visible, board._ComputeLineOfSight(origin, target, []), target)
+
+    def test_wall_casts_shadow(self):
+        board = Board(WIDTH, HEIGHT)
+        board.AddEntity(Wall(Position(2, 0), 5))
+        visible = board.VisibleCells(Position(0, 0), 4)
+        self.assertIn(Position(2, 0), visible)
+        self.assertNotIn(Position(3, 0), visible)
+        self.assertIn(Position(3, 0), board.VisibleCells(Position(0, 0), 4, ignoredEntities=[Wall]))
+
+
+class TestGoldMines(unittest.TestCase):
+    def _reference_tanks_in_mine(self, mine, tanks):
+        """The original every tank against every space comparison."""
+        tanksInMine = []
+        for tank in tanks:
+            for space in mine.spaces:
+                if tank.position.x == space.x and tank.position.y == space.y: tanksInMine.append(tank)
+        return tanksInMine
+
+    def _reference_award(self, mine, tanks, council):
+        tanksInMine = self._reference_tanks_in_mine(mine, tanks)
+        if not tanksInMine:
+            if type(mine) is ExpandingGoldMine: council.coffer += mine.goldPerDay
+            return
+        for tank in tanksInMine:
+            tank.GainGold(mine.goldPerDay // len(tanksInMine))
+        if type(mine) is ExpandingGoldMine: council.coffer += mine.goldPerDay % len(tanksInMine)
+
+    def test_matches_reference_payouts(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            # Tanks may share a space, destroyed tanks keep their last position
+            positions = [Position(rng.randrange(5), rng.randrange(5)) for _ in range(rng.randint(0, 12))]
+            mines = []
+            for _ in range(rng.randint(1, 4)):
+                mine = rng.choice([GoldMine, ExpandingGoldMine])()
+                for _ in range(rng.randint(1, 6)):
+                    mine.AddSpace(Position(rng.randrange(5), rng.randrange(5)))
+                mines.append(mine)
+
+            expectedTanks = [Tank(position, "T" + str(i)) for i, position in enumerate(positions)]
+            actualTanks = [Tank(position, "T" + str(i)) for i, position in enumerate(positions)]
+            expectedCouncil = Council()
+            actualCouncil = Council()
+            for mine in mines:
+                self._reference_award(mine, expectedTanks, expectedCouncil)
+                mine.AwardGold(actualTanks, actualCouncil)
+
+            self.assertEqual([(t._gold, t._totalGold) for t in actualTanks], [(t._gold, t._totalGold) for t in expectedTanks])
+            self.assertEqual(actualCouncil.coffer, expectedCouncil.coffer)
@@ -0,0 +1,121 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2
+from TankGameController import ApCostMoveRule
+from TankGameChecksums import RecordChecksums, WriteChecksums, ReadChecksums, BisectDesync
+from TankGameInteractor import Interactor, ChecksumMismatch, ListActionSource, TargetToPosition
+
+def ReadActions(path):
+    with CsvActionSource(path) as source:
+        actions = []
+        while source.HasAnotherAction():
+            actions.append(source.NextAction())
+    return actions
+
+class GlitchyMoveRule(ApCostMoveRule):
+    """Pays a gold it shouldn't to any tank that moves to badMove."""
+
+    def __init__(self, ap_cost, badMove):
+        super().__init__(ap_cost)
+        self.badMove = badMove
+
+    def PerformMove(self, board, tank, target):
+        super().PerformMove(board, tank, target)
+        if target == self.badMove:
+            tank.GainGold(1)
+
+def SetupDesyncedSeason2(badMove):
+    controller = SetupSeason2()
+    controller.gameRules.moveRule = GlitchyMoveRule(controller.gameRules.moveRule.cost, badMove)
+    return controller
+
+class TestChecksums(unittest.TestCase):
+    def setUp(self):
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            self.checksums = RecordChecksums(SetupSeason2, source)
+        self.actions = ReadActions("game2.csv")
+
+    def test_one_per_day(self):
+        self.assertEqual(list(self.checksums), list(dict.fromkeys(action.date for action in self.actions)))
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game2.csv.sums")
+            WriteChecksums(path, self.checksums)
+            self.assertEqual(ReadChecksums(path), self.checksums)
+
+    def test_replay_matches(self):
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            Interactor(SetupSeason2()).TakeActions(source, self.checksums)
+
+    def test_mismatch_stops_at_day(self):
+        date = list(self.checksums)[2]
+        self.checksums[date] ^= 1
+        controller = SetupSeason2()
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            with self.assertRaises(ChecksumMismatch) as caught:
+                Interactor(controller).TakeActions(source, self.checksums)
+        self.assertEqual(caught.exception.date, date)
+        self.assertEqual(caught.exception.actual, controller.ComputeStateHash())
+        self.assertIsNone(controller.zobrist)
+
+    def test_hash_left_as_found(self):
+        for hashing in (False, True):
+            controller = SetupSeason2()
+            if hashing: controller.EnableStateHash()
+            with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+                Interactor(controller).TakeActions(source, self.checksums)
+            self.assertEqual(controller.zobrist is not None, hashing)
+
+class TestBisectDesync(unittest.TestCase):
+    def setUp(self):
+        self.actions = ReadActions("game2.csv")
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            self.checksums = RecordChecksums(SetupSeason2, source)
+
+    def _first_desync_by_brute_force(self, suspect_factory):
+        for count in range(len(self.actions) + 1):
+            hashes = []
+            for factory in (SetupSeason2, suspect_factory):
+                controller = factory()
+                controller.EnableStateHash()
+                with redirect_stdout(io.StringIO()):
+                    Interactor(controller).TakeActions(ListActionSource(self.actions[:count]))
+                hashes.append(controller.StateHash())
+            if hashes[0] != hashes[1]: return count
+        return None
+
+    def test_agreeing_replays(self):
+        self.assertIsNone(BisectDesync(self.actions, SetupSeason2, SetupSeason2))
+        self.assertIsNone(BisectDesync(self.actions, SetupSeason2, SetupSeason2, self.checksums))
+
+    def test_finds_offending_action(self):
+        moves = [index for index, action in enumerate(self.actions) if action.action_type == "move"]
+        for index in (moves[0], moves[len(moves) // 3], moves[2 * len(moves) // 3], moves[-1]):
+            badMove = TargetToPosition(self.actions[index].target)
+            suspect = lambda: SetupDesyncedSeason2(badMove)
+            expected = self._first_desync_by_brute_force(suspect)
+            self.assertIsNotNone(expected)
+
+            for checksums in (None, self.checksums):
+                desync = BisectDesync(self.actions, SetupSeason2, suspect, checksums)
+                self.assertEqual(desync.actions, expected)
+                self.assertEqual(desync.action, self.actions[expected - 1])
+                self.assertNotEqual(desync.referenceHash, desync.suspectHash)
+                self.assertLessEqual(desync.probes, len(self.actions).bit_length() + 1)
+
+    def test_setup_differs(self):
+        def suspect():
+            controller = SetupSeason2()
+            controller.council.coffer = 1
+            return controller
+        desync = BisectDesync(self.actions, SetupSeason2, suspect)
+        self.assertEqual(desync.actions, 0)
+        self.assertIsNone(desync.action)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,345 @@
+import io
+import random
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from Entities import Position
+from TankGame import GetSeason2GameRules, SetupSeason2, SetupSeason3
+from TankGameController import GameController, LegalAction, MOVE_ACTION, FIRE_ACTION, UPGRADE_ACTION, TRADE_ACTION, \
+    SHARE_AP_ACTION, SHARE_LIFE_ACTION, TRANSFER_GOLD_ACTION, START_OF_TURN_FIELDS
+from TankGameInteractor import Interactor
+from TankGameTimeline import CaptureSnapshot
+
+WIDTH = 9
+HEIGHT = 9
+
+class TestTankLookup(unittest.TestCase):
+    def setUp(self):
+        self.controller = GameController(WIDTH, HEIGHT, GetSeason2GameRules())
+        self.controller.AddTank(Position(0, 0), "Dan")
+        with self.assertLogs("TankGameController", level="DEBUG"):
+            self.controller.AddTank(Position(1, 0), "David")
+        self.controller.AddTank(Position(2, 0), "David K.", tile="DK")
+
+    def test_lookup_by_owner_and_tile(self):
+        self.assertEqual(self.controller._GetTankByOwner("David").owner, "David")
+        self.assertEqual(self.controller._GetTankByOwner("DK").owner, "David K.")
+
+    def test_shared_tile_refers_to_first_tank(self):
+        with self.assertLogs("TankGameController", level="DEBUG"):
+            self.controller.AddTank(Position(3, 0), "Dave")
+        self.assertEqual(self.controller._GetTankByOwner("Da").owner, "Dan")
+
+    def test_duplicate_owner_is_rejected(self):
+        with self.assertRaises(Exception):
+            self.controller.AddTank(Position(3, 0), "Dan")
+        self.assertEqual(len(self.controller.tanks), 3)
+        self.assertFalse(self.controller.board.IsSpaceOccupied(Position(3, 0)))
+
+    def test_owner_matching_a_tile_refers_to_first_tank(self):
+        with self.assertLogs("TankGameController", level="DEBUG"):
+            self.controller.AddTank(Position(3, 0), "DK", tile="XX")
+        self.assertEqual(len(self.controller.tanks), 4)
+        self.assertEqual(self.controller._GetTankByOwner("DK").owner, "David K.")
+        self.assertEqual(self.controller._GetTankByOwner("XX").owner, "DK")
+
+    def test_unknown_owner(self):
+        with self.assertRaises(Exception):
+            self.controller._GetTankByOwner("Nobody")
+
+
+class TestClone(unittest.TestCase):
+    def _replayed_season_2(self, numActions):
+        controller = SetupSeason2()
+        interactor = Interactor(controller)
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            for _ in range(numActions):
+                interactor.TakeAction(source.NextAction())
+        return controller
+
+    def _assert_consistent(self, controller):
+        """Every entity on the board is one of the controller's own and sits at its position."""
+        entities = controller.tanks + controller.walls
+        for x, column in enumerate(controller.board.grid):
+            for y, entity in enumerate(column):
+                if entity is not None:
+                    self.assertTrue(any(entity is other for other in entities))
+                    self.assertEqual(entity.position, Position(x, y))
+
+    def _continue_replay(self, controller, skip):
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            for _ in range(skip):
+                date = source.NextAction().date
+            Interactor(controller, date).TakeActions(source)
+
+    def test_clone_matches_and_is_independent(self):
+        original = self._replayed_season_2(40)
+        clone = original.Clone()
+        self.assertEqual(CaptureSnapshot(clone), CaptureSnapshot(original))
+        self._assert_consistent(clone)
+
+        before = CaptureSnapshot(original)
+        self._continue_replay(clone, 40)
+        self.assertEqual(CaptureSnapshot(original), before)
+        self._assert_consistent(original)
+        self._assert_consistent(clone)
+        self.assertFalse(any(tank is other for tank in original.tanks for other in clone.tanks))
+
+    def test_clone_continues_like_original(self):
+        original = self._replayed_season_2(30)
+        clone = original.Clone()
+        self._continue_replay(original, 30)
+        self._continue_replay(clone, 30)
+        self.assertEqual(CaptureSnapshot(clone), CaptureSnapshot(original))
+
+    def test_rule_references_point_at_clone(self):
+        season2 = self._replayed_season_2(70)
+        clone = season2.Clone()
+        for actor in clone.gameRules.giveApRule.actorList:
+            self.assertTrue(any(actor is tank for tank in clone.tanks))
+
+        season3 = SetupSeason3()
+        clone = season3.Clone()
+        self.assertIs(clone.gameRules.goldTransferRule.council_ref, clone.council)
+        self.assertIs(clone._GetTankByOwner("Ryan"), clone.board.grid[0][10])
+
+
+class TestUndo(unittest.TestCase):
+    def _snapshot(self, controller):
+        rules = controller.gameRules
+        return CaptureSnapshot(controller), id(rules.giveApRule.actorList), id(rules.giveLifeRule.actorList)
+
+    def test_undo_and_redo_whole_season(self):
+        controller = SetupSeason2()
+        controller.EnableUndo()
+        interactor = Interactor(controller)
+        snapshots = [self._snapshot(controller)]
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            while source.HasAnotherAction():
+                interactor.TakeAction(source.NextAction())
+                # An action that starts a new day records StartOfTurn as its own step
+                while len(snapshots) < len(controller._undoStack) + 1:
+                    snapshots.append(None)
+                snapshots[-1] = self._snapshot(controller)
+
+        steps = len(controller._undoStack)
+        for index in range(steps, 0, -1):
+            if snapshots[index] is not None:
+                self.assertEqual(self._snapshot(controller), snapshots[index])
+            self.assertTrue(controller.Undo())
+        self.assertFalse(controller.Undo())
+        self.assertEqual(self._snapshot(controller), snapshots[0])
+
+        for index in range(1, steps + 1):
+            self.assertTrue(controller.Redo())
+            if snapshots[index] is not None:
+                self.assertEqual(self._snapshot(controller), snapshots[index])
+        self.assertFalse(controller.Redo())
+
+    def test_new_step_clears_redo(self):
+        controller = SetupSeason2()
+        controller.EnableUndo()
+        controller.StartOfTurn()
+        controller.PerformMove("Ryan", Position(2, 2))
+        controller.Undo()
+        self.assertTrue(controller.CanRedo())
+        controller.PerformMove("Ryan", Position(1, 2))
+        self.assertFalse(controller.CanRedo())
+        self.assertIs(controller.board.grid[1][2], controller._GetTankByOwner("Ryan"))
+
+    def test_limit(self):
+        controller = SetupSeason2()
+        controller.EnableUndo(limit=2)
+        for _ in range(5):
+            controller.StartOfTurn()
+        self.assertEqual(len(controller._undoStack), 2)
+        self.assertEqual([step.dayAfter for step in controller._undoStack], [4, 5])
+
+    def test_rejected_actions_are_not_steps(self):
+        controller = SetupSeason2()
+        controller.EnableUndo()
+        controller.StartOfTurn()
+        controller.PerformMove("Ryan", Position(2, 2))
+        controller.Undo()
+
+        with self.assertRaises(Exception):
+            controller.PerformUpgrade("Ryan")
+        with redirect_stdout(io.StringIO()):
+            controller.PerformMove("Ryan", Position(5, 5))
+        self.assertEqual(len(controller._undoStack), 1)
+        self.assertTrue(controller.Redo())
+        self.assertIs(controller.board.grid[2][2], controller._GetTankByOwner("Ryan"))
+
+    def test_start_of_turn_records_only_paid_fields(self):
+        controller = SetupSeason2()
+        dead = controller.tanks[0]
+        dead.lives = 0
+        controller.EnableUndo()
+        controller.StartOfTurn()
+        step = controller._undoStack[-1]
+        self.assertEqual(step.fields, START_OF_TURN_FIELDS)
+        self.assertNotIn(dead, step.entities)
+        self.assertEqual(len(step.entities), sum(tank.lives > 0 for tank in controller.tanks))
+        controller.Undo()
+        self.assertTrue(all(tank.AP == 0 for tank in controller.tanks))
+
+    def test_disabled_by_default(self):
+        controller = SetupSeason2()
+        controller.StartOfTurn()
+        self.assertFalse(controller.Undo())
+
+
+class TestLegalActions(unittest.TestCase):
+    def _candidates(self, controller, actor):
+        board = controller.board
+        for x in range(board.width):
+            for y in range(board.height):
+                yield LegalAction(MOVE_ACTION, Position(x, y), None)
+                if Position(x, y) != actor.position:
+                    yield LegalAction(FIRE_ACTION, Position(x, y), None)
+        yield LegalAction(UPGRADE_ACTION, None, None)
+        for amount in range(1, actor._gold + 3):
+            yield LegalAction(TRADE_ACTION, None, amount)
+        for target in controller.tanks:
+            if target is actor: continue
+            yield LegalAction(SHARE_AP_ACTION, target.owner, 1)
+            yield LegalAction(SHARE_LIFE_ACTION, target.owner, 1)
+            for amount in range(1, actor._gold + 3):
+                yield LegalAction(TRANSFER_GOLD_ACTION, target.owner, amount)
+
+    def _changes_state(self, controller, owner, action):
+        """Try an action on a clone, it's legal if it runs without an error and changes something."""
+        clone = controller.Clone()
+        before = CaptureSnapshot(clone)
+        perform = {
+            MOVE_ACTION: lambda: clone.PerformMove(owner, action.target),
+            FIRE_ACTION: lambda: clone.PerformFire(owner, action.target),
+            UPGRADE_ACTION: lambda: clone.PerformUpgrade(owner),
+            TRADE_ACTION: lambda: clone.PerformTradeGold(owner, action.amount),
+            SHARE_AP_ACTION: lambda: clone.PerformShareActions(owner, action.target, action.amount),
+            SHARE_LIFE_ACTION: lambda: clone.PerformShareLife(owner, action.target, action.amount),
+            TRANSFER_GOLD_ACTION: lambda: clone.PerformTransferGold(owner, action.target, action.amount),
+        }[action.action_type]
+        try:
+            with redirect_stdout(io.StringIO()):
+                perform()
+        except Exception:
+            return False
+        return CaptureSnapshot(clone) != before
+
+    def _assert_matches_brute_force(self, controller):
+        for tank in controller.tanks:
+            if controller.board.grid[tank.position.x][tank.position.y] is not tank: continue
+            candidates = list(self._candidates(controller, tank))
+            expected = {action for action in candidates if self._changes_state(controller, tank.owner, action)}
+            self.assertEqual(set(controller.LegalActions(tank.owner)), expected, tank.owner)
+            for action in candidates:
+                self.assertEqual(controller.IsLegalAction(tank.owner, action), action in expected, (tank.owner, action))
+
+    def test_season_2_mid_game(self):
+        controller = SetupSeason2()
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            interactor = Interactor(controller)
+            for _ in range(45):
+                interactor.TakeAction(source.NextAction())
+        controller._GetTankByOwner("Stomp")._gold = 7
+        self._assert_matches_brute_force(controller)
+
+    def test_season_3_with_gold(self):
+        controller = SetupSeason3()
+        for _ in range(3):
+            controller.StartOfTurn()
+        for gold, tank in enumerate(controller.tanks):
+            tank._gold = gold
+        self._assert_matches_brute_force(controller)
+
+    def test_destroyed_tank_has_no_actions(self):
+        controller = SetupSeason2()
+        ryan = controller._GetTankByOwner("Ryan")
+        controller.board.RemoveEntity(ryan)
+        ryan.lives = 0
+        self.assertEqual(controller.LegalActions("Ryan"), [])
+
+
+class TestStateHash(unittest.TestCase):
+    def _assert_hash_current(self, controller):
+        self.assertEqual(controller.StateHash(), controller.ComputeStateHash())
+
+    def test_replay_season_2(self):
+        controller = SetupSeason2()
+        controller.EnableStateHash()
+        interactor = Interactor(controller)
+        hashes = set()
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            while source.HasAnotherAction():
+                interactor.TakeAction(source.NextAction())
+                self._assert_hash_current(controller)
+                hashes.add(controller.StateHash())
+        self.assertGreater(len(hashes), 50)
+
+    def test_random_season_3(self):
+        controller = SetupSeason3()
+        controller.EnableStateHash()
+        rng = random.Random(7)
+        for _ in range(15):
+            controller.StartOfTurn()
+            self._assert_hash_current(controller)
+            for _ in range(10):
+                owner = rng.choice(controller.tanks).owner
+                actions = controller.LegalActions(owner)
+                if not actions: continue
+                with redirect_stdout(io.StringIO()):
+                    controller.PerformLegalAction(owner, rng.choice(actions))
+                self._assert_hash_current(controller)
+
+    def test_equal_states_have_equal_hashes(self):
+        first = SetupSeason2()
+        second = SetupSeason2()
+        first.EnableStateHash()
+        self.assertEqual(first.StateHash(), second.ComputeStateHash())
+
+        first.StartOfTurn()
+        first.PerformMove("Ryan", Position(2, 2))
+        self.assertNotEqual(first.StateHash(), second.ComputeStateHash())
+
+        # Same state reached in a different order
+        second.EnableStateHash()
+        second.StartOfTurn()
+        second.PerformMove("Ryan", Position(2, 2))
+        self.assertEqual(first.StateHash(), second.StateHash())
+
+    def test_undo_redo_and_clone(self):
+        controller = SetupSeason2()
+        controller.EnableStateHash()
+        controller.EnableUndo()
+        start = controller.StateHash()
+        interactor = Interactor(controller)
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            for _ in range(30):
+                interactor.TakeAction(source.NextAction())
+        end = controller.StateHash()
+
+        clone = controller.Clone()
+        self.assertEqual(clone.StateHash(), end)
+
+        while controller.Undo():
+            self._assert_hash_current(controller)
+        self.assertEqual(controller.StateHash(), start)
+        while controller.Redo():
+            self._assert_hash_current(controller)
+        self.assertEqual(controller.StateHash(), end)
+
+        # The clone's hash follows the clone only
+        clone.StartOfTurn()
+        self._assert_hash_current(clone)
+        self.assertEqual(controller.StateHash(), end)
+
+    def test_disabled_by_default(self):
+        controller = SetupSeason2()
+        with self.assertRaises(Exception):
+            controller.StateHash()
+        controller.EnableStateHash()
+        controller.DisableStateHash()
+        controller.StartOfTurn()
+        self.assertIsNone(controller.zobrist)
+        self.assertIsNone(controller.board.zobrist)
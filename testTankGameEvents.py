@@ -0,0 +1,86 @@
+import io
+import unittest
+from collections import Counter
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from Entities import Position
+from TankGame import SetupSeason2, SetupSeason3
+from TankGameEvents import *
+from TankGameController import LegalAction, FIRE_ACTION
+from TankGameInteractor import Interactor
+
+def Replay(controller, log):
+    with CsvActionSource(log) as source, redirect_stdout(io.StringIO()):
+        Interactor(controller).TakeActions(source)
+
+class TestEvents(unittest.TestCase):
+    def _record(self, controller, *eventTypes):
+        events = []
+        controller.EnableEvents().Subscribe(events.append, *eventTypes)
+        return events
+
+    def test_disabled_by_default(self):
+        controller = SetupSeason2()
+        self.assertIsNone(controller.events)
+        Replay(controller, "game2.csv")
+        self.assertIsNone(controller.events)
+        self.assertIsNone(controller.Clone().events)
+
+    def test_season_2_totals(self):
+        controller = SetupSeason2()
+        start = {tank.owner: tank.position for tank in controller.tanks}
+        events = self._record(controller)
+        Replay(controller, "game2.csv")
+
+        self.assertEqual([event.day for event in events if type(event) is DayStarted], list(range(1, controller.day + 1)))
+
+        kills = Counter(event.owner for event in events if type(event) is Destroyed and event.target_owner is not None)
+        gold = Counter()
+        for event in events:
+            if type(event) is GoldAwarded: gold[event.owner] += event.amount
+            if type(event) is GoldTransferred: gold[event.target_owner] += event.amount
+        taxed = sum(event.amount for event in events if type(event) is TaxedToCouncil)
+        for tank in controller.tanks:
+            self.assertEqual(kills[tank.owner], tank.kills)
+            self.assertEqual(gold[tank.owner], tank._totalGold)
+        self.assertEqual(taxed, controller.council.coffer)
+
+        # Following the moves from the start ends where the tanks are
+        position = dict(start)
+        for event in events:
+            if type(event) is Moved:
+                self.assertEqual(position[event.owner], event.start)
+                position[event.owner] = event.end
+        self.assertEqual(position, {tank.owner: tank.position for tank in controller.tanks})
+
+    def test_fire(self):
+        controller = SetupSeason3()
+        events = self._record(controller, Fired, Hit, Destroyed)
+        controller.StartOfTurn()
+        controller.StartOfTurn()
+        tank, wall = next((tank, wall) for tank in controller.tanks for wall in controller.walls
+                          if controller.IsLegalAction(tank.owner, LegalAction(FIRE_ACTION, wall.position, None)))
+        controller.PerformFire(tank.owner, wall.position, doesHit=False)
+        self.assertEqual(events, [Fired(tank.owner, wall.position, False)])
+
+        del events[:]
+        wall.durability = 1
+        controller.PerformFire(tank.tile, wall.position)
+        self.assertEqual(events, [Fired(tank.owner, wall.position, True), Hit(tank.owner, wall.position, None, 1),
+                                  Destroyed(tank.owner, wall.position, None)])
+
+    def test_unsubscribe_and_failed_actions(self):
+        controller = SetupSeason2()
+        events = self._record(controller)
+        with redirect_stdout(io.StringIO()):
+            controller.PerformMove("Ryan", Position(5, 5))
+        with self.assertRaises(Exception):
+            controller.PerformUpgrade("Ryan")
+        self.assertEqual(events, [])
+
+        controller.events.Unsubscribe(events.append)
+        controller.StartOfTurn()
+        self.assertEqual(events, [])
+
+if __name__ == '__main__':
+    unittest.main()
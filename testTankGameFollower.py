@@ -0,0 +1,95 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2
+from TankGameFollower import LogFollower
+from TankGameInteractor import Interactor
+from testTankGameTimeline import Describe
+
+class TestLogFollower(unittest.TestCase):
+    def setUp(self):
+        with open("game2.csv", "rb") as log:
+            self.lines = log.read().splitlines(keepends=True)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.logPath = os.path.join(directory.name, "live.csv")
+        self.checkpointPath = os.path.join(directory.name, "live.checkpoint")
+        open(self.logPath, "wb").close()
+
+    def _append(self, data):
+        with open(self.logPath, "ab") as log:
+            log.write(data)
+
+    def _expected(self):
+        controller = SetupSeason2()
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            Interactor(controller).TakeActions(source)
+        return Describe(controller)
+
+    def test_incremental_polls_match_full_replay(self):
+        follower = LogFollower(SetupSeason2, self.logPath)
+        with redirect_stdout(io.StringIO()):
+            for start in range(0, len(self.lines), 7):
+                self._append(b"".join(self.lines[start:start + 7]))
+                follower.Poll()
+            follower.Poll(final=True)
+
+        self.assertEqual(Describe(follower.controller), self._expected())
+
+    def test_partial_row_waits_for_newline(self):
+        follower = LogFollower(SetupSeason2, self.logPath)
+        self._append(self.lines[0] + self.lines[1][:10])
+        self.assertEqual(follower.Poll(), 0)
+        self._append(self.lines[1][10:])
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(follower.Poll(), 1)
+
+    def test_bad_rows_are_skipped_once(self):
+        # An upgrade nobody can afford yet and a row missing its columns, in the middle of one batch
+        bad = [b"10/18/23,Ryan,upgrade,,\n", b"10/18/23,Ryan\n"]
+        self._append(b"".join(self.lines[:4] + bad + self.lines[4:]))
+        follower = LogFollower(SetupSeason2, self.logPath, self.checkpointPath)
+        with redirect_stdout(io.StringIO()), self.assertLogs("TankGameFollower", level="WARNING"):
+            applied = follower.Poll(final=True)
+            self.assertEqual(follower.Poll(final=True), 0)
+
+        self.assertEqual(applied, len(self.lines) - 1)
+        self.assertEqual([row for offset, row, error in follower.skipped], [["10/18/23", "Ryan", "upgrade", "", ""], ["10/18/23", "Ryan"]])
+        self.assertEqual(follower.skipped[0][0], len(b"".join(self.lines[:4])))
+        self.assertEqual(follower.offset, os.path.getsize(self.logPath))
+        self.assertEqual(Describe(follower.controller), self._expected())
+
+        with redirect_stdout(io.StringIO()):
+            resumed = LogFollower(SetupSeason2, self.logPath, self.checkpointPath)
+            self.assertEqual(resumed.Poll(final=True), 0)
+        self.assertEqual(Describe(resumed.controller), self._expected())
+
+    def test_quoted_newline_stays_in_its_row(self):
+        header, first = self.lines[0], self.lines[1].rstrip(b"\r\n")
+        follower = LogFollower(SetupSeason2, self.logPath)
+        # The row already ends with the metadata separator, quote a two line note into metadata
+        self._append(header + first + b'"a note\nthat')
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(follower.Poll(), 0)
+            self._append(b' goes on"\n')
+            self.assertEqual(follower.Poll(), 1)
+        self.assertEqual(follower.skipped, [])
+        self.assertEqual(follower.offset, os.path.getsize(self.logPath))
+
+    def test_restart_resumes_from_checkpoint(self):
+        half = len(self.lines) // 2
+        self._append(b"".join(self.lines[:half]))
+        with redirect_stdout(io.StringIO()):
+            LogFollower(SetupSeason2, self.logPath, self.checkpointPath).Poll()
+
+        self._append(b"".join(self.lines[half:]))
+        with redirect_stdout(io.StringIO()):
+            resumed = LogFollower(SetupSeason2, self.logPath, self.checkpointPath)
+            applied = resumed.Poll(final=True)
+
+        self.assertEqual(applied, len(self.lines) - half)
+        self.assertEqual(Describe(resumed.controller), self._expected())
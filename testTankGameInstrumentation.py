@@ -0,0 +1,101 @@
+import io
+import json
+import random
+import re
+import unittest
+from collections import Counter
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2
+from TankGameInteractor import Interactor
+from TankGameInstrumentation import LatencyStats, RESERVOIR_SIZE
+
+class TestInstrumentation(unittest.TestCase):
+    def _replay_season_2(self, controller):
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            actions = []
+            while source.HasAnotherAction():
+                actions.append(source.NextAction())
+            interactor = Interactor(controller)
+            for action in actions:
+                interactor.TakeAction(action)
+        return actions
+
+    def test_disabled_by_default(self):
+        controller = SetupSeason2()
+        self.assertIsNone(controller.instrumentation)
+        self._replay_season_2(controller)
+        self.assertIsNone(controller.instrumentation)
+
+    def test_counts_replay(self):
+        controller = SetupSeason2()
+        instrumentation = controller.EnableInstrumentation()
+        actions = self._replay_season_2(controller)
+        stats = instrumentation.ToDict()
+
+        expected = Counter(action.action_type for action in actions)
+        self.assertEqual({name: result["count"] for name, result in stats["action"].items()}, expected)
+        self.assertEqual(stats["method"]["StartOfTurn"]["count"], len({action.date for action in actions}))
+        self.assertEqual(stats["method"]["PerformMove"]["count"], expected["move"])
+        self.assertEqual(stats["rule"]["ApCostMoveRule"]["count"], expected["move"])
+
+        fire = stats["action"]["fire"]
+        self.assertGreaterEqual(fire["los_calls"], fire["count"])
+        self.assertEqual(fire["los_calls"], stats["method"]["PerformFire"]["los_calls"])
+        self.assertEqual(stats["action"]["move"]["los_calls"], 0)
+        for result in stats["action"].values():
+            self.assertLessEqual(result["p50_seconds"], result["p99_seconds"])
+            self.assertLessEqual(result["p99_seconds"], result["seconds"])
+
+    def test_failed_calls_are_recorded(self):
+        controller = SetupSeason2()
+        instrumentation = controller.EnableInstrumentation()
+        with self.assertRaises(Exception):
+            controller.PerformUpgrade("Ryan")
+        self.assertEqual(instrumentation.stats["method"]["PerformUpgrade"].count, 1)
+
+    def test_clone_is_not_instrumented(self):
+        controller = SetupSeason2()
+        instrumentation = controller.EnableInstrumentation()
+        clone = controller.Clone()
+        clone.StartOfTurn()
+        self.assertIsNone(clone.instrumentation)
+        self.assertEqual(instrumentation.stats["method"], {})
+
+    def test_exports(self):
+        controller = SetupSeason2()
+        instrumentation = controller.EnableInstrumentation()
+        self._replay_season_2(controller)
+
+        self.assertEqual(json.loads(instrumentation.ToJson()), json.loads(json.dumps(instrumentation.ToDict())))
+
+        text = instrumentation.ToPrometheus()
+        sample = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,quantile="[0-9.]+")?\})? [0-9.e+-]+$')
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                self.assertRegex(line, sample)
+        self.assertIn('tankgame_action_seconds_count{action_type="move"} ', text)
+        self.assertIn('tankgame_rule_seconds{rule="ApCostMoveRule",quantile="0.99"} ', text)
+        self.assertIn('tankgame_method_los_calls_total{method="PerformFire"} ', text)
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_percentiles(self):
+        stats = LatencyStats(random.Random(0))
+        for seconds in range(100, 0, -1):
+            stats.Add(seconds, 0, 0)
+        self.assertEqual(stats.count, 100)
+        self.assertEqual(stats.seconds, 5050)
+        self.assertEqual(stats.Percentile(0.5), 51)
+        self.assertEqual(stats.Percentile(0.99), 100)
+
+    def test_reservoir_is_bounded(self):
+        stats = LatencyStats(random.Random(0))
+        for index in range(RESERVOIR_SIZE * 10):
+            stats.Add(index % 1000, 1, 0)
+        self.assertEqual(len(stats._samples), RESERVOIR_SIZE)
+        self.assertEqual(stats.losCalls, RESERVOIR_SIZE * 10)
+        self.assertAlmostEqual(stats.Percentile(0.5), 500, delta=100)
+
+if __name__ == '__main__':
+    unittest.main()
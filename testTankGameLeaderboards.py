@@ -0,0 +1,90 @@
+import io
+import random
+import unittest
+from collections import Counter
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2
+from TankGameEvents import Moved
+from TankGameInteractor import Interactor
+from TankGameLeaderboards import IndexedHeap, Leaderboards
+
+class TestIndexedHeap(unittest.TestCase):
+    def test_matches_sorting(self):
+        rng = random.Random(0)
+        heap = IndexedHeap()
+        scores = {}
+        for step in range(2000):
+            key = rng.randrange(50)
+            score = rng.randrange(-20, 100)
+            if step % 3 == 0:
+                heap.Add(key, score)
+                scores[key] = scores.get(key, 0) + score
+            else:
+                heap.Set(key, score)
+                scores[key] = score
+
+            order = heap._order
+            expected = sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+            k = rng.randrange(1, 12)
+            self.assertEqual(heap.Top(k), expected[:k])
+        self.assertEqual(len(heap), len(scores))
+
+    def test_empty(self):
+        self.assertEqual(IndexedHeap().Top(3), [])
+
+
+class TestLeaderboards(unittest.TestCase):
+    def test_season_2_mid_replay(self):
+        controller = SetupSeason2()
+        leaderboards = Leaderboards(controller)
+        moves = Counter()
+        controller.events.Subscribe(lambda event: moves.update([event.owner]), Moved)
+        order = {tank.owner: index for index, tank in enumerate(controller.tanks)}
+
+        def Expected(score):
+            return sorted(((tank.owner, score(tank)) for tank in controller.tanks), key=lambda item: (-item[1], order[item[0]]))
+
+        def OnBoard(tank):
+            return controller.board.grid[tank.position.x][tank.position.y] is tank
+
+        deathDays = {}
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            interactor = Interactor(controller)
+            while source.HasAnotherAction():
+                interactor.TakeAction(source.NextAction())
+                for tank in controller.tanks:
+                    if not OnBoard(tank): deathDays.setdefault(tank.owner, controller.day)
+                self.assertEqual(leaderboards.Top("gold", 5), Expected(lambda tank: tank._totalGold)[:5])
+                self.assertEqual(leaderboards.Top("kills", 5), Expected(lambda tank: tank.kills)[:5])
+                self.assertEqual(leaderboards.Top("moves", 5), Expected(lambda tank: moves[tank.owner])[:5])
+
+        survival = dict(leaderboards.Top("survival", len(controller.tanks)))
+        self.assertTrue(deathDays)
+        for tank in controller.tanks:
+            self.assertEqual(survival[tank.owner], deathDays.get(tank.owner, controller.day))
+        self.assertEqual(len(leaderboards.Top("survival", 100)), len(controller.tanks))
+
+        accolades = leaderboards.Accolades()
+        self.assertEqual(accolades["gold"], leaderboards.Top("gold", 1)[0])
+        self.assertNotIn("council", accolades)
+
+    def test_refuses_undo(self):
+        controller = SetupSeason2()
+        controller.EnableUndo()
+        with self.assertRaises(Exception):
+            Leaderboards(controller)
+        controller.DisableUndo()
+        leaderboards = Leaderboards(controller)
+
+        # Nor can undo be enabled while they are attached
+        with self.assertRaises(Exception):
+            controller.EnableUndo()
+        self.assertIsNone(controller._undoStack)
+        leaderboards.Detach()
+        controller.EnableUndo()
+        controller.StartOfTurn()
+        self.assertEqual(leaderboards.day, 0)
+
+if __name__ == '__main__':
+    unittest.main()
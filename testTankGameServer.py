@@ -0,0 +1,252 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2
+from TankGameController import LegalAction
+from TankGameInteractor import Interactor
+from TankGameServer import GameServer
+from TankGameSpectator import BoardView
+from TankGameTimeline import CaptureSnapshot
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.nextId = 0
+
+    @classmethod
+    async def Connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def Send(self, **request):
+        self.nextId += 1
+        request["id"] = self.nextId
+        self.writer.write((json.dumps(request) + "\n").encode())
+        await self.writer.drain()
+        return self.nextId
+
+    async def Receive(self):
+        return json.loads(await self.reader.readline())
+
+    async def Request(self, **request):
+        requestId = await self.Send(**request)
+        while True:
+            reply = await self.Receive()
+            if reply.get("id") == requestId: return reply
+
+    async def Close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+class TestGameServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.controller = SetupSeason2()
+        self.directory = tempfile.TemporaryDirectory()
+        self.logPath = os.path.join(self.directory.name, "game.csv")
+        self.server = GameServer(self.controller, log_path=self.logPath)
+        listener = await self.server.Start()
+        self.port = listener.sockets[0].getsockname()[1]
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            await client.Close()
+        await self.server.Close()
+        self.directory.cleanup()
+
+    async def _connect(self):
+        client = await Client.Connect(self.port)
+        self.clients.append(client)
+        return client
+
+    async def _move_everyone(self):
+        owners = [tank.owner for tank in self.controller.tanks]
+        clients = [await self._connect() for owner in owners]
+
+        async def Move(client, owner):
+            self.assertTrue((await client.Request(op="join", owner=owner))["ok"])
+            legal = await client.Request(op="legal_actions", owner=owner)
+            move = next(action for action in legal["actions"] if action["action_type"] == "move")
+            reply = await client.Request(op="action", owner=owner, action_type="move", target=move["target"])
+            return owner, move["target"], reply
+
+        return await asyncio.gather(*[Move(client, owner) for client, owner in zip(clients, owners)])
+
+    async def test_action_needs_a_day(self):
+        client = await self._connect()
+        await client.Request(op="join", owner="Ryan")
+        reply = await client.Request(op="action", owner="Ryan", action_type="upgrade")
+        self.assertFalse(reply["ok"])
+        self.assertIn("day", reply["error"])
+
+    async def test_concurrent_moves(self):
+        self.assertTrue((await (await self._connect()).Request(op="start_day", date="1/1/24"))["ok"])
+        results = await self._move_everyone()
+
+        applied = [(owner, target) for owner, target, reply in results if reply["ok"]]
+        self.assertGreater(len(applied), len(results) // 2)
+        for owner, target, reply in results:
+            if not reply["ok"]: self.assertIn("not a legal action", reply["error"])
+        for owner, target in applied:
+            position = self.controller._GetTankByOwner(owner).position
+            self.assertEqual([position.x, position.y], target)
+
+    async def test_illegal_action_changes_nothing(self):
+        client = await self._connect()
+        await client.Request(op="join", owner="Ryan")
+        await client.Request(op="start_day", date="1/1/24")
+        self.assertTrue((await client.Request(op="action", owner="Ryan", action_type="move", target="B3"))["ok"])
+        before = CaptureSnapshot(self.controller)
+
+        for request in ({"owner": "Ryan", "action_type": "move", "target": "I9"},
+                        {"owner": "Ryan", "action_type": "upgrade"},
+                        {"owner": "Nobody", "action_type": "trade", "amount": 1},
+                        {"owner": "Ryan", "action_type": "dance"}):
+            reply = await client.Request(op="action", **request)
+            self.assertFalse(reply["ok"])
+        self.assertFalse((await client.Request(op="action", owner="Ryan"))["ok"])
+        self.assertEqual(CaptureSnapshot(self.controller), before)
+
+    async def test_amounts_must_be_integers(self):
+        client = await self._connect()
+        await client.Request(op="join", owner="Ryan")
+        await client.Request(op="start_day", date="1/1/24")
+        self.controller._GetTankByOwner("Ryan").GainGold(3)
+        before = CaptureSnapshot(self.controller)
+
+        for request in ({"action_type": "trade", "amount": 3.0},
+                        {"action_type": "trade", "amount": True},
+                        {"action_type": "share_ap", "target": "Beyer", "amount": 1.0},
+                        {"action_type": "share_ap", "target": "Beyer", "amount": True},
+                        {"action_type": "share_life", "target": "Beyer", "amount": 1.0},
+                        {"action_type": "share_life", "target": "Beyer", "amount": True}):
+            reply = await client.Request(op="action", owner="Ryan", **request)
+            self.assertFalse(reply["ok"], request)
+            self.assertIn("not a legal action", reply["error"])
+        self.assertEqual(CaptureSnapshot(self.controller), before)
+        self.assertTrue((await client.Request(op="action", owner="Ryan", action_type="trade", amount=3))["ok"])
+
+    async def test_fire_takes_hit_from_request(self):
+        client = await self._connect()
+        await client.Request(op="join", owner="Ryan")
+        await client.Request(op="start_day", date="1/1/24")
+        wall = self.controller.board.grid[2][3]
+        durability = wall.durability
+
+        for request in ({}, {"hit": "yes"}, {"hit": 1}, {"hit": None}):
+            reply = await client.Request(op="action", action_type="fire", target=[2, 3], **request)
+            self.assertFalse(reply["ok"], request)
+        self.assertFalse((await client.Request(op="action", action_type="move", target="B3", hit=False))["ok"])
+
+        self.assertTrue((await client.Request(op="action", action_type="fire", target=[2, 3], hit=False))["ok"])
+        self.assertEqual(wall.durability, durability)
+        await client.Request(op="start_day", date="1/2/24")
+        self.assertTrue((await client.Request(op="action", action_type="fire", target=[2, 3], hit=True))["ok"])
+        self.assertEqual(wall.durability, durability - 1)
+
+        await self.server.Close()
+        replay = SetupSeason2()
+        with redirect_stdout(io.StringIO()), CsvActionSource(self.logPath) as source:
+            Interactor(replay).TakeActions(source)
+        self.assertEqual(CaptureSnapshot(replay), CaptureSnapshot(self.controller))
+
+    async def test_day_starts_once(self):
+        turns = []
+        startOfTurn = self.controller.StartOfTurn
+        self.controller.StartOfTurn = lambda: turns.append(1) or startOfTurn()
+
+        clients = [await self._connect() for _ in range(20)]
+        replies = await asyncio.gather(*[client.Request(op="start_day", date="1/1/24") for client in clients])
+        self.assertTrue(all(reply["ok"] for reply in replies))
+        await self._move_everyone()
+        await clients[0].Request(op="start_day", date="1/1/24")
+        self.assertEqual(len(turns), 1)
+
+    async def test_admin_token(self):
+        self.server.adminToken = "secret"
+        client = await self._connect()
+        self.assertFalse((await client.Request(op="start_day", date="1/1/24"))["ok"])
+        self.assertTrue((await client.Request(op="start_day", date="1/1/24", token="secret"))["ok"])
+
+    async def test_player_tokens(self):
+        self.server.playerTokens = {"Ryan": "ryan's secret", "Beyer": "beyer's secret"}
+        client = await self._connect()
+        await client.Request(op="start_day", date="1/1/24")
+        self.assertFalse((await client.Request(op="action", owner="Ryan", action_type="move", target="B3"))["ok"])
+        for request in ({"owner": "Ryan"}, {"owner": "Ryan", "token": "beyer's secret"}, {"owner": "Ryan", "token": 1},
+                        {"owner": "Nobody", "token": "ryan's secret"}, {"owner": "Ry", "token": "ryan's secret"}):
+            self.assertFalse((await client.Request(op="join", **request))["ok"], request)
+
+        self.assertTrue((await client.Request(op="join", owner="Ryan", token="ryan's secret"))["ok"])
+        self.assertFalse((await client.Request(op="join", owner="Beyer", token="beyer's secret"))["ok"])
+        before = CaptureSnapshot(self.controller)
+        reply = await client.Request(op="action", owner="Beyer", action_type="upgrade")
+        self.assertFalse(reply["ok"])
+        self.assertIn("can't act for Beyer", reply["error"])
+        self.assertEqual(CaptureSnapshot(self.controller), before)
+        self.assertTrue((await client.Request(op="action", action_type="move", target="B3"))["ok"])
+
+    async def test_full_queue_rejects_requests(self):
+        server = GameServer(SetupSeason2(), max_queue=2)
+        await server.Start()
+        # The writer can't run until this test awaits so the queue fills up
+        first = server.StartDay("1/1/24")
+        server.SubmitAction("Ryan", LegalAction("upgrade", None, None))
+        with self.assertRaises(Exception):
+            server.StartDay("1/2/24")
+        self.assertIsNone(await first)
+        self.assertIsNone(await server.StartDay("1/2/24"))
+        await server.Close()
+
+    async def test_subscribers_get_updates(self):
+        subscriber = await self._connect()
+        self.assertTrue((await subscriber.Request(op="subscribe"))["ok"])
+        first = await subscriber.Receive()
+        self.assertEqual((first["op"], first["version"]), ("update", 0))
+        self.assertEqual(len(first["tanks"]), len(self.controller.tanks))
+
+        client = await self._connect()
+        await client.Request(op="join", owner="Ryan")
+        await client.Request(op="start_day", date="1/1/24")
+        await client.Request(op="action", owner="Ryan", action_type="move", target=[1, 2])
+        update = await subscriber.Receive()
+        while update["version"] < self.server.version:
+            update = await subscriber.Receive()
+        ryan = next(tank for tank in update["tanks"] if tank["owner"] == "Ryan")
+        self.assertEqual((ryan["x"], ryan["y"], ryan["AP"]), (1, 2, self.controller._GetTankByOwner("Ryan").AP))
+
+    async def test_board_subscribers_get_frames(self):
+        spectator = await self._connect()
+        self.assertTrue((await spectator.Request(op="subscribe", stream="board"))["ok"])
+        view = BoardView()
+        keyFrame = await spectator.Receive()
+        self.assertTrue(keyFrame["key"])
+        view.Apply(keyFrame)
+
+        client = await self._connect()
+        await client.Request(op="start_day", date="1/1/24")
+        await self._move_everyone()
+        while view.RenderFrame() != self.controller.board.RenderFrame():
+            view.Apply(await asyncio.wait_for(spectator.Receive(), 5))
+
+    async def test_log_replays(self):
+        client = await self._connect()
+        await client.Request(op="join", owner="Ryan")
+        for date in ("1/1/24", "1/2/24"):
+            await client.Request(op="start_day", date=date)
+            await self._move_everyone()
+        await client.Request(op="action", owner="Ryan", action_type="trade", amount=0)
+        await self.server.Close()
+
+        replay = SetupSeason2()
+        with redirect_stdout(io.StringIO()), CsvActionSource(self.logPath) as source:
+            Interactor(replay).TakeActions(source)
+        self.assertEqual(CaptureSnapshot(replay), CaptureSnapshot(self.controller))
+
+if __name__ == '__main__':
+    unittest.main()
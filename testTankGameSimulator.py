@@ -0,0 +1,23 @@
+import unittest
+from TankGame import SetupSeason2, SetupSeason3
+from TankGameSimulator import RunSimulation, RandomPolicy, AggressivePolicy
+
+class TestSimulator(unittest.TestCase):
+    def test_same_seed_same_results(self):
+        inProcess = RunSimulation(SetupSeason2, RandomPolicy(), 4, seed=7, max_days=15, max_workers=1)
+        pooled = RunSimulation(SetupSeason2, RandomPolicy(), 4, seed=7, max_days=15, max_workers=2)
+        self.assertEqual(inProcess.results, pooled.results)
+        self.assertEqual(inProcess.gold_per_tank, pooled.gold_per_tank)
+
+    def test_different_seeds_differ(self):
+        first = RunSimulation(SetupSeason2, RandomPolicy(), 3, seed=1, max_days=15, max_workers=1)
+        second = RunSimulation(SetupSeason2, RandomPolicy(), 3, seed=2, max_days=15, max_workers=1)
+        self.assertNotEqual(first.results, second.results)
+
+    def test_results_are_consistent(self):
+        report = RunSimulation(SetupSeason3, AggressivePolicy(), 2, max_days=40, max_workers=1)
+        for result in report.results:
+            # Every destroyed tank was killed by someone
+            self.assertEqual(sum(result.kills), 16 - result.survivors)
+            self.assertEqual(sum(days == result.days for days in result.survival_days), result.survivors)
+        self.assertEqual(report.days.max, max(result.days for result in report.results))
@@ -0,0 +1,127 @@
+import io
+import json
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from Entities import Board, Position, Wall
+from TankGame import SetupSeason2, SetupSeason3
+from TankGameInteractor import Interactor
+import TankGameSpectator
+from TankGameSpectator import BoardStream, BoardView
+
+def ReplayByDay(controller, log):
+    """Yield after every day of log has been applied to controller."""
+    with CsvActionSource(log) as source, redirect_stdout(io.StringIO()):
+        interactor = Interactor(controller)
+        date = None
+        while source.HasAnotherAction():
+            action = source.NextAction()
+            if date is not None and action.date != date:
+                yield
+            date = action.date
+            interactor.TakeAction(action)
+    yield
+
+class TestRenderFrame(unittest.TestCase):
+    def test_render_frame(self):
+        board = Board(3, 2)
+        board.AddEntity(Wall(Position(1, 0), 4))
+        board.AddEntity(Wall(Position(2, 1), 1))
+        expected = "  |W4|  \n--+--+--\n  |  |W1\n\n"
+        self.assertEqual(board.RenderFrame(), expected)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            board.Render()
+        self.assertEqual(output.getvalue(), expected)
+
+
+class TestBoardStream(unittest.TestCase):
+    def _check_view(self, view, controller):
+        self.assertEqual(view.RenderFrame(), controller.board.RenderFrame())
+        for index, tank in enumerate(controller.tanks):
+            stats = view.entities[f"t{index}"].stats
+            self.assertEqual((stats["lives"], stats["AP"], stats["gold"], stats["range"], stats["kills"]),
+                             (tank.lives, tank.AP, tank._gold, tank.range, tank.kills))
+
+    def _stream_replay(self, controller, log):
+        stream = BoardStream(controller)
+        view = BoardView()
+        keyFrame = stream.KeyFrame()
+        view.Apply(json.loads(json.dumps(keyFrame)))
+        self._check_view(view, controller)
+
+        deltaSize = 0
+        for _ in ReplayByDay(controller, log):
+            frame = stream.Frame()
+            if frame is None: continue
+            deltaSize = max(deltaSize, len(json.dumps(frame)))
+            view.Apply(json.loads(json.dumps(frame)))
+            self._check_view(view, controller)
+        self.assertLess(deltaSize, len(json.dumps(stream.KeyFrame())))
+        return stream, view
+
+    def test_season_2(self):
+        self._stream_replay(SetupSeason2(), "game2.csv")
+
+    def test_season_3(self):
+        self._stream_replay(SetupSeason3(), "game3.csv")
+
+    def test_unchanged_is_empty(self):
+        controller = SetupSeason2()
+        stream = BoardStream(controller)
+        self.assertIsNone(stream.Frame())
+
+    def test_swapped_spaces(self):
+        controller = SetupSeason2()
+        stream = BoardStream(controller)
+        view = BoardView()
+        view.Apply(stream.KeyFrame())
+
+        # One tank moves out of a space and another into it in the same frame, whichever op comes first
+        first, second = controller.tanks[0], controller.tanks[1]
+        start = first.position
+        for tank, position in ((first, Position(2, 1)), (second, start)):
+            controller.board.RemoveEntity(tank)
+            tank.position = position
+            controller.board.AddEntity(tank)
+        frame = stream.Frame()
+        frame["ops"].reverse()
+        view.Apply(frame)
+        self.assertEqual(view.RenderFrame(), controller.board.RenderFrame())
+
+    def test_frame_only_captures_changed_entities(self):
+        controller = SetupSeason2()
+        stream = BoardStream(controller)
+        controller.StartOfTurn()
+        stream.Frame()
+
+        with mock.patch.object(TankGameSpectator, "CaptureEntityState", wraps=TankGameSpectator.CaptureEntityState) as capture:
+            controller.PerformMove("Ryan", Position(2, 2))
+            frame = stream.Frame()
+        self.assertEqual(capture.call_count, 1)
+        self.assertEqual(frame["ops"][0][0], "m")
+
+        stream.Detach()
+        self.assertIsNone(controller.board.boardStream)
+        controller.PerformMove("Ryan", Position(2, 3))
+        self.assertIsNone(stream.Frame())
+
+    def test_missed_frame(self):
+        controller = SetupSeason2()
+        stream = BoardStream(controller)
+        view = BoardView()
+        view.Apply(stream.KeyFrame())
+        days = ReplayByDay(controller, "game2.csv")
+        next(days)
+        stream.Frame()
+        next(days)
+        with self.assertRaises(Exception):
+            view.Apply(stream.Frame())
+
+        view.Apply(stream.KeyFrame())
+        self.assertEqual(view.RenderFrame(), controller.board.RenderFrame())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import io
+import random
+import unittest
+from types import SimpleNamespace
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from Entities import Position, Wall
+from TankGame import SetupSeason2, SetupSeason3
+from TankGameBenchmark import BuildSyntheticGame
+from TankGameInteractor import Interactor
+from TankGameThreats import ThreatMap
+
+try:
+    from NumpyBoard import NumpyBoard
+except ImportError:
+    NumpyBoard = None
+
+def BruteForceThreats(controller):
+    """(x, y) -> set of tank indices, checking every space against every tank with DoesLineOfSightExist."""
+    board = controller.board
+    threats = {}
+    for index, tank in enumerate(controller.tanks):
+        if board.grid[tank.position.x][tank.position.y] is not tank: continue
+        for x in range(board.width):
+            for y in range(board.height):
+                space = Position(x, y)
+                if space == tank.position or max(abs(x - tank.position.x), abs(y - tank.position.y)) > tank.range: continue
+                if board.DoesLineOfSightExist(tank, SimpleNamespace(position=space)):
+                    threats.setdefault((x, y), set()).add(index)
+    return threats
+
+class TestThreatMap(unittest.TestCase):
+    def _assert_matches(self, threatMap, controller):
+        expected = BruteForceThreats(controller)
+        board = controller.board
+        for x in range(board.width):
+            for y in range(board.height):
+                indices = expected.get((x, y), set())
+                self.assertEqual(threatMap.ThreatCount(Position(x, y)), len(indices), (x, y))
+                self.assertEqual(threatMap.ThreatBits(Position(x, y)), sum(1 << index for index in indices))
+
+    def _replay(self, controller):
+        threatMap = ThreatMap(controller)
+        self._assert_matches(threatMap, controller)
+        sweeps = threatMap.sweeps
+        actions = 0
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            interactor = Interactor(controller)
+            while source.HasAnotherAction():
+                interactor.TakeAction(source.NextAction())
+                actions += 1
+                self._assert_matches(threatMap, controller)
+        # Only the tanks near each change are swept again, not all of them after every action
+        self.assertLess(threatMap.sweeps - sweeps, actions * len(controller.tanks) // 2)
+
+    def test_season_2(self):
+        self._replay(SetupSeason2())
+
+    @unittest.skipIf(NumpyBoard is None, "numpy is not installed")
+    def test_season_2_numpy(self):
+        self._replay(SetupSeason2(NumpyBoard))
+
+    def test_random_changes(self):
+        # Walls appearing and disappearing in and out of sight, including behind other walls
+        for seed in range(3):
+            rng = random.Random(seed)
+            controller = BuildSyntheticGame(12, 12, 6, 30, 0, seed=seed)
+            for tank in controller.tanks: tank.range = rng.randint(1, 6)
+            threatMap = ThreatMap(controller)
+            board = controller.board
+            for _ in range(40):
+                space = Position(rng.randrange(12), rng.randrange(12))
+                entity = board.grid[space.x][space.y]
+                if entity is None:
+                    wall = Wall(space, 1)
+                    controller.walls.append(wall)
+                    board.AddEntity(wall)
+                elif type(entity) is Wall:
+                    board.RemoveEntity(entity)
+                self._assert_matches(threatMap, controller)
+
+    def test_upgrade(self):
+        controller = SetupSeason3()
+        threatMap = ThreatMap(controller)
+        tank = controller.tanks[0]
+        before = threatMap.Coverage(tank.owner)
+        tank.IncreaseRange()
+        after = threatMap.Coverage(tank.owner)
+        self.assertLess(before, after)
+        self._assert_matches(threatMap, controller)
+
+    def test_threats_and_overlay(self):
+        controller = SetupSeason2()
+        threatMap = ThreatMap(controller)
+        space = next(Position(x, y) for x in range(controller.board.width) for y in range(controller.board.height)
+                     if threatMap.ThreatCount(Position(x, y)) > 1 and controller.board.grid[x][y] is None)
+        threats = threatMap.Threats(space)
+        self.assertEqual(len(threats), threatMap.ThreatCount(space))
+        for tank in threats:
+            self.assertIn(space, threatMap.Coverage(tank.owner))
+
+        frame = controller.board.RenderFrame(threatMap.Overlay())
+        lines = frame.split("\n")
+        self.assertEqual(lines[2 * space.y].split("|")[space.x], f"{len(threats):2}")
+        self.assertEqual(len(frame), len(controller.board.RenderFrame()))
+
+        threatMap.Detach()
+        self.assertIsNone(controller.board.threatMap)
+        self.assertIsNone(controller.Clone().board.threatMap)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from TankGame import SetupSeason2, PrintTanks
+from TankGameInteractor import Interactor
+from TankGameTimeline import RecordTimeline, CaptureSnapshot
+
+def Describe(controller):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        PrintTanks(controller)
+        controller.board.Render()
+    return output.getvalue(), CaptureSnapshot(controller)
+
+class TestTimeline(unittest.TestCase):
+    def _replay_until_end_of(self, date):
+        controller = SetupSeason2()
+        interactor = Interactor(controller)
+        seen = False
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            while source.HasAnotherAction():
+                action = source.NextAction()
+                if seen and action.date != date: break
+                seen = seen or action.date == date
+                interactor.TakeAction(action)
+        return controller
+
+    def test_every_day_matches_replay(self):
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            timeline = RecordTimeline(SetupSeason2, source, keyframe_interval=3)
+
+        self.assertGreater(len(timeline), 3)
+        for day, date in enumerate(timeline.dates):
+            with redirect_stdout(io.StringIO()):
+                rebuilt = timeline.Rebuild(day)
+            self.assertEqual(Describe(rebuilt), Describe(self._replay_until_end_of(date)), f"day {day} ({date})")
+
+    def test_unrecorded_day(self):
+        with CsvActionSource("game2.csv") as source, redirect_stdout(io.StringIO()):
+            timeline = RecordTimeline(SetupSeason2, source)
+        with self.assertRaises(Exception):
+            timeline.Rebuild(len(timeline))
@@ -0,0 +1,111 @@
+import io
+import pickle
+import unittest
+from contextlib import redirect_stdout
+from CsvActionSource import CsvActionSource
+from Entities import BaseTank, Position, Tank, Wall, InternPosition, INTERNED_POSITIONS
+from TankGame import SetupSeason2, SetupSeason3, PrintTanks
+from TankGameInteractor import Interactor, AlgebraicNotationToPosition
+from TankGameTimeline import CaptureSnapshot
+from TankTable import TankTable, TableTank, COLUMNS, ROW_FIELDS
+
+def ReplaySeason2(controller):
+    output = io.StringIO()
+    with redirect_stdout(output), CsvActionSource("game2.csv") as source:
+        Interactor(controller).TakeActions(source)
+        PrintTanks(controller)
+        controller.board.Render()
+    return output.getvalue()
+
+class TestCompactEntities(unittest.TestCase):
+    def test_slots(self):
+        for entity in (Tank(Position(0, 0), "Ryan"), Wall(Position(0, 0), 3)):
+            self.assertFalse(hasattr(entity, "__dict__"))
+            with self.assertRaises(AttributeError):
+                entity.notAField = 1
+
+    def test_pickle_and_copy(self):
+        tank = Tank(Position(1, 2), "Ryan")
+        tank.GainGold(4)
+        for copy in (pickle.loads(pickle.dumps(tank)), tank.Copy()):
+            self.assertEqual(copy.GetState(), tank.GetState())
+            self.assertEqual((copy.owner, copy.tile), (tank.owner, tank.tile))
+
+    def test_positions_are_interned(self):
+        self.assertIs(InternPosition(3, 4), InternPosition(3, 4))
+        self.assertIs(AlgebraicNotationToPosition("D5"), InternPosition(3, 4))
+        self.assertIs(AlgebraicNotationToPosition("d5"), InternPosition(3, 4))
+        self.assertEqual(InternPosition(3, 4), Position(3, 4))
+
+    def test_interned_positions_are_bounded(self):
+        for x in range(300):
+            for y in range(300):
+                InternPosition(x, y)
+        self.assertLessEqual(InternPosition.cache_info().currsize, INTERNED_POSITIONS)
+        # Whatever was dropped, parsing still agrees with interning
+        self.assertIs(AlgebraicNotationToPosition("D5"), InternPosition(3, 4))
+
+
+class TestTankTable(unittest.TestCase):
+    def test_columns_follow_tanks(self):
+        table = TankTable()
+        tank = table.AddTank(Position(1, 2), "Ryan")
+        other = table.AddTank(Position(5, 6), "Stomp")
+        tank.GainGold(7)
+        tank.IncreaseRange()
+        other.position = Position(4, 6)
+        other.TakeDamage(tank, 1)
+
+        self.assertIsInstance(tank, BaseTank)
+        # The columns replace Tank's own slots rather than leaving them empty on every row
+        slots = {name for cls in type(tank).__mro__ for name in getattr(cls, "__slots__", ())}
+        self.assertEqual(slots, set(ROW_FIELDS) | {"_table", "_row"})
+        self.assertEqual(list(table.gold), [7, 0])
+        self.assertEqual(list(table.range), [3, 2])
+        self.assertEqual(list(table.lives), [3, 2])
+        self.assertEqual(list(table.x), [1, 4])
+        self.assertEqual(list(table.y), [2, 6])
+        self.assertEqual(other.position, Position(4, 6))
+
+    def test_copy_is_independent(self):
+        table = TankTable()
+        tank = table.AddTank(Position(1, 2), "Ryan")
+        copy = table.Copy()
+        tank.GainGold(3)
+        self.assertEqual(copy.tanks[0].GetState()[:5], Tank(Position(1, 2), "Ryan").GetState()[:5])
+        self.assertEqual(copy.tanks[0]._gold, 0)
+        for column in COLUMNS:
+            self.assertIsNot(getattr(copy, column), getattr(table, column))
+
+    def test_season_2_replay_matches(self):
+        controller = SetupSeason2(tank_table=True)
+        self.assertTrue(all(type(tank) is TableTank for tank in controller.tanks))
+        self.assertEqual(ReplaySeason2(controller), ReplaySeason2(SetupSeason2()))
+        self.assertEqual(list(controller.tankTable.gold), [tank._gold for tank in controller.tanks])
+
+    def test_clone_and_state_hash(self):
+        controller = SetupSeason3(tank_table=True)
+        controller.EnableStateHash()
+        controller.StartOfTurn()
+        clone = controller.Clone()
+        self.assertIsNot(clone.tankTable, controller.tankTable)
+        self.assertEqual(CaptureSnapshot(clone), CaptureSnapshot(controller))
+
+        clone.StartOfTurn()
+        for game in (controller, clone):
+            self.assertEqual(game.StateHash(), game.ComputeStateHash())
+        clone.tanks[0].GainGold(2)
+        self.assertNotEqual(CaptureSnapshot(clone), CaptureSnapshot(controller))
+        self.assertNotEqual(clone.tanks[0]._gold, controller.tanks[0]._gold)
+
+    def test_failed_add_leaves_no_row(self):
+        controller = SetupSeason2(tank_table=True)
+        rows = len(controller.tankTable)
+        with self.assertRaises(Exception):
+            controller.AddTank(controller.tanks[0].position, "Nobody")
+        with self.assertRaises(Exception):
+            controller.AddTank(Position(0, 0), controller.tanks[0].owner)
+        self.assertEqual(len(controller.tankTable), rows)
+
+if __name__ == '__main__':
+    unittest.main()